@@ -0,0 +1 @@
+"""Utilidades compartidas por los scripts de asignación (inspección, supervisión y comisaría)."""
@@ -0,0 +1,329 @@
+import hashlib
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from asignador.metricas import fase, sumar
+
+# Configuración por variables de entorno (valores por defecto pensados para GitHub Actions)
+HILOS = int(os.getenv("ADJUNTOS_HILOS", "4"))
+PRESUPUESTO_MB = int(os.getenv("ADJUNTOS_PRESUPUESTO_MB", "200"))
+REINTENTOS = int(os.getenv("ADJUNTOS_REINTENTOS", "3"))
+ESPERA_REINTENTO = 1.0
+# Caché local de adjuntos compartida entre etapas y ejecuciones (0 = sin caché)
+CACHE_DIR = os.getenv("ADJUNTOS_CACHE_DIR", os.path.join(".estado", "adjuntos"))
+CACHE_MB = int(os.getenv("ADJUNTOS_CACHE_MB", "500"))
+
+
+class PresupuestoBytes:
+    """Limita los bytes que las descargas en curso pueden ocupar a la vez en el disco temporal."""
+
+    def __init__(self, limite):
+        self.limite = limite
+        self.en_uso = 0
+        self._cond = threading.Condition()
+
+    def reservar(self, n):
+        with self._cond:
+            # un archivo mayor que todo el presupuesto pasa solo cuando no hay nada más en uso
+            while self.en_uso and self.en_uso + n > self.limite:
+                self._cond.wait()
+            self.en_uso += n
+
+    def liberar(self, n):
+        with self._cond:
+            self.en_uso -= n
+            self._cond.notify_all()
+
+
+def _enlazar(origen, destino):
+    """Enlace duro si se puede (mismo disco), si no una copia."""
+    try:
+        os.link(origen, destino)
+    except OSError:
+        shutil.copyfile(origen, destino)
+
+
+def _sha256(ruta):
+    h = hashlib.sha256()
+    with open(ruta, "rb") as f:
+        for bloque in iter(lambda: f.read(1024 * 1024), b""):
+            h.update(bloque)
+    return h.hexdigest()
+
+
+class AlmacenAdjuntos:
+    """
+    Caché en disco de adjuntos descargados, direccionada por contenido: cada
+    archivo se guarda una sola vez con su sha256 como nombre, y un índice SQLite
+    relaciona (capa, objectid, id del adjunto, tamaño) con ese hash. Así la
+    supervisión reutiliza las fotos que ya bajó la inspección. Cuando el total
+    pasa de limite_mb se borran los archivos usados hace más tiempo (LRU).
+    """
+
+    def __init__(self, carpeta=CACHE_DIR, limite_mb=CACHE_MB):
+        self.carpeta = carpeta
+        self.limite = limite_mb * 1024 * 1024
+        os.makedirs(carpeta, exist_ok=True)
+        self._candado = threading.Lock()
+        self._con = sqlite3.connect(os.path.join(carpeta, "indice.sqlite"), check_same_thread=False)
+        self._con.executescript("""
+            CREATE TABLE IF NOT EXISTS archivos (
+                hash TEXT PRIMARY KEY, bytes INTEGER, usado REAL
+            );
+            CREATE TABLE IF NOT EXISTS claves (
+                clave TEXT PRIMARY KEY, hash TEXT
+            );
+        """)
+        self._con.commit()
+
+    def cerrar(self):
+        with self._candado:
+            self._con.close()
+
+    @staticmethod
+    def clave(layer, oid, adjunto):
+        return f"{getattr(layer, 'url', id(layer))}|{int(oid)}|{adjunto['id']}|{int(adjunto.get('size') or 0)}"
+
+    def _ruta(self, hash_):
+        return os.path.join(self.carpeta, hash_[:2], hash_)
+
+    def obtener(self, clave, destino):
+        """
+        Enlaza (o copia) a destino el archivo en caché para la clave y devuelve
+        destino, o None si no está. Se hace con el candado tomado: un guardar()
+        de otro hilo no puede recortarlo mientras tanto.
+        """
+        with self._candado:
+            fila = self._con.execute(
+                "SELECT a.hash, a.bytes FROM claves c JOIN archivos a ON a.hash = c.hash WHERE c.clave = ?",
+                (clave,)
+            ).fetchone()
+            if fila is None:
+                return None
+            ruta = self._ruta(fila[0])
+            try:
+                if os.path.getsize(ruta) != fila[1]:
+                    raise FileNotFoundError(ruta)
+                _enlazar(ruta, destino)
+            except OSError:
+                # borrado o truncado fuera del índice: se descarga de nuevo
+                self._con.execute("DELETE FROM archivos WHERE hash = ?", (fila[0],))
+                self._con.commit()
+                return None
+            self._con.execute("UPDATE archivos SET usado = ? WHERE hash = ?", (time.time(), fila[0]))
+            self._con.commit()
+            return destino
+
+    def guardar(self, clave, ruta):
+        """Guarda el archivo descargado bajo su hash y lo asocia a la clave."""
+        tamano = os.path.getsize(ruta)
+        if tamano > self.limite:
+            return None
+        hash_ = _sha256(ruta)
+        destino = self._ruta(hash_)
+        with self._candado:
+            if not os.path.exists(destino):
+                os.makedirs(os.path.dirname(destino), exist_ok=True)
+                temporal = f"{destino}.{threading.get_ident()}.tmp"
+                shutil.copyfile(ruta, temporal)
+                os.replace(temporal, destino)
+            self._con.execute(
+                "INSERT OR REPLACE INTO archivos (hash, bytes, usado) VALUES (?, ?, ?)",
+                (hash_, tamano, time.time())
+            )
+            self._con.execute("INSERT OR REPLACE INTO claves (clave, hash) VALUES (?, ?)", (clave, hash_))
+            self._recortar()
+            self._con.commit()
+        return destino
+
+    def _recortar(self):
+        """Borra los archivos menos usados hasta quedar bajo el límite."""
+        total = self._con.execute("SELECT COALESCE(SUM(bytes), 0) FROM archivos").fetchone()[0]
+        if total <= self.limite:
+            return
+        for hash_, tamano in self._con.execute("SELECT hash, bytes FROM archivos ORDER BY usado").fetchall():
+            if total <= self.limite:
+                break
+            try:
+                os.remove(self._ruta(hash_))
+            except FileNotFoundError:
+                pass
+            self._con.execute("DELETE FROM archivos WHERE hash = ?", (hash_,))
+            self._con.execute("DELETE FROM claves WHERE hash = ?", (hash_,))
+            total -= tamano
+
+
+_ALMACEN = None
+
+
+def almacen_adjuntos():
+    """AlmacenAdjuntos compartido por las etapas del proceso (None si ADJUNTOS_CACHE_MB=0)."""
+    global _ALMACEN
+    if _ALMACEN is None and CACHE_MB > 0:
+        try:
+            _ALMACEN = AlmacenAdjuntos()
+        except (OSError, sqlite3.Error) as e:
+            print(f"⚠️ No se pudo abrir la caché de adjuntos ({e}); se descarga todo")
+            return None
+    return _ALMACEN
+
+
+def _con_reintentos(funcion, reintentos=REINTENTOS, espera=ESPERA_REINTENTO):
+    """Ejecuta funcion() reintentando fallos transitorios con espera exponencial."""
+    for intento in range(1, reintentos + 1):
+        try:
+            return funcion()
+        except Exception:
+            if intento == reintentos:
+                raise
+            time.sleep(espera * 2 ** (intento - 1))
+
+
+def _exito(resultado):
+    """attachments.add devuelve un bool o un dict con addAttachmentResult según la versión."""
+    if isinstance(resultado, dict):
+        return bool(resultado.get("addAttachmentResult", resultado).get("success"))
+    return bool(resultado)
+
+
+def _ya_subido(layer, oid, ruta):
+    """True si el objectid ya tiene un adjunto con el nombre y el tamaño del archivo."""
+    nombre, tamano = os.path.basename(ruta), os.path.getsize(ruta)
+    return any(
+        a.get("name") == nombre and int(a.get("size") or tamano) == tamano
+        for a in layer.attachments.get_list(oid=oid)
+    )
+
+
+def _subir(layer, oid, ruta, reintentos=REINTENTOS, espera=ESPERA_REINTENTO):
+    """
+    attachments.add con reintentos. Un rechazo explícito del servicio se
+    reintenta; tras una excepción (p. ej. un timeout) el adjunto pudo quedar
+    subido, así que antes de reenviarlo se revisa la lista del destino. Si esa
+    revisión también falla no se reenvía.
+    """
+    for intento in range(1, reintentos + 1):
+        try:
+            if _exito(layer.attachments.add(oid, ruta)):
+                return
+            error = RuntimeError("el servicio rechazó el adjunto")
+        except Exception as e:
+            error = e
+            try:
+                if _ya_subido(layer, oid, ruta):
+                    return
+            except Exception:
+                raise error
+        if intento == reintentos:
+            raise error
+        time.sleep(espera * 2 ** (intento - 1))
+
+
+def copiar_adjuntos(layer_origen, layer_destino, pares, hilos=HILOS,
+                    presupuesto_mb=PRESUPUESTO_MB, reintentos=REINTENTOS, almacen=None, revisar=()):
+    """
+    Copia los adjuntos de cada objectid de origen a su objectid de destino.
+    pares: lista de (oid_origen, oid_destino). Lista, descarga y sube en paralelo
+    con un pool de hilos; cada archivo pasa por una carpeta temporal propia que se
+    borra al terminar, y el total en disco queda acotado por presupuesto_mb. Lo
+    que ya está en la caché de adjuntos no se vuelve a descargar. revisar: oids
+    de destino que una ejecución interrumpida pudo dejar con parte de los
+    adjuntos; en ellos se omiten los que ya están (mismo nombre y tamaño).
+    """
+    revisar = set(revisar)
+    almacen = almacen or almacen_adjuntos()
+    with fase("adjuntos") as medicion:
+        inicio = time.perf_counter()
+        presupuesto = PresupuestoBytes(presupuesto_mb * 1024 * 1024)
+        resumen = {"adjuntos": 0, "copiados": 0, "fallidos": 0, "bytes": 0,
+                   "aciertos": 0, "descargas": 0, "bytes_ahorrados": 0}
+        candado = threading.Lock()
+
+        def listar(oid_origen, oid_destino):
+            adjuntos = _con_reintentos(lambda: layer_origen.attachments.get_list(oid=oid_origen), reintentos)
+            if oid_destino not in revisar:
+                return adjuntos
+            ya = _con_reintentos(lambda: layer_destino.attachments.get_list(oid=oid_destino), reintentos)
+            presentes = {(a.get("name"), int(a.get("size") or 0)) for a in ya}
+            return [a for a in adjuntos if (a.get("name"), int(a.get("size") or 0)) not in presentes]
+
+        def copiar(oid_origen, oid_destino, adj):
+            tamano = int(adj.get("size") or 0)
+            presupuesto.reservar(tamano)
+            carpeta = tempfile.mkdtemp(prefix="adjunto_")
+            try:
+                def descargar():
+                    rutas = layer_origen.attachments.download(
+                        oid=int(oid_origen), attachment_id=adj["id"], save_path=carpeta
+                    )
+                    if not (isinstance(rutas, list) and rutas):
+                        raise RuntimeError("la descarga no devolvió ningún archivo")
+                    return rutas[0]
+
+                def obtener():
+                    clave = AlmacenAdjuntos.clave(layer_origen, oid_origen, adj) if almacen else None
+                    # el nombre del archivo es el nombre del adjunto al subirlo
+                    ruta = os.path.join(carpeta, adj.get("name") or f"adjunto_{adj['id']}")
+                    if almacen and almacen.obtener(clave, ruta):
+                        with candado:
+                            resumen["aciertos"] += 1
+                            resumen["bytes_ahorrados"] += os.path.getsize(ruta)
+                        return ruta
+                    ruta = _con_reintentos(descargar, reintentos)
+                    with candado:
+                        resumen["descargas"] += 1
+                    if almacen:
+                        try:
+                            almacen.guardar(clave, ruta)
+                        except (OSError, sqlite3.Error) as e:
+                            print(f"⚠️ No se guardó '{adj.get('name')}' en la caché de adjuntos: {e}")
+                    return ruta
+
+                ruta = obtener()
+                _subir(layer_destino, oid_destino, ruta, reintentos)
+                with candado:
+                    resumen["copiados"] += 1
+                    resumen["bytes"] += os.path.getsize(ruta)
+            except Exception as e:
+                with candado:
+                    resumen["fallidos"] += 1
+                print(f"❌ Error al copiar adjunto '{adj.get('name')}': {e}")
+            finally:
+                shutil.rmtree(carpeta, ignore_errors=True)
+                presupuesto.liberar(tamano)
+
+        with ThreadPoolExecutor(max_workers=max(1, hilos)) as pool:
+            listados = {pool.submit(listar, oid_origen, oid_destino): (oid_origen, oid_destino) for oid_origen, oid_destino in pares}
+            copias = []
+            for futuro in as_completed(listados):
+                oid_origen, oid_destino = listados[futuro]
+                try:
+                    adjuntos = futuro.result()
+                except Exception as e:
+                    print(f"❌ No se pudo listar los adjuntos del objectid {oid_origen}: {e}")
+                    continue
+                resumen["adjuntos"] += len(adjuntos)
+                copias.extend(pool.submit(copiar, oid_origen, oid_destino, adj) for adj in adjuntos)
+            for futuro in copias:
+                futuro.result()
+
+        resumen["segundos"] = round(time.perf_counter() - inicio, 2)
+        print(
+            f"📎 Adjuntos: {resumen['copiados']}/{resumen['adjuntos']} copiados, "
+            f"{resumen['fallidos']} con error, {resumen['bytes'] / 1024 / 1024:.2f} MB "
+            f"en {resumen['segundos']} s"
+        )
+        if almacen:
+            print(
+                f"🗃️ Caché de adjuntos: {resumen['aciertos']} aciertos, {resumen['descargas']} descargas, "
+                f"{resumen['bytes_ahorrados'] / 1024 / 1024:.2f} MB sin descargar"
+            )
+            sumar("adjuntos_cache", aciertos=resumen["aciertos"], descargas=resumen["descargas"],
+                  bytes_ahorrados=resumen["bytes_ahorrados"])
+        medicion.registros = resumen["copiados"]
+    return resumen
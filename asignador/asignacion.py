@@ -0,0 +1,121 @@
+import heapq
+
+
+def _entero(valor, defecto=0):
+    """Convierte a int tolerando None, NaN y pd.NA."""
+    try:
+        if valor is None or valor != valor:
+            return defecto
+        return int(valor)
+    except (TypeError, ValueError):
+        return defecto
+
+
+class IndiceCarga:
+    """
+    Índice de montículos (min-heap) por grupo para elegir siempre a la persona con
+    menos trámites. Se construye una sola vez sobre registros Persona (ver
+    asignador.registros); cada elección cuesta O(log k) y actualiza num_tramites
+    y ultimo_numero en el propio registro, de modo que el reparto queda
+    balanceado dentro del mismo lote. col_num, col_ultimo y col_oid son los
+    nombres de las columnas en el servicio, para las actualizaciones.
+    """
+
+    def __init__(self, registros, col_num="num_tramites", col_ultimo="ultimo_numero", col_oid="objectid"):
+        self.registros = list(registros)
+        self.col_num = col_num
+        self.col_ultimo = col_ultimo
+        self.col_oid = col_oid
+        self._monticulos = {}
+        self._modificados = {}
+        self._grupos = []
+        self._orden = {}
+
+        for orden, reg in enumerate(self.registros):
+            self._grupos.append(reg.grupo)
+            self._orden[id(reg)] = orden
+            # desempate por objectid para que el reparto sea determinista
+            entrada = (reg.num_tramites, orden if reg.oid is None else reg.oid, orden)
+            self._monticulos.setdefault(reg.grupo, []).append(entrada)
+
+        for monticulo in self._monticulos.values():
+            heapq.heapify(monticulo)
+
+    def __len__(self):
+        return len(self.registros)
+
+    def asignar(self, grupo=None):
+        """
+        Devuelve el registro con menos trámites del grupo (o None si no hay nadie)
+        y avanza sus contadores.
+        """
+        monticulo = self._monticulos.get(grupo)
+        if not monticulo:
+            return None
+        _, desempate, orden = monticulo[0]
+        reg = self.registros[orden]
+        reg.num_tramites += 1
+        reg.ultimo_numero += 1
+        heapq.heapreplace(monticulo, (reg.num_tramites, desempate, orden))
+        self._modificados[orden] = reg
+        return reg
+
+    def primero(self, grupo=None):
+        """El registro que asignar(grupo) elegiría, sin tocar sus contadores."""
+        monticulo = self._monticulos.get(grupo)
+        return self.registros[monticulo[0][2]] if monticulo else None
+
+    def miembros(self, grupo=None):
+        """Posiciones (en registros) de las personas del grupo."""
+        return [orden for _, _, orden in self._monticulos.get(grupo, [])]
+
+    def posicion(self, reg):
+        """Posición del registro en registros."""
+        return self._orden[id(reg)]
+
+    def grupos(self):
+        return list(self._monticulos)
+
+    def tomar(self, reg):
+        """Como asignar, pero para una persona elegida por otro criterio (p. ej. distancia)."""
+        orden = self._orden[id(reg)]
+        monticulo = self._monticulos[self._grupos[orden]]
+        for i, (num, desempate, o) in enumerate(monticulo):
+            if o == orden:
+                reg.num_tramites += 1
+                reg.ultimo_numero += 1
+                monticulo[i] = (reg.num_tramites, desempate, orden)
+                heapq.heapify(monticulo)
+                self._modificados[orden] = reg
+                return reg
+
+    def liberar(self, reg):
+        """
+        Deshace el num_tramites de una asignación que no llegó a crear tarea.
+        ultimo_numero no retrocede: el número de formulario ya pudo usarse.
+        """
+        orden = self._orden[id(reg)]
+        monticulo = self._monticulos[self._grupos[orden]]
+        for i, (num, desempate, o) in enumerate(monticulo):
+            if o == orden:
+                reg.num_tramites -= 1
+                monticulo[i] = (reg.num_tramites, desempate, orden)
+                heapq.heapify(monticulo)
+                self._modificados[orden] = reg
+                return
+
+    def actualizaciones(self, con_ultimo=True, vaciar=False):
+        """
+        Una fila consolidada por persona con sus contadores finales. Con
+        con_ultimo=False no incluye ultimo_numero (cuando lo escribe ReservaNumeros).
+        Con vaciar=True la siguiente llamada solo trae lo modificado después.
+        """
+        filas = []
+        for reg in self._modificados.values():
+            atributos = {self.col_oid: reg.oid, self.col_num: reg.num_tramites}
+            if con_ultimo:
+                atributos[self.col_ultimo] = reg.ultimo_numero
+            filas.append({"attributes": atributos})
+        if vaciar:
+            self._modificados = {}
+        return filas
@@ -0,0 +1,138 @@
+"""
+Llamadas de red independientes a la vez. arcgis (y el motor rest) son
+bloqueantes, así que cada llamada corre en un pool de hilos y asyncio las
+coordina: un semáforo por host limita cuántas van juntas contra el mismo
+servidor, y las conexiones se reutilizan del pool de la sesión HTTP. El
+cliente es uno solo por proceso (su bucle de eventos vive en un hilo propio),
+así el límite por host vale también entre llamadas simultaneas() que se
+hacen a la vez desde hilos distintos (etapas del modo por flujo, reserva de
+números y ediciones).
+
+    df_roster, workers = sin_errores(simultaneas(
+        (tabla, roster.cargar),
+        (layer_workers, ctx.trabajadores),
+    ))
+"""
+import asyncio
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from urllib.parse import urlparse
+
+# Hilos del pool y llamadas simultáneas como máximo contra un mismo host
+HILOS = int(os.getenv("ASINCRONO_HILOS", "8"))
+POR_HOST = int(os.getenv("ASINCRONO_POR_HOST", "4"))
+
+# Marca los hilos del pool: una llamada que a su vez pide simultaneas() corre en serie
+_hilo = threading.local()
+
+
+def _host(destino):
+    """Host de una capa (por su url) o de una url; "local" si no tiene."""
+    url = destino if isinstance(destino, str) else getattr(destino, "url", None)
+    return urlparse(url).netloc or "local" if url else "local"
+
+
+def _marcar_hilo():
+    _hilo.en_cliente = True
+
+
+def _en_serie(llamadas):
+    resultados = []
+    for _, funcion in llamadas:
+        try:
+            resultados.append(funcion())
+        except Exception as e:
+            resultados.append(e)
+    return resultados
+
+
+class ClienteAsincrono:
+    """
+    Ejecuta llamadas bloqueantes como corrutinas en un bucle de eventos propio
+    (en un hilo de fondo), con un pool de hilos y un semáforo por host que
+    comparten todas las llamadas hechas a través de él.
+    """
+
+    def __init__(self, hilos=HILOS, por_host=POR_HOST):
+        self.por_host = max(1, por_host)
+        self._pool = ThreadPoolExecutor(max_workers=max(1, hilos), thread_name_prefix="asincrono",
+                                        initializer=_marcar_hilo)
+        self._semaforos = {}
+        self._bucle = asyncio.new_event_loop()
+        self._hilo_bucle = threading.Thread(target=self._bucle.run_forever, name="asincrono-bucle", daemon=True)
+        self._hilo_bucle.start()
+
+    def _semaforo(self, host):
+        # solo se usa desde el hilo del bucle
+        if host not in self._semaforos:
+            self._semaforos[host] = asyncio.Semaphore(self.por_host)
+        return self._semaforos[host]
+
+    async def llamar(self, destino, funcion, *args, **kwargs):
+        """await funcion(*args, **kwargs) respetando el límite del host de destino."""
+        async with self._semaforo(_host(destino)):
+            bucle = asyncio.get_running_loop()
+            return await bucle.run_in_executor(self._pool, partial(funcion, *args, **kwargs))
+
+    async def reunir(self, llamadas):
+        """
+        Resultados de [(destino, funcion), ...] en el mismo orden. Una llamada que
+        falla deja su excepción en su lugar; las demás conservan su resultado.
+        """
+        return await asyncio.gather(
+            *(self.llamar(destino, funcion) for destino, funcion in llamadas),
+            return_exceptions=True
+        )
+
+    def ejecutar(self, llamadas):
+        """reunir() desde código síncrono de cualquier hilo."""
+        try:
+            asyncio.get_running_loop()
+            en_bucle = True
+        except RuntimeError:
+            en_bucle = False
+        # dentro de una llamada del propio pool se sigue en serie: esperar a otras
+        # llamadas del mismo pool y semáforos podría bloquearlo
+        if len(llamadas) <= 1 or en_bucle or getattr(_hilo, "en_cliente", False):
+            return _en_serie(llamadas)
+        return asyncio.run_coroutine_threadsafe(self.reunir(llamadas), self._bucle).result()
+
+    def cerrar(self):
+        self._bucle.call_soon_threadsafe(self._bucle.stop)
+        self._hilo_bucle.join()
+        self._bucle.close()
+        self._pool.shutdown(wait=True)
+
+
+_CLIENTE = None
+_CANDADO = threading.Lock()
+
+
+def cliente_asincrono():
+    """Cliente compartido por todo el proceso (se crea al primer uso)."""
+    global _CLIENTE
+    with _CANDADO:
+        if _CLIENTE is None:
+            _CLIENTE = ClienteAsincrono()
+        return _CLIENTE
+
+
+def simultaneas(*llamadas):
+    """
+    Versión síncrona de ClienteAsincrono.reunir para los scripts: corre las
+    llamadas (destino, funcion) a la vez con el cliente compartido y devuelve
+    la lista de resultados en el mismo orden, con la excepción en lugar del
+    resultado de la llamada que falló. Con una sola llamada, dentro de un bucle
+    de eventos o desde una llamada del propio cliente, van una tras otra.
+    """
+    return cliente_asincrono().ejecutar(llamadas)
+
+
+def sin_errores(resultados):
+    """Los resultados de simultaneas(), o la primera excepción si alguna llamada falló (para lecturas)."""
+    for resultado in resultados:
+        if isinstance(resultado, BaseException):
+            raise resultado
+    return resultados
@@ -0,0 +1,155 @@
+import os
+
+from asignador.asincrono import simultaneas, sin_errores
+from asignador.metricas import fase
+
+# Tamaño de página por defecto; se ajusta al maxRecordCount de la capa si es menor
+TAMANO_PAGINA = 1000
+
+
+def planificar_consulta(where, campos, return_geometry=False, orden="objectid"):
+    """
+    Arma los parámetros de una consulta para que el filtro y la lista de campos
+    se resuelvan en el servidor y no en pandas.
+    """
+    return {
+        "where": where,
+        "out_fields": ",".join(campos) if campos else "*",
+        "return_geometry": return_geometry,
+        "order_by_fields": f"{orden} ASC" if orden else None,
+    }
+
+
+def _limite_capa(layer):
+    """Devuelve el maxRecordCount de la capa, o None si no se puede leer."""
+    try:
+        return int(layer.properties.get("maxRecordCount") or 0) or None
+    except Exception:
+        return None
+
+
+def ultima_edicion(layer, refrescar=False):
+    """
+    editingInfo.lastEditDate de la capa (epoch ms), o None si el servicio no lo publica.
+    Con refrescar=True pide las propiedades al servicio (GET {url}?f=json por la
+    conexión de la capa) en vez de usar las que layer.properties tiene en caché.
+    """
+    try:
+        if refrescar and getattr(layer, "_con", None) is not None:
+            propiedades = layer._con.get(layer.url, {"f": "json"})
+        else:
+            propiedades = layer.properties
+        return (propiedades.get("editingInfo") or {}).get("lastEditDate")
+    except Exception:
+        return None
+
+
+def paginas(layer, plan, tamano_pagina=TAMANO_PAGINA, por_clave=False):
+    """
+    Genera las páginas (FeatureSet) del plan de consulta una por una. Con
+    por_clave=True no usa resultOffset sino "objectid > último leído", así la
+    paginación no salta registros aunque los ya leídos dejen de cumplir el
+    filtro mientras se consulta (p. ej. cuando se escriben por lotes).
+
+    Termina cuando el servicio dice que no quedan más (exceededTransferLimit
+    falso, si el FeatureSet lo trae) o con una página vacía. Una página corta
+    solo es la última si se conoce el maxRecordCount de la capa: si no, el
+    servidor pudo cortarla por debajo de tamano_pagina.
+    """
+    limite = _limite_capa(layer)
+    if limite:
+        tamano_pagina = min(tamano_pagina, limite)
+    campo_clave = (plan["order_by_fields"] or "objectid").split()[0]
+
+    offset = 0
+    ultimo = None
+    while True:
+        where = plan["where"]
+        if por_clave and ultimo is not None:
+            where = f"({where}) AND {campo_clave} > {ultimo}"
+        pagina = layer.query(
+            where=where,
+            out_fields=plan["out_fields"],
+            return_geometry=plan["return_geometry"],
+            order_by_fields=plan["order_by_fields"],
+            result_offset=0 if por_clave else offset,
+            result_record_count=tamano_pagina,
+            return_all_records=False,
+        )
+        yield pagina
+        excedido = getattr(pagina, "exceeded_transfer_limit", None)
+        if not pagina.features or excedido is False:
+            return
+        if excedido is None and limite and len(pagina.features) < tamano_pagina:
+            return
+        offset += len(pagina.features)
+        if por_clave:
+            atributos = pagina.features[-1].attributes
+            ultimo = int(next(v for k, v in atributos.items() if k.lower() == campo_clave.lower()))
+
+
+def consultar_paginado(layer, plan, tamano_pagina=TAMANO_PAGINA):
+    """
+    Ejecuta el plan de consulta página por página (resultOffset/resultRecordCount)
+    y devuelve un único FeatureSet (del mismo tipo que devuelve la capa) con todos los registros.
+    """
+    with fase("consulta") as medicion:
+        features = []
+        primera = None
+        for pagina in paginas(layer, plan, tamano_pagina):
+            if primera is None:
+                primera = pagina
+            features.extend(pagina.features)
+
+        medicion.registros = len(features)
+
+    return type(primera)(
+        features,
+        fields=primera.fields,
+        geometry_type=primera.geometry_type,
+        spatial_reference=primera.spatial_reference,
+        object_id_field_name=primera.object_id_field_name,
+        global_id_field_name=primera.global_id_field_name,
+    )
+
+
+def verificacion_activa():
+    """La verificación de GlobalID se desactiva con VERIFICAR_GLOBALID=0 (p. ej. en producción)."""
+    return os.getenv("VERIFICAR_GLOBALID", "1").strip().lower() not in ("0", "false", "no")
+
+
+def verificar_globalids(layer, globalids, campo="globalid", tamano_lote=100):
+    """
+    Comprueba en pocas consultas IN (...) que los GlobalID existen en la capa.
+    Devuelve (confirmados, faltantes): un set con los encontrados y la lista de los que no.
+    """
+    pendientes = [str(g) for g in globalids if g is not None]
+    with fase("verificacion", registros=len(pendientes)):
+        def consultar(lote):
+            valores = ", ".join("'" + g.replace("'", "''") + "'" for g in lote)
+            return lambda: layer.query(
+                where=f"{campo} IN ({valores})",
+                out_fields=campo,
+                return_geometry=False
+            )
+
+        # los lotes son independientes: se consultan a la vez
+        lotes = [pendientes[i:i + tamano_lote] for i in range(0, len(pendientes), tamano_lote)]
+        resultados = sin_errores(simultaneas(*((layer, consultar(lote)) for lote in lotes)))
+
+        encontrados = set()
+        for resultado in resultados:
+            for f in resultado.features:
+                valor = f.attributes.get(campo)
+                if valor is None:
+                    # el servicio puede devolver el nombre con otra capitalización
+                    valor = next((v for k, v in f.attributes.items() if k.lower() == campo.lower()), None)
+                if valor is not None:
+                    encontrados.add(str(valor).upper())
+
+    confirmados = {g for g in pendientes if g.upper() in encontrados}
+    faltantes = [g for g in pendientes if g.upper() not in encontrados]
+    print(f"🔎 GlobalID verificados: {len(confirmados)} de {len(pendientes)}")
+    for g in faltantes:
+        print(f"❌ No se encontró ningún registro con GLOBALID {g} en la capa")
+    return confirmados, faltantes
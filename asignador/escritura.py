@@ -0,0 +1,183 @@
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from asignador.esquema import esquema
+from asignador.metricas import fase
+
+# Configuración por variables de entorno
+LOTE_EDICIONES = int(os.getenv("EDICIONES_LOTE", "200"))
+HILOS_EDICIONES = int(os.getenv("EDICIONES_HILOS", "4"))
+REINTENTOS_EDICIONES = int(os.getenv("EDICIONES_REINTENTOS", "3"))
+ESPERA_REINTENTO = 2.0
+
+_CLAVES = {"adds": "addResults", "updates": "updateResults"}
+# Una tarea de Workforce queda identificada por su denuncia y su tipo de asignación
+CLAVES_TAREA = ("workorderid", "assignmenttype")
+
+
+def _fallo(descripcion):
+    return {"success": False, "error": {"description": descripcion}}
+
+
+def _enviar_lote(layer, tipo, features, lote):
+    """
+    Envía un lote y devuelve (resultados, incierto): un resultado por feature
+    (fallido si no vino en la respuesta) e incierto=True si la petición lanzó
+    una excepción, en cuyo caso el servidor pudo haberla aplicado igual.
+    """
+    try:
+        respuesta = layer.edit_features(
+            **{tipo: [features[j] for j in lote]},
+            rollback_on_failure=False
+        )
+        resultados = list(respuesta.get(_CLAVES[tipo], []))
+    except Exception as e:
+        return [_fallo(str(e))] * len(lote), True
+    resultados += [_fallo("sin resultado en la respuesta")] * (len(lote) - len(resultados))
+    return resultados, False
+
+
+def _valor_sql(valor):
+    if isinstance(valor, (int, float)):
+        return str(valor)
+    return "'" + str(valor).replace("'", "''") + "'"
+
+
+def _reconciliar(layer, features, indices, claves, tamano_lote=100, campos=()):
+    """
+    Busca en la capa los adds de un lote incierto por sus campos clave (p. ej.
+    workorderid + assignmenttype). Devuelve {índice: resultado} con los que ya
+    existen; los demás no llegaron al servidor y se pueden reenviar. Si la
+    consulta falla devuelve None: no se sabe cuáles existen. campos: otros
+    campos del registro encontrado que se devuelven en resultado["attributes"].
+    """
+    esquema_capa = esquema(layer)
+    clave = lambda atributos: tuple(str(atributos.get(c)) for c in claves)
+    buscados = {}
+    for j in indices:
+        buscados.setdefault(clave(features[j].get("attributes") or {}), []).append(j)
+
+    valores = list({features[j]["attributes"].get(claves[0]) for j in indices} - {None})
+    existentes = {}
+    try:
+        for i in range(0, len(valores), tamano_lote):
+            lista = ", ".join(_valor_sql(v) for v in valores[i:i + tamano_lote])
+            out_fields = [esquema_capa.oid] + ([esquema_capa.gid] if esquema_capa.gid else []) + list(claves) + list(campos)
+            encontrados = layer.query(
+                where=f"{claves[0]} IN ({lista})",
+                out_fields=",".join(out_fields),
+                return_geometry=False
+            )
+            for f in encontrados.features:
+                existentes.setdefault(clave(f.attributes), f.attributes)
+    except Exception as e:
+        print(f"⚠️ No se pudo comprobar qué adds llegaron a {getattr(layer, 'url', layer)}: {e}")
+        return None
+
+    resultados = {}
+    for k, atributos in existentes.items():
+        for j in buscados.get(k, []):
+            resultados[j] = {
+                "objectId": atributos.get(esquema_capa.oid),
+                "globalId": atributos.get(esquema_capa.gid) if esquema_capa.gid else None,
+                "success": True,
+            }
+            if campos:
+                resultados[j]["attributes"] = {c: atributos.get(c) for c in campos}
+    return resultados
+
+
+def existentes(layer, adds, claves=CLAVES_TAREA, campos=()):
+    """
+    {índice: resultado} de los adds que ya están en la capa según sus campos
+    clave, como si se acabaran de crear; None si no se pudo consultar.
+    """
+    return _reconciliar(layer, adds, range(len(adds)), claves, campos=campos)
+
+
+def _aplicar(layer, tipo, features, tamano_lote, hilos, reintentos, paralelo, claves=None):
+    resultados = [None] * len(features)
+    pendientes = list(range(len(features)))
+
+    for intento in range(1, reintentos + 1):
+        lotes = [pendientes[i:i + tamano_lote] for i in range(0, len(pendientes), tamano_lote)]
+        if paralelo and len(lotes) > 1:
+            with ThreadPoolExecutor(max_workers=max(1, hilos)) as pool:
+                respuestas = list(pool.map(lambda lote: _enviar_lote(layer, tipo, features, lote), lotes))
+        else:
+            respuestas = [_enviar_lote(layer, tipo, features, lote) for lote in lotes]
+
+        fallidos = []
+        inciertos = []
+        for lote, (respuesta, incierto) in zip(lotes, respuestas):
+            for j, resultado in zip(lote, respuesta):
+                resultados[j] = resultado
+                if not resultado.get("success"):
+                    # un add sin respuesta pudo haberse creado: no se reenvía a ciegas
+                    (inciertos if incierto and tipo == "adds" else fallidos).append(j)
+
+        if inciertos:
+            existentes = _reconciliar(layer, features, inciertos, claves) if claves else None
+            if existentes is None:
+                print(f"⚠️ {len(inciertos)} adds sin respuesta en {getattr(layer, 'url', layer)}; no se reenvían")
+            else:
+                for j in inciertos:
+                    if j in existentes:
+                        resultados[j] = existentes[j]
+                    else:
+                        fallidos.append(j)
+                print(f"🔎 {len(existentes)} de {len(inciertos)} adds sin respuesta ya estaban creados")
+                fallidos.sort()
+
+        if not fallidos:
+            break
+        if intento < reintentos:
+            print(f"⚠️ {len(fallidos)} {tipo} fallidos en {getattr(layer, 'url', layer)}; reintento {intento}/{reintentos - 1}")
+            time.sleep(ESPERA_REINTENTO * intento)
+        pendientes = fallidos
+
+    return resultados
+
+
+def aplicar_ediciones(layer, adds=None, updates=None, tamano_lote=LOTE_EDICIONES,
+                      hilos=HILOS_EDICIONES, reintentos=REINTENTOS_EDICIONES, paralelo=True, nombre=None,
+                      claves=None):
+    """
+    Reemplazo de layer.edit_features para lotes grandes: divide adds/updates en
+    lotes de tamano_lote, los envía en paralelo (cada feature es independiente) y
+    reintenta solo los que fallaron según addResults/updateResults.
+    Devuelve {"addResults": [...], "updateResults": [...]} alineados con la entrada.
+
+    nombre, si se da, encabeza el resumen impreso (útil cuando varias capas se
+    editan a la vez y sus mensajes se intercalan).
+
+    Los updates fallidos se reenvían siempre (son idempotentes). Un add con
+    success: false se reenvía; uno cuyo lote lanzó una excepción (p. ej. timeout)
+    pudo haberse creado, así que solo se reenvía si claves (campos que lo
+    identifican, p. ej. ("workorderid", "assignmenttype")) permite comprobar en
+    la capa que no existe; los que ya existen se devuelven como creados. Sin
+    claves quedan como fallidos.
+    """
+    with fase("ediciones", registros=len(adds or []) + len(updates or [])):
+        respuesta = {"addResults": [], "updateResults": []}
+        if adds:
+            respuesta["addResults"] = _aplicar(layer, "adds", list(adds), tamano_lote, hilos, reintentos, paralelo,
+                                               claves=claves)
+        if updates:
+            respuesta["updateResults"] = _aplicar(layer, "updates", list(updates), tamano_lote, hilos, reintentos, paralelo)
+
+        for clave, resultados in respuesta.items():
+            fallidos = [r for r in resultados if not r.get("success")]
+            ok = len(resultados) - len(fallidos)
+            if resultados:
+                prefijo = f"{nombre} " if nombre else ""
+                print(f"{'✅' if not fallidos else '⚠️'} {prefijo}{clave}: {ok}/{len(resultados)} correctos")
+            for r in fallidos:
+                print(f"   ❌ {r.get('error')}")
+    return respuesta
+
+
+def exitosos(resultados):
+    """Lista de bool (éxito por feature) a partir de addResults/updateResults."""
+    return [bool(r.get("success")) for r in resultados]
@@ -0,0 +1,212 @@
+"""
+Asignación por cercanía (MODO_ASIGNACION=espacial). Cada inspector tiene una
+ubicación: la de la tabla de inspectores (columnas longitud/latitud en WGS84)
+o, si no la tiene, la última conocida de su worker en Workforce. Por cada grupo
+(direccion, area) se arma un índice espacial (cKDTree de scipy si está
+instalado, si no una rejilla) y para cada denuncia se elige, entre los
+candidatos más cercanos y el de menos trámites, el de menor costo:
+
+    distancia (m) + ESPACIAL_PESO_CARGA * num_tramites
+
+La distancia se mide en metros también cuando las denuncias quedan en grados
+(WGS84): en ese caso con haversine.
+Al final se informa el recorrido total y cuánto se ahorró frente a elegir solo
+por carga.
+"""
+import math
+import os
+from collections import defaultdict
+
+import numpy as np
+
+from asignador.consultas import planificar_consulta, consultar_paginado
+from asignador.esquema import CAMPOS_WORKER, esquema
+from asignador.geometria import WGS84, coordenadas, metros, reproyectar, wkid_capa
+from asignador.metricas import fase
+
+try:
+    from scipy.spatial import cKDTree
+except ImportError:  # opcional: sin scipy se usa la rejilla
+    cKDTree = None
+
+# Metros que "cuesta" cada trámite que ya tiene el inspector
+PESO_CARGA = float(os.getenv("ESPACIAL_PESO_CARGA", "2000"))
+# Vecinos más cercanos que se comparan por costo
+CANDIDATOS = int(os.getenv("ESPACIAL_CANDIDATOS", "8"))
+
+
+def modo_espacial():
+    """La asignación por cercanía se activa con MODO_ASIGNACION=espacial."""
+    return os.getenv("MODO_ASIGNACION", "carga").strip().lower() == "espacial"
+
+
+class IndiceRejilla:
+    """Vecinos más cercanos con una rejilla uniforme; alternativa a cKDTree sin scipy."""
+
+    def __init__(self, x, y):
+        self.x = np.asarray(x, dtype=float)
+        self.y = np.asarray(y, dtype=float)
+        self.x0, self.y0 = float(self.x.min()), float(self.y.min())
+        ancho = max(float(np.ptp(self.x)), float(np.ptp(self.y)))
+        # alrededor de un punto por celda
+        self.celda = ancho / max(1.0, math.sqrt(len(self.x))) or 1.0
+        self.nx = int(float(np.ptp(self.x)) / self.celda)
+        self.ny = int(float(np.ptp(self.y)) / self.celda)
+        self._celdas = defaultdict(list)
+        columnas = np.minimum(np.floor((self.x - self.x0) / self.celda).astype(int), self.nx)
+        filas = np.minimum(np.floor((self.y - self.y0) / self.celda).astype(int), self.ny)
+        for i, celda in enumerate(zip(columnas.tolist(), filas.tolist())):
+            self._celdas[celda].append(i)
+
+    def _anillo(self, cx, cy, radio):
+        """Celdas de la rejilla a distancia (en celdas) exactamente radio de (cx, cy)."""
+        for i in range(max(cx - radio, 0), min(cx + radio, self.nx) + 1):
+            if abs(i - cx) == radio:
+                filas = range(max(cy - radio, 0), min(cy + radio, self.ny) + 1)
+            else:
+                filas = [j for j in (cy - radio, cy + radio) if 0 <= j <= self.ny]
+            for j in filas:
+                yield from self._celdas.get((i, j), ())
+
+    def query(self, punto, k=1):
+        """(distancias, índices) de los k más cercanos, de menor a mayor."""
+        k = min(k, len(self.x))
+        px, py = punto
+        cx = int(math.floor((px - self.x0) / self.celda))
+        cy = int(math.floor((py - self.y0) / self.celda))
+        # desde el primer anillo que toca la rejilla hasta el que la cubre entera
+        inicio = max(0, -cx, -cy, cx - self.nx, cy - self.ny)
+        maximo = max(abs(cx), abs(cy), abs(self.nx - cx), abs(self.ny - cy))
+
+        encontrados = []
+        for radio in range(inicio, maximo + 1):
+            encontrados.extend(self._anillo(cx, cy, radio))
+            if len(encontrados) < k:
+                continue
+            indices = np.array(encontrados)
+            distancias = np.hypot(self.x[indices] - px, self.y[indices] - py)
+            orden = np.argsort(distancias, kind="stable")[:k]
+            # lo que quede fuera de estos anillos está al menos a radio * celda
+            if distancias[orden[-1]] <= radio * self.celda or radio == maximo:
+                return distancias[orden], indices[orden]
+        return np.array([]), np.array([], dtype=int)
+
+
+def _indice(x, y):
+    if cKDTree is not None:
+        return cKDTree(np.column_stack([x, y]))
+    return IndiceRejilla(x, y)
+
+
+def ubicaciones_workers(layer_workers, destino):
+    """{userid: (x, y)} con la ubicación de cada worker, en la referencia destino."""
+    col_user = esquema(layer_workers).campo("userid", CAMPOS_WORKER["userid"])
+    plan = planificar_consulta("1=1", [col_user], return_geometry=True)
+    features = consultar_paginado(layer_workers, plan).features
+    x, y, propia = coordenadas([f.geometry for f in features])
+    x, y = reproyectar(x, y, propia or wkid_capa(layer_workers), destino)
+    return {
+        f.attributes.get(col_user): (xi, yi)
+        for f, xi, yi in zip(features, np.asarray(x).tolist(), np.asarray(y).tolist())
+        if not (math.isnan(xi) or math.isnan(yi))
+    }
+
+
+class AsignadorEspacial:
+    """
+    Elige inspector por distancia y carga sobre un IndiceCarga, que sigue
+    llevando los contadores (asignar/liberar/actualizaciones no cambian).
+    """
+
+    def __init__(self, indice_carga, ubicaciones, wkid, peso_carga=PESO_CARGA, candidatos=CANDIDATOS):
+        """ubicaciones: (x, y) de cada registro de indice_carga, en el mismo orden (NaN si no tiene)."""
+        self.carga = indice_carga
+        self.wkid = wkid
+        self.peso_carga = peso_carga
+        self.candidatos = candidatos
+        self.x = np.array([u[0] for u in ubicaciones], dtype=float)
+        self.y = np.array([u[1] for u in ubicaciones], dtype=float)
+        self.reporte = {"tareas": 0, "espaciales": 0, "metros": 0.0, "metros_solo_carga": 0.0}
+
+        # un índice por grupo con las personas que tienen ubicación
+        self._indices = {}
+        for grupo in indice_carga.grupos():
+            miembros = np.array([o for o in indice_carga.miembros(grupo)
+                                 if not (np.isnan(self.x[o]) or np.isnan(self.y[o]))], dtype=int)
+            if len(miembros):
+                self._indices[grupo] = (miembros, _indice(self.x[miembros], self.y[miembros]))
+
+    def distancia(self, orden, px, py):
+        """Metros entre la persona (posición en el índice) y el punto; None si no tiene ubicación."""
+        if np.isnan(self.x[orden]):
+            return None
+        return float(metros(self.x[orden], self.y[orden], px, py, self.wkid))
+
+    def asignar(self, grupo, px, py):
+        """Como IndiceCarga.asignar, pero teniendo en cuenta dónde está la denuncia."""
+        self.reporte["tareas"] += 1
+        if grupo not in self._indices or math.isnan(px) or math.isnan(py):
+            return self.carga.asignar(grupo)
+
+        miembros, indice = self._indices[grupo]
+        por_carga = self.carga.primero(grupo)
+        orden_carga = self.carga.posicion(por_carga)
+
+        _, cercanos = indice.query((px, py), k=min(self.candidatos, len(miembros)))
+        candidatos = set(miembros[np.atleast_1d(cercanos)].tolist()) | {orden_carga}
+        elegido, costo_elegido = None, None
+        for orden in sorted(candidatos):
+            reg = self.carga.registros[orden]
+            distancia = self.distancia(orden, px, py)
+            if distancia is None:
+                continue
+            costo = distancia + self.peso_carga * reg.num_tramites
+            if costo_elegido is None or costo < costo_elegido:
+                elegido, costo_elegido = orden, costo
+        if elegido is None:
+            return self.carga.asignar(grupo)
+
+        reg = self.carga.tomar(self.carga.registros[elegido])
+        self.reporte["espaciales"] += 1
+        # el ahorro solo se mide cuando el de menos trámites también tiene ubicación
+        solo_carga = self.distancia(orden_carga, px, py)
+        if solo_carga is not None:
+            self.reporte["metros"] += self.distancia(elegido, px, py)
+            self.reporte["metros_solo_carga"] += solo_carga
+        return reg
+
+    def imprimir_reporte(self):
+        r = self.reporte
+        ahorro = r["metros_solo_carga"] - r["metros"]
+        print(f"📍 Asignación espacial: {r['espaciales']}/{r['tareas']} por cercanía, "
+              f"recorrido {r['metros'] / 1000:.1f} km "
+              f"(solo por carga: {r['metros_solo_carga'] / 1000:.1f} km, ahorro {ahorro / 1000:.1f} km)")
+        return r
+
+
+def preparar(indice_carga, layer_workers, destino):
+    """
+    Arma el AsignadorEspacial: ubicación fija de la tabla (longitud/latitud de
+    cada Persona) si la hay, si no la del worker de Workforce. destino es la
+    referencia en que vienen las denuncias.
+    """
+    with fase("espacial", registros=len(indice_carga)):
+        registros = indice_carga.registros
+        x = np.array([r.x for r in registros], dtype=float)
+        y = np.array([r.y for r in registros], dtype=float)
+        if not (np.isnan(x) | np.isnan(y)).all():
+            x, y = reproyectar(x, y, WGS84, destino)
+            x, y = np.asarray(x, dtype=float), np.asarray(y, dtype=float)
+
+        faltan = np.isnan(x) | np.isnan(y)
+        if faltan.any():
+            workers = ubicaciones_workers(layer_workers, destino)
+            for orden in np.flatnonzero(faltan).tolist():
+                ubicacion = workers.get(registros[orden].usuario)
+                if ubicacion:
+                    x[orden], y[orden] = ubicacion
+
+        con_ubicacion = int((~(np.isnan(x) | np.isnan(y))).sum())
+        print(f"📍 Inspectores con ubicación: {con_ubicacion}/{len(registros)} "
+              f"(índice: {'cKDTree' if cKDTree is not None else 'rejilla'})")
+        return AsignadorEspacial(indice_carga, list(zip(x.tolist(), y.tolist())), destino)
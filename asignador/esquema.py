@@ -0,0 +1,133 @@
+"""
+Esquema de las capas y tablas. Los campos de cada capa se leen una vez de
+layer.properties y quedan en caché mientras no cambie su
+editingInfo.schemaLastEditDate. Los scripts piden campos lógicos (objectid,
+globalid, num_tramites, el usuario del worker...) y el esquema los traduce al
+nombre real del servicio entre varios nombres posibles; si falta un campo
+obligatorio se detiene con ErrorEsquema en lugar de seguir con columnas vacías.
+Los nombres resueltos son los que se piden en out_fields.
+"""
+import threading
+
+# Nombres posibles de cada campo lógico, en orden de preferencia
+CAMPOS_INSPECTOR = {
+    "objectid": ["ObjectID", "objectid", "oid", "object_id"],
+    "nombre": ["nombre", "name"],
+    "usuario": ["usernamearc"],
+    "siglas": ["siglas"],
+    "direccion": ["direccion"],
+    "area": ["area"],
+    "num_tramites": ["num_tramites"],
+    "ultimo_numero": ["ultimo_numero"],
+    "longitud": ["longitud", "lon", "x"],
+    "latitud": ["latitud", "lat", "y"],
+}
+OBLIGATORIOS_INSPECTOR = ("objectid", "usuario", "direccion", "area", "num_tramites", "ultimo_numero")
+
+CAMPOS_COMISARIO = {
+    "objectid": ["objectid", "OBJECTID", "oid", "object_id"],
+    "nombre": ["nombre", "name"],
+    "usuario": ["nomre_de_usuario", "username", "userid", "usuario"],
+    "siglas": ["siglas", "siglas_inspector", "sigla"],
+    "num_tramites": ["num_tramites", "numtramites", "num_tramite", "num_trámites"],
+    "ultimo_numero": ["ultimo_numero", "ultimo_num", "ultimo"],
+}
+OBLIGATORIOS_COMISARIO = ("objectid", "usuario", "num_tramites", "ultimo_numero")
+
+CAMPOS_WORKER = {
+    "userid": ["userid"],
+    "globalid": ["GlobalID", "globalid"],
+}
+
+
+class ErrorEsquema(Exception):
+    """La capa no tiene un campo que el script necesita."""
+
+
+def marca_esquema(layer):
+    """editingInfo.schemaLastEditDate de la capa, o None si no lo publica."""
+    try:
+        return (layer.properties.get("editingInfo") or {}).get("schemaLastEditDate")
+    except Exception:
+        return None
+
+
+class Esquema:
+    """Campos de una capa (nombre real, tipo y longitud) con búsqueda sin distinguir mayúsculas."""
+
+    def __init__(self, propiedades, nombre=None):
+        self.nombre = nombre or propiedades.get("name") or "capa"
+        self.campos = {c["name"]: c for c in propiedades.get("fields") or []}
+        self._minusculas = {n.lower(): n for n in self.campos}
+        self.oid = propiedades.get("objectIdField") or self.buscar(["objectid", "oid", "fid"])
+        self.gid = propiedades.get("globalIdField") or self.buscar(["globalid"])
+
+    def buscar(self, candidatos):
+        """Nombre real del primer candidato que existe en la capa, o None."""
+        for candidato in candidatos:
+            real = self._minusculas.get(candidato.lower())
+            if real:
+                return real
+        return None
+
+    def campo(self, logico, candidatos=None, obligatorio=True):
+        """Nombre real del campo lógico (objectid y globalid salen de las propiedades de la capa)."""
+        if logico == "objectid" and self.oid:
+            return self.oid
+        if logico == "globalid" and self.gid:
+            return self.gid
+        candidatos = candidatos or [logico]
+        real = self.buscar(candidatos)
+        if real is None and obligatorio:
+            raise ErrorEsquema(f"{self.nombre}: no existe el campo '{logico}' (se buscó {', '.join(candidatos)})")
+        return real
+
+    def resolver(self, campos, obligatorios=()):
+        """{campo lógico: nombre real o None}; ErrorEsquema con todos los obligatorios que falten."""
+        mapa = {logico: self.campo(logico, candidatos, obligatorio=False) for logico, candidatos in campos.items()}
+        faltan = [logico for logico in obligatorios if mapa.get(logico) is None]
+        if faltan:
+            raise ErrorEsquema(
+                f"{self.nombre}: faltan los campos {', '.join(faltan)} "
+                f"(se buscó {'; '.join(', '.join(campos[f]) for f in faltan)})"
+            )
+        return mapa
+
+    def out_fields(self, nombres, obligatorios=None):
+        """
+        Nombres reales para out_fields. Los que no existen en la capa se quitan
+        con un aviso, salvo los de obligatorios (por defecto todos), que detienen
+        la ejecución.
+        """
+        obligatorios = set(nombres if obligatorios is None else obligatorios)
+        reales = []
+        for nombre in nombres:
+            real = self.campo(nombre, obligatorio=nombre in obligatorios)
+            if real is None:
+                print(f"⚠️ {self.nombre} no tiene el campo '{nombre}'; se usa el valor por defecto")
+            elif real not in reales:
+                reales.append(real)
+        return reales
+
+    def longitud(self, nombre):
+        """Longitud máxima del campo de texto (None si no la publica)."""
+        real = self.buscar([nombre])
+        return (self.campos.get(real) or {}).get("length") if real else None
+
+
+# {url de la capa: (schemaLastEditDate, Esquema)}: una entrada por capa
+_CACHE = {}
+_CANDADO = threading.Lock()
+
+
+def esquema(layer):
+    """Esquema de la capa, leído una sola vez por cada schemaLastEditDate."""
+    clave = getattr(layer, "url", None) or id(layer)
+    marca = marca_esquema(layer)
+    with _CANDADO:
+        guardado = _CACHE.get(clave)
+        if marca is None or guardado is None or guardado[0] != marca:
+            # sin marca no se sabe si cambió: se arma de nuevo con las propiedades actuales;
+            # un esquema nuevo reemplaza al anterior de la misma capa
+            guardado = _CACHE[clave] = (marca, Esquema(layer.properties))
+        return guardado[1]
@@ -0,0 +1,105 @@
+"""
+Modo por flujo (FLUJO=1). En lugar de leer todas las denuncias, armar todas las
+tareas y recién entonces escribir, las páginas de denuncias pasan por las etapas
+(asignar, crear tareas, copiar adjuntos, actualizar) como generadores, cada una
+en su hilo y unidas por colas acotadas. Cada lote se escribe apenas está listo:
+la memoria no crece con el backlog y las primeras tareas llegan a Workforce
+mientras se siguen leyendo las páginas siguientes.
+
+    for lote in encadenar(fuente, etapa_1, etapa_2):
+        ...
+
+Cada etapa es una función que recibe un iterable de lotes y genera lotes; con
+maximo=0 todo corre en el hilo actual, uno tras otro (como sin FLUJO).
+"""
+import os
+import queue
+import threading
+
+# Lotes que pueden esperar entre una etapa y la siguiente
+COLA = int(os.getenv("FLUJO_COLA", "2"))
+# Denuncias por lote (página de la consulta)
+LOTE = int(os.getenv("FLUJO_LOTE", "500"))
+
+_FIN = object()
+
+
+class _Error:
+    """Excepción de una etapa, para volver a lanzarla en quien consume la cola."""
+
+    def __init__(self, excepcion):
+        self.excepcion = excepcion
+
+
+def modo_flujo():
+    """El modo por flujo se activa con FLUJO=1."""
+    return os.getenv("FLUJO", "0").strip().lower() in ("1", "true", "si", "sí")
+
+
+def tramos(df, tamano=LOTE):
+    """Partes consecutivas de tamano filas de un DataFrame ya leído."""
+    for inicio in range(0, len(df), tamano):
+        yield df.iloc[inicio:inicio + tamano]
+
+
+def en_segundo_plano(iterable, maximo=COLA):
+    """
+    Recorre iterable en un hilo aparte y entrega sus elementos a través de una
+    cola de maximo elementos: el productor se detiene cuando la cola se llena.
+    Una excepción del productor se vuelve a lanzar aquí.
+    """
+    cola = queue.Queue(maxsize=maximo)
+    detener = threading.Event()
+
+    def poner(elemento):
+        while not detener.is_set():
+            try:
+                cola.put(elemento, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def producir():
+        try:
+            for elemento in iterable:
+                if not poner(elemento):
+                    return
+        except Exception as e:
+            poner(_Error(e))
+            return
+        finally:
+            # cierra en este mismo hilo la etapa anterior si quedó a medias
+            cerrar = getattr(iterable, "close", None)
+            if cerrar:
+                cerrar()
+        poner(_FIN)
+
+    hilo = threading.Thread(target=producir, daemon=True)
+    hilo.start()
+    try:
+        while True:
+            elemento = cola.get()
+            if elemento is _FIN:
+                return
+            if isinstance(elemento, _Error):
+                raise elemento.excepcion
+            yield elemento
+    finally:
+        # si quien consume se detiene antes de tiempo, el productor también
+        detener.set()
+        hilo.join()
+
+
+def encadenar(fuente, *etapas, maximo=COLA):
+    """
+    Une la fuente y las etapas con colas acotadas y devuelve un generador con la
+    salida de la última. La fuente y cada etapa salvo la última corren en su
+    propio hilo; la última, en el de quien consume. maximo=0: sin hilos.
+    """
+    flujo = iter(fuente)
+    for etapa in etapas:
+        if maximo:
+            flujo = en_segundo_plano(flujo, maximo)
+        flujo = etapa(flujo)
+    return flujo
@@ -0,0 +1,196 @@
+"""
+Geometrías de las tareas por columnas: se detecta una sola vez la columna de
+geometría, su forma y la referencia espacial de origen, se sacan x/y de todas
+las filas a arreglos de NumPy y se reproyectan juntas a la referencia de la capa
+de Workforce. WGS84 (4326) ↔ Web Mercator (3857/102100) se resuelve aquí; para
+otras referencias se usa pyproj si está instalado.
+"""
+import math
+from functools import lru_cache
+
+import numpy as np
+
+try:
+    from pyproj import CRS, Transformer
+except ImportError:  # opcional
+    CRS = Transformer = None
+
+# Columnas donde puede venir la geometría de la denuncia
+COLUMNAS_GEOMETRIA = ["SHAPE", "shape", "geometry", "geom", "SHAPE@XY", "Shape"]
+
+WGS84 = 4326
+WEB_MERCATOR = 3857
+# wkid antiguos o de ESRI que equivalen a Web Mercator
+_ALIAS = {102100: WEB_MERCATOR, 102113: WEB_MERCATOR, 900913: WEB_MERCATOR}
+
+_RADIO = 6378137.0
+_LATITUD_MAXIMA = 85.0511287798
+# radio medio de la Tierra para haversine
+_RADIO_MEDIO = 6371008.8
+
+
+class ErrorGeometria(Exception):
+    """No se puede reproyectar entre las referencias espaciales pedidas."""
+
+
+def normalizar_wkid(referencia):
+    """wkid (int) a partir de un número o de un dict spatialReference (latestWkid primero)."""
+    if referencia is None:
+        return None
+    if isinstance(referencia, dict):
+        referencia = referencia.get("latestWkid") or referencia.get("wkid")
+    try:
+        wkid = int(referencia)
+    except (TypeError, ValueError):
+        return None
+    return _ALIAS.get(wkid, wkid)
+
+
+@lru_cache(maxsize=None)
+def _geografica(wkid):
+    if wkid == WGS84:
+        return True
+    if wkid is None or wkid == WEB_MERCATOR:
+        return False
+    if CRS is not None:
+        try:
+            return CRS.from_epsg(wkid).is_geographic
+        except Exception:
+            pass
+    # sin pyproj: los códigos EPSG 4000-4999 son referencias geográficas (grados)
+    return 4000 <= wkid < 5000
+
+
+def geografica(referencia):
+    """True si las coordenadas de la referencia están en grados (p. ej. WGS84)."""
+    return _geografica(normalizar_wkid(referencia))
+
+
+def metros(x1, y1, x2, y2, wkid):
+    """
+    Distancia en metros entre (x1, y1) y (x2, y2), escalares o arreglos, en la
+    referencia wkid: haversine si está en grados; en Web Mercator la distancia
+    plana se corrige por el cos(latitud) del segundo punto; en otras proyectadas
+    se toma la distancia plana.
+    """
+    if geografica(wkid):
+        lat1, lat2 = np.radians(y1), np.radians(y2)
+        a = (np.sin((lat2 - lat1) / 2) ** 2
+             + np.cos(lat1) * np.cos(lat2) * np.sin(np.radians(np.subtract(x2, x1)) / 2) ** 2)
+        return 2 * _RADIO_MEDIO * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+    distancia = np.hypot(np.subtract(x2, x1), np.subtract(y2, y1))
+    if normalizar_wkid(wkid) == WEB_MERCATOR:
+        distancia = distancia * np.cos(2 * np.arctan(np.exp(np.divide(y2, _RADIO))) - np.pi / 2)
+    return distancia
+
+
+def wkid_capa(layer, defecto=WGS84):
+    """Referencia espacial nativa de la capa (spatialReference o la del extent)."""
+    try:
+        props = layer.properties
+        referencia = props.get("spatialReference") or (props.get("extent") or {}).get("spatialReference")
+    except Exception:
+        referencia = None
+    return normalizar_wkid(referencia) or defecto
+
+
+def columna_geometria(df, columnas=COLUMNAS_GEOMETRIA):
+    return next((c for c in columnas if c in df.columns), None)
+
+
+def _lector(muestra):
+    """Función (valor -> (x, y)) según la forma de la primera geometría no vacía."""
+    if isinstance(muestra, dict):
+        if "x" in muestra:
+            return lambda v: (v["x"], v["y"])
+        if "X" in muestra:
+            return lambda v: (v["X"], v["Y"])
+        if "coordinates" in muestra:
+            return lambda v: (v["coordinates"][0], v["coordinates"][1])
+    elif hasattr(muestra, "x") and hasattr(muestra, "y"):
+        return lambda v: (v.x, v.y)
+    elif isinstance(muestra, (list, tuple)) and len(muestra) >= 2:
+        return lambda v: (v[0], v[1])
+    return None
+
+
+def _vacio(valor):
+    return valor is None or (isinstance(valor, float) and math.isnan(valor))
+
+
+def coordenadas(valores):
+    """
+    Arreglos x, y (float, NaN donde no hay geometría) y el wkid que traen las
+    propias geometrías (o None).
+    """
+    valores = list(valores)
+    muestra = next((v for v in valores if not _vacio(v)), None)
+    n = len(valores)
+    x = np.full(n, np.nan)
+    y = np.full(n, np.nan)
+    lector = _lector(muestra)
+    if lector is None:
+        return x, y, None
+
+    for i, valor in enumerate(valores):
+        if _vacio(valor):
+            continue
+        try:
+            x[i], y[i] = lector(valor)
+        except (KeyError, IndexError, TypeError, ValueError, AttributeError):
+            pass  # forma distinta a la de la muestra: queda sin geometría
+
+    referencia = muestra.get("spatialReference") if isinstance(muestra, dict) else getattr(muestra, "spatialReference", None)
+    return x, y, normalizar_wkid(referencia)
+
+
+def reproyectar(x, y, origen, destino):
+    """Reproyecta los arreglos x, y de origen a destino (wkid) en un solo paso."""
+    origen, destino = normalizar_wkid(origen), normalizar_wkid(destino)
+    if origen == destino or origen is None or destino is None:
+        return x, y
+    if origen == WGS84 and destino == WEB_MERCATOR:
+        latitud = np.clip(y, -_LATITUD_MAXIMA, _LATITUD_MAXIMA)
+        return (np.radians(x) * _RADIO,
+                np.log(np.tan(np.pi / 4 + np.radians(latitud) / 2)) * _RADIO)
+    if origen == WEB_MERCATOR and destino == WGS84:
+        return (np.degrees(x / _RADIO),
+                np.degrees(2 * np.arctan(np.exp(y / _RADIO)) - np.pi / 2))
+    if Transformer is None:
+        raise ErrorGeometria(f"Para reproyectar de {origen} a {destino} hace falta pyproj")
+    transformador = Transformer.from_crs(f"EPSG:{origen}", f"EPSG:{destino}", always_xy=True)
+    return transformador.transform(x, y)
+
+
+def puntos(df, destino=WGS84, origen=None, columnas=COLUMNAS_GEOMETRIA):
+    """
+    Arreglos x, y de todas las filas en la referencia destino (NaN donde no hay
+    geometría) y el wkid en que quedaron. origen es la referencia de la capa de
+    denuncias; la que traigan las propias geometrías tiene prioridad.
+    """
+    col = columna_geometria(df, columnas)
+    if col is None:
+        vacio = np.full(len(df), np.nan)
+        return vacio, vacio.copy(), normalizar_wkid(destino)
+    x, y, propia = coordenadas(df[col].tolist())
+    origen = propia or normalizar_wkid(origen) or WGS84
+    destino = normalizar_wkid(destino) or origen
+    try:
+        x, y = reproyectar(x, y, origen, destino)
+    except ErrorGeometria as e:
+        # se envían en la referencia de origen y el servicio las proyecta
+        print(f"⚠️ {e}; las geometrías se envían en {origen}")
+        destino = origen
+    return np.asarray(x, dtype=float), np.asarray(y, dtype=float), destino
+
+
+def geometrias(df, destino=WGS84, origen=None, columnas=COLUMNAS_GEOMETRIA):
+    """Dicts de punto {"x", "y", "spatialReference"} en la referencia destino (None sin geometría)."""
+    if columna_geometria(df, columnas) is None:
+        return [None] * len(df)
+    x, y, wkid = puntos(df, destino, origen, columnas)
+    validos = ~(np.isnan(x) | np.isnan(y))
+    return [
+        {"x": xi, "y": yi, "spatialReference": {"wkid": wkid}} if ok else None
+        for xi, yi, ok in zip(x.tolist(), y.tolist(), validos.tolist())
+    ]
@@ -0,0 +1,233 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime, timezone
+
+import pandas as pd
+
+from asignador.adjuntos import copiar_adjuntos
+from asignador.escritura import aplicar_ediciones, existentes, exitosos
+
+# Base SQLite local con la marca de agua y el diario de cada etapa
+RUTA_ESTADO = os.getenv("ASIGNADOR_ESTADO", os.path.join(".estado", "asignador.sqlite"))
+# Campo que sirve de marca de agua: EditDate (edición) u objectid
+CAMPO_MARCA_AGUA = os.getenv("CAMPO_MARCA_AGUA", "EditDate")
+
+# Estados del diario por registro
+TAREA_CREADA = "tarea_creada"
+ADJUNTOS_COPIADOS = "adjuntos_copiados"
+COMPLETADO = "completado"
+
+
+def modo_incremental():
+    """El modo incremental se activa con INCREMENTAL=1."""
+    return os.getenv("INCREMENTAL", "0").strip().lower() in ("1", "true", "si", "sí")
+
+
+def _json(valor):
+    """Serializa tipos de numpy/pandas que json no conoce."""
+    if hasattr(valor, "item"):
+        return valor.item()
+    if hasattr(valor, "isoformat"):
+        return valor.isoformat()
+    return str(valor)
+
+
+def _a_numero(serie):
+    """Valores de la marca de agua como enteros (epoch ms para fechas)."""
+    if pd.api.types.is_datetime64_any_dtype(serie):
+        if getattr(serie.dt, "tz", None) is not None:
+            serie = serie.dt.tz_convert("UTC").dt.tz_localize(None)
+        return (serie - pd.Timestamp(0)) // pd.Timedelta(milliseconds=1)
+    return pd.to_numeric(serie, errors="coerce")
+
+
+class Diario:
+    """
+    Marca de agua y diario por registro de una etapa, guardados en SQLite.
+    La marca limita la consulta a registros nuevos; el diario permite terminar
+    en la siguiente ejecución lo que una ejecución interrumpida dejó a medias.
+    """
+
+    def __init__(self, etapa, ruta=RUTA_ESTADO, campo=CAMPO_MARCA_AGUA):
+        self.etapa = etapa
+        self.campo = campo
+        carpeta = os.path.dirname(ruta)
+        if carpeta:
+            os.makedirs(carpeta, exist_ok=True)
+        # con FLUJO=1 las etapas escriben en el diario desde sus propios hilos
+        self._con = sqlite3.connect(ruta, check_same_thread=False)
+        self._candado = threading.Lock()
+        self._con.executescript("""
+            CREATE TABLE IF NOT EXISTS marca_agua (
+                etapa TEXT PRIMARY KEY, campo TEXT, valor INTEGER, actualizado REAL
+            );
+            CREATE TABLE IF NOT EXISTS diario (
+                etapa TEXT, objectid INTEGER, estado TEXT, oid_tarea INTEGER,
+                actualizacion TEXT, actualizado REAL,
+                PRIMARY KEY (etapa, objectid)
+            );
+        """)
+        self._con.commit()
+
+    def cerrar(self):
+        self._con.close()
+
+    # --- Marca de agua ---------------------------------------------------------
+
+    def marca(self):
+        fila = self._con.execute(
+            "SELECT valor FROM marca_agua WHERE etapa = ? AND campo = ?", (self.etapa, self.campo)
+        ).fetchone()
+        return fila[0] if fila else None
+
+    def filtro(self, where):
+        """Agrega al WHERE la condición de registros posteriores a la marca."""
+        marca = self.marca()
+        if marca is None:
+            return where
+        if self.campo.lower() == "objectid":
+            return f"({where}) AND {self.campo} > {int(marca)}"
+        # la marca se guarda en ms; TIMESTAMP trabaja en segundos, por eso >=
+        instante = datetime.fromtimestamp(marca / 1000, tz=timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+        return f"({where}) AND {self.campo} >= TIMESTAMP '{instante}'"
+
+    def avanzar(self, df, completados, col_oid="objectid"):
+        """
+        Mueve la marca hasta el último registro leído sin dejar atrás a ninguno
+        que siga pendiente (sin inspector, con error, etc.).
+        """
+        if df.empty or self.campo not in df.columns:
+            return
+        valores = _a_numero(df[self.campo])
+        pendientes = ~df[col_oid].isin(set(completados))
+        nueva = valores.max()
+        if pendientes.any():
+            nueva = min(nueva, valores[pendientes].min() - 1)
+        if pd.isna(nueva):
+            return
+        actual = self.marca()
+        if actual is None or nueva > actual:
+            self._con.execute(
+                "INSERT OR REPLACE INTO marca_agua VALUES (?, ?, ?, ?)",
+                (self.etapa, self.campo, int(nueva), time.time())
+            )
+            self._con.commit()
+            print(f"🔖 Marca de agua de {self.etapa}: {self.campo} = {int(nueva)}")
+
+    # --- Diario por registro ---------------------------------------------------
+
+    def registrar(self, entradas):
+        """entradas: lista de (objectid, estado, oid_tarea, actualizacion_denuncia)."""
+        ahora = time.time()
+        filas = [
+            (self.etapa, int(oid), estado, oid_tarea,
+             json.dumps(act, default=_json) if act is not None else None, ahora)
+            for oid, estado, oid_tarea, act in entradas
+        ]
+        with self._candado:
+            self._con.executemany(
+                """INSERT INTO diario VALUES (?, ?, ?, ?, ?, ?)
+                   ON CONFLICT (etapa, objectid) DO UPDATE SET
+                       estado = excluded.estado,
+                       oid_tarea = COALESCE(excluded.oid_tarea, diario.oid_tarea),
+                       actualizacion = COALESCE(excluded.actualizacion, diario.actualizacion),
+                       actualizado = excluded.actualizado""",
+                filas
+            )
+            self._con.commit()
+
+    def a_medias(self):
+        """{objectid: (estado, oid_tarea, actualizacion)} de los registros sin completar."""
+        with self._candado:
+            filas = self._con.execute(
+                "SELECT objectid, estado, oid_tarea, actualizacion FROM diario WHERE etapa = ? AND estado != ?",
+                (self.etapa, COMPLETADO)
+            ).fetchall()
+        return {oid: (estado, oid_tarea, json.loads(act) if act else None) for oid, estado, oid_tarea, act in filas}
+
+    def purgar(self, dias=30):
+        """Borra del diario los registros completados hace más de `dias` días."""
+        self._con.execute(
+            "DELETE FROM diario WHERE etapa = ? AND estado = ? AND actualizado < ?",
+            (self.etapa, COMPLETADO, time.time() - dias * 86400)
+        )
+        self._con.commit()
+
+
+class TareasPrevias:
+    """
+    Cómo reconocer en Workforce las tareas de una etapa. layer: capa de
+    asignaciones; tipo: su assignmenttype; col_clave: columna de la denuncia
+    que va en workorderid; campos: los de la tarea que necesita actualizacion;
+    actualizacion(oid, clave, atributos_tarea): la actualización de la denuncia
+    que la etapa habría guardado en el diario junto con la tarea.
+    """
+
+    def __init__(self, layer, tipo, col_clave, actualizacion, campos=()):
+        self.layer = layer
+        self.tipo = tipo
+        self.col_clave = col_clave
+        self.actualizacion = actualizacion
+        self.campos = tuple(campos)
+
+    def buscar(self, diario, df, col_oid):
+        """
+        Las tareas de los registros de df que ya están en Workforce aunque el
+        diario no las tenga (la ejecución se cortó entre crearlas y anotarlas).
+        Las anota en el diario como creadas y devuelve sus entradas de a_medias.
+        """
+        if df.empty:
+            return {}
+        oids = df[col_oid].tolist()
+        claves = df[self.col_clave].astype(object).map(str).tolist()
+        adds = [{"attributes": {"workorderid": clave, "assignmenttype": self.tipo}} for clave in claves]
+        encontradas = existentes(self.layer, adds, campos=self.campos) or {}
+        if not encontradas:
+            return {}
+        entradas = [
+            (int(oids[i]), TAREA_CREADA, resultado.get("objectId"),
+             self.actualizacion(oids[i], claves[i], resultado.get("attributes") or {}))
+            for i, resultado in encontradas.items()
+        ]
+        print(f"♻️ {len(entradas)} tareas de {diario.etapa} ya estaban en Workforce; no se vuelven a crear")
+        diario.registrar(entradas)
+        return {oid: (estado, oid_tarea, act) for oid, estado, oid_tarea, act in entradas}
+
+
+def reanudar(diario, df, layer_denuncias, layer_asignaciones=None, col_oid="objectid", previas=None):
+    """
+    Termina los registros de df que una ejecución anterior dejó a medias: si la
+    tarea ya existe no se vuelve a crear; se copian los adjuntos que falten y se
+    aplica la actualización de la denuncia guardada en el diario. previas
+    (TareasPrevias) busca además en Workforce las tareas que el diario no
+    alcanzó a anotar. Devuelve (df sin esos registros, objectids completados aquí).
+    """
+    if df.empty:
+        return df, set()
+    a_medias = diario.a_medias()
+    if previas is not None:
+        a_medias.update(previas.buscar(diario, df[~df[col_oid].isin(list(a_medias))], col_oid))
+    if not a_medias:
+        return df, set()
+    presentes = df[df[col_oid].isin(list(a_medias))][col_oid].tolist()
+    if not presentes:
+        return df, set()
+    print(f"♻️ Reanudando {len(presentes)} registros que quedaron a medias en {diario.etapa}")
+
+    pares = [(oid, a_medias[oid][1]) for oid in presentes if a_medias[oid][0] == TAREA_CREADA]
+    if pares and layer_asignaciones is not None:
+        # la copia pudo quedar a medias: no se repiten los adjuntos que ya subió
+        copiar_adjuntos(layer_denuncias, layer_asignaciones, pares, revisar=[t for _, t in pares])
+        diario.registrar([(oid, ADJUNTOS_COPIADOS, None, None) for oid, _ in pares])
+
+    completados = set()
+    updates = [(oid, a_medias[oid][2]) for oid in presentes if a_medias[oid][2]]
+    if updates:
+        respuesta = aplicar_ediciones(layer_denuncias, updates=[u for _, u in updates])
+        completados = {oid for (oid, _), ok in zip(updates, exitosos(respuesta["updateResults"])) if ok}
+        diario.registrar([(oid, COMPLETADO, None, None) for oid in completados])
+
+    return df[~df[col_oid].isin(presentes)], completados
@@ -0,0 +1,234 @@
+import cProfile
+import io
+import json
+import os
+import pstats
+import re
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+# Carpeta donde se escribe un JSON por ejecución (se sube como artefacto en Actions)
+CARPETA = os.getenv("METRICAS_DIR", "metricas")
+# "cprofile" o "tracemalloc" para perfilar la ejecución; vacío = sin perfil
+PERFILAR = os.getenv("PERFILAR", "").strip().lower()
+LINEAS_PERFIL = 25
+# Ejecuciones de un mismo nombre que se conservan en la carpeta (0 = todas)
+CONSERVAR = int(os.getenv("METRICAS_CONSERVAR", "0"))
+
+
+class Fase:
+    """Medición en curso; registros se puede fijar dentro del bloque."""
+
+    def __init__(self, registros=0):
+        self.registros = registros
+
+
+class Metricas:
+    """
+    Tiempo por fase, peticiones HTTP y bytes de una ejecución. Las fases se
+    acumulan por etapa ("inspeccion.consulta", "supervision.ediciones", ...);
+    es seguro usarla desde los hilos de ediciones y adjuntos.
+    """
+
+    def __init__(self):
+        self._candado = threading.Lock()
+        self.reiniciar()
+
+    def reiniciar(self, nombre=None):
+        self.nombre = nombre
+        self.inicio = time.time()
+        self.etapa = None
+        self.fases = {}
+        self.http = {}
+        self.contadores = {}
+
+    def _clave(self, nombre):
+        return f"{self.etapa}.{nombre}" if self.etapa else nombre
+
+    @contextmanager
+    def fase(self, nombre, registros=0):
+        medicion = Fase(registros)
+        clave = self._clave(nombre)
+        inicio = time.perf_counter()
+        try:
+            yield medicion
+        finally:
+            segundos = time.perf_counter() - inicio
+            with self._candado:
+                acumulado = self.fases.setdefault(clave, {"segundos": 0.0, "veces": 0, "registros": 0})
+                acumulado["segundos"] += segundos
+                acumulado["veces"] += 1
+                acumulado["registros"] += medicion.registros or 0
+
+    def registrar_peticion(self, enviado, recibido):
+        with self._candado:
+            for clave in ("total", self.etapa):
+                if clave is None:
+                    continue
+                http = self.http.setdefault(clave, {"peticiones": 0, "bytes_enviados": 0, "bytes_recibidos": 0})
+                http["peticiones"] += 1
+                http["bytes_enviados"] += enviado
+                http["bytes_recibidos"] += recibido
+
+    def sumar(self, nombre, **valores):
+        """Suma contadores propios de una fase (p. ej. aciertos de la caché de adjuntos)."""
+        with self._candado:
+            contador = self.contadores.setdefault(self._clave(nombre), {})
+            for clave, valor in valores.items():
+                contador[clave] = contador.get(clave, 0) + valor
+
+    def resumen(self):
+        fases = {}
+        for clave, f in self.fases.items():
+            fases[clave] = {
+                "segundos": round(f["segundos"], 3),
+                "veces": f["veces"],
+                "registros": f["registros"],
+                "registros_por_segundo": round(f["registros"] / f["segundos"], 1) if f["registros"] and f["segundos"] else None,
+            }
+        return {
+            "ejecucion": self.nombre,
+            "inicio": datetime.fromtimestamp(self.inicio, timezone.utc).isoformat().replace("+00:00", "Z"),
+            "segundos": round(time.time() - self.inicio, 3),
+            "http": self.http.get("total", {"peticiones": 0, "bytes_enviados": 0, "bytes_recibidos": 0}),
+            "http_por_etapa": {k: v for k, v in self.http.items() if k != "total"},
+            "fases": fases,
+            "contadores": self.contadores,
+        }
+
+
+METRICAS = Metricas()
+
+
+def fase(nombre, registros=0):
+    """with fase("consulta") as f: ...; f.registros = n"""
+    return METRICAS.fase(nombre, registros)
+
+
+def sumar(nombre, **valores):
+    METRICAS.sumar(nombre, **valores)
+
+
+def registrar_peticion(enviado, recibido):
+    METRICAS.registrar_peticion(enviado, recibido)
+
+
+@contextmanager
+def etapa(nombre):
+    """Atribuye a la etapa las fases y peticiones del bloque."""
+    anterior = METRICAS.etapa
+    METRICAS.etapa = nombre
+    try:
+        yield
+    finally:
+        METRICAS.etapa = anterior
+
+
+def _contar(send):
+    """send de un adaptador que además registra la petición y sus bytes."""
+    def contar(request, *args, **kwargs):
+        respuesta = send(request, *args, **kwargs)
+        cuerpo = request.body
+        enviado = len(cuerpo) if isinstance(cuerpo, (bytes, str)) else 0
+        recibido = int(respuesta.headers.get("Content-Length") or 0)
+        if not recibido and not kwargs.get("stream"):
+            recibido = len(respuesta.content or b"")
+        registrar_peticion(enviado, recibido)
+        return respuesta
+
+    contar._metricas = True
+    return contar
+
+
+def instrumentar_http(sesion):
+    """
+    Cuenta peticiones y bytes de lo que pase por la sesión (gis.session de
+    arcgis o la requests.Session del motor rest). Se envuelve el send de los
+    adaptadores montados en esa sesión, no la clase HTTPAdapter: otras
+    sesiones del proceso no se tocan.
+    """
+    adaptadores = getattr(sesion, "adapters", None) or {}
+    for adaptador in {id(a): a for a in adaptadores.values()}.values():
+        if not getattr(adaptador.send, "_metricas", False):
+            adaptador.send = _contar(adaptador.send)
+
+
+def _perfil_cprofile(perfil, base):
+    perfil.dump_stats(f"{base}.prof")
+    texto = io.StringIO()
+    pstats.Stats(perfil, stream=texto).sort_stats("cumulative").print_stats(LINEAS_PERFIL)
+    return texto.getvalue().splitlines()
+
+
+def _perfil_memoria():
+    _, pico = tracemalloc.get_traced_memory()
+    lineas = tracemalloc.take_snapshot().statistics("lineno")[:LINEAS_PERFIL]
+    tracemalloc.stop()
+    return {
+        "pico_mb": round(pico / 1024 / 1024, 1),
+        "lineas": [f"{l.traceback[0].filename}:{l.traceback[0].lineno} {l.size / 1024:.1f} KiB" for l in lineas],
+    }
+
+
+def _rotar(carpeta, nombre, conservar):
+    """Borra los archivos (.json y .prof) de las ejecuciones más viejas de `nombre`."""
+    patron = re.compile(rf"^{re.escape(nombre)}_(\d{{8}}_\d{{6}})\.(json|prof)$")
+    archivos = {}
+    for archivo in os.listdir(carpeta):
+        coincide = patron.match(archivo)
+        if coincide:
+            archivos.setdefault(coincide.group(1), []).append(archivo)
+    # la fecha del nombre ordena de la más vieja a la más nueva
+    for fecha in sorted(archivos)[:-conservar]:
+        for archivo in archivos[fecha]:
+            try:
+                os.remove(os.path.join(carpeta, archivo))
+            except OSError:
+                pass
+
+
+@contextmanager
+def ejecucion(nombre, carpeta=None, perfilar=None, conservar=None):
+    """
+    Mide una ejecución completa y al terminar escribe metricas/<nombre>_<fecha>.json.
+    Con PERFILAR=cprofile guarda además el .prof; con PERFILAR=tracemalloc, las
+    líneas que más memoria reservaron. Con conservar (o METRICAS_CONSERVAR) se
+    dejan solo las últimas ejecuciones de ese nombre.
+    """
+    carpeta = carpeta or CARPETA
+    perfilar = PERFILAR if perfilar is None else perfilar
+    conservar = CONSERVAR if conservar is None else conservar
+    METRICAS.reiniciar(nombre)
+
+    perfil = None
+    if perfilar == "cprofile":
+        perfil = cProfile.Profile()
+        perfil.enable()
+    elif perfilar == "tracemalloc" and not tracemalloc.is_tracing():
+        tracemalloc.start()
+
+    try:
+        yield METRICAS
+    finally:
+        os.makedirs(carpeta, exist_ok=True)
+        base = os.path.join(carpeta, f"{nombre}_{datetime.now(timezone.utc):%Y%m%d_%H%M%S}")
+        resumen = METRICAS.resumen()
+        if perfil is not None:
+            perfil.disable()
+            resumen["perfil"] = _perfil_cprofile(perfil, base)
+        elif perfilar == "tracemalloc" and tracemalloc.is_tracing():
+            resumen["memoria"] = _perfil_memoria()
+        with open(f"{base}.json", "w", encoding="utf-8") as f:
+            json.dump(resumen, f, indent=2, ensure_ascii=False)
+        if conservar:
+            _rotar(carpeta, nombre, conservar)
+
+        http = resumen["http"]
+        print(f"📊 {nombre}: {resumen['segundos']} s, {http['peticiones']} peticiones, "
+              f"{http['bytes_enviados'] / 1024:.0f} KiB enviados, {http['bytes_recibidos'] / 1024:.0f} KiB recibidos")
+        for clave, datos in resumen["fases"].items():
+            velocidad = f" ({datos['registros_por_segundo']} reg/s)" if datos["registros_por_segundo"] else ""
+            print(f"   {clave}: {datos['segundos']} s{velocidad}")
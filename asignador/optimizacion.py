@@ -0,0 +1,146 @@
+"""
+Asignación de todo el lote a la vez (MODO_ASIGNACION=optimo). En lugar de
+decidir cada denuncia por separado en el orden en que llegan, se resuelve por
+grupo (direccion, area) un problema de asignación de costo mínimo: cada persona
+ofrece "casillas" (su siguiente trámite, el otro, ...) con costo creciente
+
+    ESPACIAL_PESO_CARGA * (num_tramites + casilla) + distancia (m)
+
+y cada denuncia ocupa una casilla de una persona elegible. Con
+scipy.optimize.linear_sum_assignment (Hungarian/Jonker-Volgenant) el resultado
+es el óptimo global. OPTIMO_CAPACIDAD limita los trámites por persona.
+
+Sin distancias (sin ubicaciones o sin geometría) el costo solo depende de la
+carga y el montículo de IndiceCarga ya da el óptimo, así que se usa ese camino;
+también es el respaldo cuando scipy no está instalado.
+"""
+import math
+import os
+import warnings
+
+import numpy as np
+
+from asignador.geometria import metros
+from asignador.metricas import fase
+
+try:
+    from scipy.optimize import linear_sum_assignment
+except ImportError:  # opcional: sin scipy se asigna con el montículo
+    linear_sum_assignment = None
+
+# Trámites máximos por persona (0 = sin límite)
+CAPACIDAD = int(os.getenv("OPTIMO_CAPACIDAD", "0"))
+# Casillas de más por persona sobre el reparto parejo (margen para la distancia)
+HOLGURA = int(os.getenv("OPTIMO_HOLGURA", "5"))
+
+
+def modo_optimo():
+    """La asignación por lote se activa con MODO_ASIGNACION=optimo."""
+    return os.getenv("MODO_ASIGNACION", "carga").strip().lower() == "optimo"
+
+
+def _libres(reg, capacidad):
+    if not capacidad:
+        return None
+    return max(0, capacidad - reg.num_tramites)
+
+
+def _voraz(indice, grupos, capacidad):
+    """Una denuncia tras otra con el montículo, sin pasar de la capacidad."""
+    asignados = []
+    for grupo in grupos:
+        reg = indice.primero(grupo)
+        if reg is None or _libres(reg, capacidad) == 0:
+            asignados.append(None)
+            continue
+        asignados.append(indice.asignar(grupo))
+    return asignados
+
+
+def _casillas(indice, miembros, cantidad, capacidad):
+    """(orden, casilla) ofrecidas por las personas del grupo para cantidad denuncias."""
+    nums = [indice.registros[o].num_tramites for o in miembros]
+    # nivel parejo al que llegaría el grupo repartiendo cantidad trámites
+    parejo = math.ceil((sum(nums) + cantidad) / len(miembros))
+    casillas = []
+    for orden, num in zip(miembros, nums):
+        tope = max(0, parejo - num) + HOLGURA
+        libres = _libres(indice.registros[orden], capacidad)
+        if libres is not None:
+            tope = min(tope, libres)
+        casillas.extend((orden, s) for s in range(min(tope, cantidad)))
+    return casillas
+
+
+def _resolver_grupo(indice, miembros, filas, distancias, peso_carga, capacidad):
+    """
+    Asignación de costo mínimo de las filas (denuncias) del grupo a casillas.
+    distancias: matriz filas x miembros en metros. Devuelve {fila: orden}.
+    """
+    casillas = _casillas(indice, miembros, len(filas), capacidad)
+    if not casillas:
+        return {}
+    columna = {orden: j for j, orden in enumerate(miembros)}
+    carga = np.array([peso_carga * (indice.registros[o].num_tramites + s) for o, s in casillas])
+    costo = distancias[:, [columna[o] for o, _ in casillas]] + carga[None, :]
+    if len(filas) > len(casillas):
+        # no alcanza la capacidad: se prefieren las denuncias que llegaron antes
+        bono = (costo.max() - costo.min() + 1.0) * np.arange(len(filas), 0, -1)
+        costo = costo - bono[:, None]
+    filas_ok, columnas_ok = linear_sum_assignment(costo)
+    return {filas[f]: casillas[c][0] for f, c in zip(filas_ok.tolist(), columnas_ok.tolist())}
+
+
+def asignar_lote(indice, grupos, espacial=None, x=None, y=None, peso_carga=None, capacidad=None):
+    """
+    Asigna todas las denuncias y devuelve, por fila, el registro elegido (ya
+    contado en el índice) o None. grupos: grupo de cada denuncia. espacial
+    (AsignadorEspacial), x e y aportan las distancias; sin ellos se reparte por carga.
+    """
+    capacidad = CAPACIDAD if capacidad is None else capacidad
+    grupos = list(grupos)
+    usar_solver = (linear_sum_assignment is not None and espacial is not None
+                   and x is not None and not np.isnan(np.asarray(x, dtype=float)).all())
+
+    with fase("optimizacion", registros=len(grupos)):
+        if not usar_solver:
+            if linear_sum_assignment is None and espacial is not None:
+                print("⚠️ scipy no está instalado: se asigna por carga, una denuncia tras otra")
+            return _voraz(indice, grupos, capacidad)
+
+        peso_carga = espacial.peso_carga if peso_carga is None else peso_carga
+        x = np.asarray(x, dtype=float)
+        y = np.asarray(y, dtype=float)
+        filas_por_grupo = {}
+        for fila, grupo in enumerate(grupos):
+            filas_por_grupo.setdefault(grupo, []).append(fila)
+
+        elegidos = {}
+        for grupo, filas in filas_por_grupo.items():
+            miembros = indice.miembros(grupo)
+            if not miembros:
+                continue
+            distancias = metros(espacial.x[miembros][None, :], espacial.y[miembros][None, :],
+                                x[filas][:, None], y[filas][:, None], espacial.wkid)
+            if np.isnan(distancias).any():
+                # sin ubicación (denuncia o persona) se usa la distancia media de la fila
+                with warnings.catch_warnings():
+                    warnings.simplefilter("ignore", RuntimeWarning)
+                    media = np.nan_to_num(np.nanmean(distancias, axis=1))
+                distancias = np.where(np.isnan(distancias), media[:, None], distancias)
+            elegidos.update(_resolver_grupo(indice, miembros, filas, distancias, peso_carga, capacidad))
+
+        # los contadores avanzan en el orden de las denuncias (así se numeran los formularios)
+        asignados = []
+        recorrido = 0.0
+        for fila in range(len(grupos)):
+            orden = elegidos.get(fila)
+            if orden is None:
+                asignados.append(None)
+                continue
+            asignados.append(indice.tomar(indice.registros[orden]))
+            if not np.isnan(x[fila]):
+                recorrido += espacial.distancia(orden, x[fila], y[fila]) or 0.0
+        print(f"🧮 Asignación óptima: {sum(a is not None for a in asignados)}/{len(grupos)} denuncias, "
+              f"recorrido {recorrido / 1000:.1f} km")
+        return asignados
@@ -0,0 +1,73 @@
+"""
+Registros compactos del personal (inspectores, comisarios). La tabla se lee una
+vez y cada fila se convierte en una Persona con __slots__: las columnas reales
+vienen ya resueltas por el esquema de la tabla y los contadores quedan como
+enteros, así el recorrido de asignación usa atributos simples, sin Series de
+pandas ni manejo de excepciones por campo.
+"""
+import math
+from dataclasses import dataclass
+
+from asignador.asignacion import _entero
+
+
+@dataclass(slots=True)
+class Persona:
+    """Una fila de la tabla de personal con las columnas ya resueltas."""
+    oid: int
+    nombre: object = None
+    usuario: object = None
+    siglas: object = None
+    grupo: object = None  # (direccion, area) o None si no se agrupa
+    num_tramites: int = 0
+    ultimo_numero: int = 0
+    x: float = math.nan  # longitud (WGS84) de la ubicación fija, si la tabla la tiene
+    y: float = math.nan
+
+
+def _numero(valor):
+    try:
+        return float(valor)
+    except (TypeError, ValueError):
+        return math.nan
+
+
+def personas(df, mapa, defectos=None):
+    """
+    Convierte la tabla de personal en una lista de Persona. mapa: {campo
+    lógico: columna real} (ver esquema.resolver). Un campo sin columna toma su
+    valor de defectos (p. ej. {"nombre": "SinNombre"}) o None.
+    """
+    defectos = defectos or {}
+    n = len(df)
+
+    def columna(campo):
+        col = mapa.get(campo)
+        if col is None or col not in df.columns:
+            return [defectos.get(campo)] * n
+        return df[col].tolist()
+
+    oids = columna("objectid")
+    if mapa.get("direccion") or mapa.get("area"):
+        grupos = list(zip(columna("direccion"), columna("area")))
+    else:
+        grupos = [None] * n
+
+    lista = [
+        Persona(
+            oid=_entero(oid, None),
+            nombre=nombre,
+            usuario=usuario,
+            siglas=siglas,
+            grupo=grupo,
+            num_tramites=_entero(num),
+            ultimo_numero=_entero(ultimo),
+            x=_numero(x),
+            y=_numero(y),
+        )
+        for oid, nombre, usuario, siglas, grupo, num, ultimo, x, y in zip(
+            oids, columna("nombre"), columna("usuario"), columna("siglas"), grupos,
+            columna("num_tramites"), columna("ultimo_numero"), columna("longitud"), columna("latitud"),
+        )
+    ]
+    return lista
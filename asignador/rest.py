@@ -0,0 +1,326 @@
+"""
+Motor liviano (MOTOR=rest): habla directo con los endpoints REST del portal y
+de los servicios de entidades con una sesión HTTP con pool de conexiones y
+features en JSON plano, sin importar arcgis. Expone la misma parte de la API
+que usan los scripts (content.get, layers/tables, query, edit_features, calculate,
+attachments, properties), así que se puede pasar a Contexto en lugar del GIS.
+"""
+import decimal
+import json
+import os
+import threading
+import time
+from datetime import date, datetime
+
+import pandas as pd
+import requests
+from requests.adapters import HTTPAdapter
+
+# Conexiones por host; alcanza para los hilos de adjuntos y de ediciones
+CONEXIONES = int(os.getenv("REST_CONEXIONES", "16"))
+TIEMPO_ESPERA = float(os.getenv("REST_TIMEOUT", "120"))
+# Minutos de validez pedidos para el token
+VIGENCIA_TOKEN = 120
+
+
+class ErrorRest(Exception):
+    """Error devuelto por el servicio en el cuerpo JSON ({"error": {...}})."""
+
+
+def _fecha_json(valor):
+    """Igual que el _date_handler de arcgis: fechas a epoch ms y tipos de numpy a nativos."""
+    if valor is pd.NaT:
+        return None
+    if type(valor) is date:
+        valor = datetime.combine(valor, datetime.min.time())
+    if isinstance(valor, datetime):
+        return int(valor.timestamp() * 1000)
+    if isinstance(valor, decimal.Decimal):
+        return float(valor)
+    if hasattr(valor, "tolist"):
+        return valor.tolist()
+    if hasattr(valor, "item"):
+        return valor.item()
+    raise TypeError(f"{type(valor).__name__} no es serializable")
+
+
+def _json(obj):
+    return json.dumps(obj, default=_fecha_json)
+
+
+class Propiedades(dict):
+    """dict con acceso por atributo, como el PropertyMap de arcgis."""
+
+    def __getattr__(self, nombre):
+        try:
+            valor = self[nombre]
+        except KeyError:
+            raise AttributeError(nombre)
+        return Propiedades(valor) if isinstance(valor, dict) else valor
+
+
+class Feature:
+    def __init__(self, geometry=None, attributes=None):
+        self.geometry = geometry
+        self.attributes = attributes if attributes is not None else {}
+
+    @property
+    def as_dict(self):
+        d = {"attributes": self.attributes}
+        if self.geometry is not None:
+            d["geometry"] = self.geometry
+        return d
+
+
+class FeatureSet:
+    """Resultado de query en JSON plano; mismo constructor que arcgis.features.FeatureSet."""
+
+    def __init__(self, features, fields=None, has_z=False, has_m=False, geometry_type=None,
+                 spatial_reference=None, display_field_name=None, object_id_field_name=None,
+                 global_id_field_name=None):
+        self.features = list(features)
+        self.fields = fields or []
+        self.geometry_type = geometry_type
+        self.spatial_reference = spatial_reference
+        self.object_id_field_name = object_id_field_name
+        self.global_id_field_name = global_id_field_name
+        # exceededTransferLimit de la respuesta (None si no se sabe)
+        self.exceeded_transfer_limit = None
+
+    @property
+    def sdf(self):
+        """DataFrame con fechas convertidas y la geometría (dict con spatialReference) en la columna SHAPE."""
+        columnas = [f["name"] for f in self.fields]
+        df = pd.DataFrame([f.attributes for f in self.features], columns=columnas or None)
+        for campo in self.fields:
+            if campo.get("type") == "esriFieldTypeDate" and campo["name"] in df.columns:
+                df[campo["name"]] = pd.to_datetime(df[campo["name"]], unit="ms")
+        if any(f.geometry is not None for f in self.features):
+            # como arcgis, cada geometría lleva la referencia espacial del resultado
+            referencia = {"spatialReference": self.spatial_reference} if self.spatial_reference else {}
+            df["SHAPE"] = [dict(f.geometry, **referencia) if f.geometry else None for f in self.features]
+        return df
+
+
+class SesionRest:
+    """requests.Session con pool de conexiones y token del portal."""
+
+    def __init__(self, portal, usuario, clave):
+        self.portal = portal.rstrip("/")
+        self.usuario = usuario
+        self._clave = clave
+        self._token = None
+        self._vence = 0
+        # los hilos de ediciones y adjuntos piden el token a la vez: uno solo lo renueva
+        self._candado_token = threading.Lock()
+        self.http = requests.Session()
+        adaptador = HTTPAdapter(pool_connections=CONEXIONES, pool_maxsize=CONEXIONES)
+        self.http.mount("https://", adaptador)
+        self.http.mount("http://", adaptador)
+
+    def _vigente(self):
+        # se renueva un minuto antes de vencer
+        return self._token is not None and time.time() <= self._vence - 60
+
+    def token(self):
+        if self._vigente():
+            return self._token
+        with self._candado_token:
+            # otro hilo pudo renovarlo mientras se esperaba el candado
+            if not self._vigente():
+                respuesta = self.http.post(
+                    f"{self.portal}/sharing/rest/generateToken",
+                    data={
+                        "username": self.usuario, "password": self._clave, "referer": self.portal,
+                        "expiration": VIGENCIA_TOKEN, "f": "json",
+                    },
+                    timeout=TIEMPO_ESPERA,
+                )
+                datos = self._leer(respuesta)
+                self._vence = datos.get("expires", (time.time() + VIGENCIA_TOKEN * 60) * 1000) / 1000
+                self._token = datos["token"]
+            return self._token
+
+    @staticmethod
+    def _leer(respuesta):
+        respuesta.raise_for_status()
+        datos = respuesta.json()
+        if isinstance(datos, dict) and "error" in datos:
+            error = datos["error"]
+            raise ErrorRest(f"{error.get('code')}: {error.get('message')} {error.get('details') or ''}".strip())
+        return datos
+
+    def get(self, url, params=None):
+        """GET que devuelve el JSON; misma forma que get(path, params) de la conexión de arcgis."""
+        params = dict(params or {}, f="json", token=self.token())
+        return self._leer(self.http.get(url, params=params, timeout=TIEMPO_ESPERA))
+
+    def post(self, url, archivos=None, **datos):
+        datos.update({"f": "json", "token": self.token()})
+        return self._leer(self.http.post(url, data=datos, files=archivos, timeout=TIEMPO_ESPERA))
+
+    def descargar(self, url, destino):
+        with self.http.get(url, params={"token": self.token()}, stream=True, timeout=TIEMPO_ESPERA) as respuesta:
+            respuesta.raise_for_status()
+            with open(destino, "wb") as f:
+                for bloque in respuesta.iter_content(chunk_size=64 * 1024):
+                    f.write(bloque)
+        return destino
+
+
+class AdjuntosRest:
+    def __init__(self, capa):
+        self._capa = capa
+        self._nombres = {}  # (oid, id) -> nombre, de la última get_list
+
+    def get_list(self, oid):
+        adjuntos = self._capa._sesion.get(f"{self._capa.url}/{oid}/attachments")["attachmentInfos"]
+        for a in adjuntos:
+            self._nombres[(oid, a["id"])] = a["name"]
+        return adjuntos
+
+    def download(self, oid=None, attachment_id=None, save_path=None):
+        """Descarga el adjunto en save_path con su nombre original; devuelve [ruta]."""
+        if (oid, attachment_id) not in self._nombres:
+            self.get_list(oid)
+        nombre = self._nombres.get((oid, attachment_id), f"adjunto_{attachment_id}")
+        destino = os.path.join(save_path or ".", nombre)
+        self._capa._sesion.descargar(f"{self._capa.url}/{oid}/attachments/{attachment_id}", destino)
+        return [destino]
+
+    def add(self, oid, file_path, keywords=None, return_moment=False):
+        with open(file_path, "rb") as f:
+            return self._capa._sesion.post(
+                f"{self._capa.url}/{oid}/addAttachment",
+                archivos={"attachment": (os.path.basename(file_path), f)},
+            )
+
+
+class CapaRest:
+    """Capa o tabla de un servicio de entidades."""
+
+    def __init__(self, sesion, url):
+        self._sesion = sesion
+        # como FeatureLayer._con: la conexión con get(path, params)
+        self._con = sesion
+        self.url = url.rstrip("/")
+        self._propiedades = None
+        self.attachments = AdjuntosRest(self)
+
+    @property
+    def properties(self):
+        if self._propiedades is None:
+            self._refresh()
+        return self._propiedades
+
+    def _refresh(self):
+        self._propiedades = Propiedades(self._sesion.get(self.url))
+
+    def query(self, where="1=1", out_fields="*", return_geometry=True, order_by_fields=None,
+              result_offset=None, result_record_count=None, return_all_records=True,
+              object_ids=None, return_count_only=False, out_sr=None, **kwargs):
+        params = {
+            "where": where,
+            "outFields": out_fields if isinstance(out_fields, str) else ",".join(out_fields),
+            "returnGeometry": json.dumps(bool(return_geometry)),
+        }
+        if order_by_fields:
+            params["orderByFields"] = order_by_fields
+        if object_ids:
+            params["objectIds"] = object_ids if isinstance(object_ids, str) else ",".join(map(str, object_ids))
+        if out_sr:
+            params["outSR"] = out_sr
+        if return_count_only:
+            return self._sesion.post(f"{self.url}/query", returnCountOnly="true", **params)["count"]
+
+        features = []
+        offset = result_offset or 0
+        while True:
+            pagina = dict(params)
+            if result_offset is not None or offset:
+                pagina["resultOffset"] = offset
+            if result_record_count:
+                pagina["resultRecordCount"] = result_record_count
+            datos = self._sesion.post(f"{self.url}/query", **pagina)
+            nuevas = [Feature(f.get("geometry"), f.get("attributes")) for f in datos.get("features", [])]
+            features.extend(nuevas)
+            # como arcgis: con return_all_records sigue mientras el servicio corte la respuesta
+            if not (return_all_records and datos.get("exceededTransferLimit") and nuevas):
+                break
+            offset += len(nuevas)
+
+        resultado = FeatureSet(
+            features,
+            fields=datos.get("fields"),
+            geometry_type=datos.get("geometryType"),
+            spatial_reference=datos.get("spatialReference"),
+            object_id_field_name=datos.get("objectIdFieldName"),
+            global_id_field_name=datos.get("globalIdFieldName"),
+        )
+        resultado.exceeded_transfer_limit = bool(datos.get("exceededTransferLimit"))
+        return resultado
+
+    def edit_features(self, adds=None, updates=None, deletes=None, rollback_on_failure=True, **kwargs):
+        datos = {"rollbackOnFailure": json.dumps(bool(rollback_on_failure))}
+        if adds:
+            datos["adds"] = _json([f.as_dict if isinstance(f, Feature) else f for f in adds])
+        if updates:
+            datos["updates"] = _json([f.as_dict if isinstance(f, Feature) else f for f in updates])
+        if deletes:
+            datos["deletes"] = deletes if isinstance(deletes, str) else ",".join(map(str, deletes))
+        respuesta = self._sesion.post(f"{self.url}/applyEdits", **datos)
+        return {
+            "addResults": respuesta.get("addResults", []),
+            "updateResults": respuesta.get("updateResults", []),
+            "deleteResults": respuesta.get("deleteResults", []),
+        }
+
+    def calculate(self, where, calc_expression, sql_format="standard", **kwargs):
+        """Actualización en el servidor de las filas que cumplen where; devuelve {"success", "updatedFeatureCount"}."""
+        expresiones = calc_expression if isinstance(calc_expression, list) else [calc_expression]
+        return self._sesion.post(f"{self.url}/calculate", where=where, calcExpression=_json(expresiones),
+                                 sqlFormat=sql_format)
+
+
+class ItemRest:
+    def __init__(self, sesion, item_id):
+        datos = sesion.get(f"{sesion.portal}/sharing/rest/content/items/{item_id}")
+        self.id = item_id
+        self.title = datos.get("title")
+        self.url = datos["url"].rstrip("/")
+        servicio = sesion.get(self.url)
+        self.layers = [CapaRest(sesion, f"{self.url}/{c['id']}") for c in servicio.get("layers", [])]
+        self.tables = [CapaRest(sesion, f"{self.url}/{c['id']}") for c in servicio.get("tables", [])]
+
+
+class _Contenido:
+    def __init__(self, sesion):
+        self._sesion = sesion
+
+    def get(self, item_id):
+        return ItemRest(self._sesion, item_id)
+
+
+class _Usuario:
+    def __init__(self, username):
+        self.username = username
+
+
+class _Usuarios:
+    def __init__(self, sesion):
+        self.me = _Usuario(sesion.usuario)
+
+
+class GISRest:
+    """Reemplazo mínimo de arcgis.gis.GIS para Contexto."""
+
+    def __init__(self, portal, usuario, clave):
+        self.sesion = SesionRest(portal, usuario, clave)
+        self.sesion.token()  # falla aquí, como GIS(), si las credenciales no sirven
+        self.content = _Contenido(self.sesion)
+        self.users = _Usuarios(self.sesion)
+
+    @property
+    def session(self):
+        """La requests.Session de las peticiones, como GIS.session."""
+        return self.sesion.http
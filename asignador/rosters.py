@@ -0,0 +1,184 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+import pandas as pd
+
+from asignador.consultas import planificar_consulta, consultar_paginado, ultima_edicion
+from asignador.esquema import esquema
+
+# Copia local de las tablas de inspectores y comisarios
+RUTA_ROSTERS = os.getenv("ROSTERS_CACHE", os.path.join(".estado", "rosters.sqlite"))
+# Segundos que vale la copia aunque la tabla no reporte ediciones (0 = siempre consultar)
+TTL_SEGUNDOS = float(os.getenv("ROSTERS_TTL", "86400"))
+
+
+class InstantaneaRoster:
+    """
+    Copia en SQLite de una tabla de personal (inspectores o comisarios). Solo se
+    vuelve a leer del servicio cuando su editingInfo.lastEditDate cambia o vence
+    el TTL; las actualizaciones que hace el propio script se aplican también a
+    la copia, que queda al día sin otra consulta, siempre que nadie más haya
+    editado la tabla entre la lectura y esas escrituras (ver escritura). campos ({campo lógico:
+    nombres posibles}) se resuelve con el esquema de la tabla en mapa y solo
+    esas columnas se consultan; sin campos se piden todas.
+    """
+
+    def __init__(self, layer, nombre, campos=None, obligatorios=(), ruta=None, ttl=None):
+        self.layer = layer
+        self.nombre = nombre
+        self.campos = campos
+        self.obligatorios = obligatorios
+        self.mapa = {}
+        self.out_fields = None
+        self.ttl = TTL_SEGUNDOS if ttl is None else ttl
+        ruta = ruta or RUTA_ROSTERS
+        carpeta = os.path.dirname(ruta)
+        if carpeta:
+            os.makedirs(carpeta, exist_ok=True)
+        self._con = sqlite3.connect(ruta, check_same_thread=False)
+        self._con.executescript("""
+            CREATE TABLE IF NOT EXISTS roster_meta (
+                nombre TEXT PRIMARY KEY, url TEXT, campo_oid TEXT, ultima_edicion INTEGER, guardado REAL
+            );
+            CREATE TABLE IF NOT EXISTS roster (
+                nombre TEXT, oid INTEGER, registro TEXT, PRIMARY KEY (nombre, oid)
+            );
+        """)
+        self._con.commit()
+        self.campo_oid = None
+        # lastEditDate que corresponde a la copia, y si alguien más editó la tabla desde entonces
+        self._marca = None
+        self._ajena = False
+        self._escrituras = 0
+        self._candado = threading.Lock()
+
+    def cerrar(self):
+        self._con.close()
+
+    def _meta(self):
+        return self._con.execute(
+            "SELECT url, campo_oid, ultima_edicion, guardado FROM roster_meta WHERE nombre = ?", (self.nombre,)
+        ).fetchone()
+
+    def _guardar_meta(self, ultima):
+        self._con.execute(
+            "INSERT OR REPLACE INTO roster_meta VALUES (?, ?, ?, ?, ?)",
+            (self.nombre, self.layer.url, self.campo_oid, ultima, time.time())
+        )
+
+    def _consultar(self, ultima):
+        plan = planificar_consulta("1=1", self.out_fields, return_geometry=False, orden=self.campo_oid)
+        registros = [f.attributes for f in consultar_paginado(self.layer, plan).features]
+
+        self._con.execute("DELETE FROM roster WHERE nombre = ?", (self.nombre,))
+        self._con.executemany(
+            "INSERT INTO roster VALUES (?, ?, ?)",
+            [(self.nombre, int(r[self.campo_oid]), json.dumps(r, default=str)) for r in registros]
+        )
+        self._guardar_meta(ultima)
+        self._con.commit()
+        return registros
+
+    def cargar(self):
+        """DataFrame con la tabla completa, desde la copia local si sigue vigente."""
+        ultima = ultima_edicion(self.layer, refrescar=True)
+        # columnas reales de la tabla (falla aquí si falta un campo obligatorio)
+        esquema_tabla = esquema(self.layer)
+        self.campo_oid = esquema_tabla.campo("objectid")
+        if self.campos:
+            self.mapa = esquema_tabla.resolver(self.campos, self.obligatorios)
+            self.out_fields = sorted({c for c in self.mapa.values() if c} | {self.campo_oid})
+
+        meta = self._meta()
+        vigente = (
+            meta is not None
+            and meta[0] == self.layer.url
+            and meta[1] == self.campo_oid
+            and ultima is not None and meta[2] == ultima
+            and time.time() - meta[3] < self.ttl
+        )
+        with self._candado:
+            self._marca = ultima
+            self._ajena = False
+        registros = None
+        if vigente:
+            registros = [
+                json.loads(fila[0]) for fila in self._con.execute(
+                    "SELECT registro FROM roster WHERE nombre = ? ORDER BY oid", (self.nombre,)
+                )
+            ]
+            # una copia guardada con otras columnas no sirve
+            if registros and self.out_fields and not set(self.out_fields) <= set(registros[0]):
+                registros = None
+        if registros is not None:
+            print(f"🗂️ {self.nombre} desde la copia local: {len(registros)}")
+        else:
+            registros = self._consultar(ultima)
+            print(f"🗂️ {self.nombre} consultados: {len(registros)}")
+        return pd.DataFrame(registros)
+
+    @contextmanager
+    def escritura(self):
+        """
+        Envuelve las escrituras propias en la tabla (reserva de números, contadores).
+        Antes de la primera comprueba que el lastEditDate sigue siendo el de la
+        copia; al terminar la última lo toma como el nuevo. Si otro proceso editó
+        la tabla entre medio, aplicar() descarta la copia en lugar de avanzarla.
+        """
+        with self._candado:
+            if self._escrituras == 0 and not self._ajena:
+                previa = ultima_edicion(self.layer, refrescar=True)
+                if previa != self._marca:
+                    self._ajena = True
+                    print(f"⚠️ {self.nombre} fue editada por otro proceso desde la lectura")
+            self._escrituras += 1
+        try:
+            yield
+        finally:
+            with self._candado:
+                self._escrituras -= 1
+                if self._escrituras == 0 and not self._ajena:
+                    self._marca = ultima_edicion(self.layer, refrescar=True)
+
+    def editada_por_otro(self):
+        """Registra que otro proceso editó la tabla (p. ej. un conflicto de ultimo_numero)."""
+        with self._candado:
+            self._ajena = True
+
+    def aplicar(self, updates):
+        """
+        Aplica a la copia local las actualizaciones ya confirmadas por el servicio
+        y guarda el lastEditDate posterior a las escrituras propias, para que la
+        próxima ejecución no relea la tabla. Si hubo ediciones ajenas la copia se
+        invalida y la próxima ejecución la vuelve a leer.
+
+        Con FLUJO=1 la reserva del lote siguiente (escritura, editada_por_otro)
+        corre en otro hilo mientras el principal aplica el lote anterior: el
+        estado de las escrituras y la copia se tocan siempre con el candado.
+        """
+        if not updates or self.campo_oid is None:
+            return
+        with self._candado:
+            if self._ajena:
+                self._con.execute("DELETE FROM roster_meta WHERE nombre = ?", (self.nombre,))
+                self._con.commit()
+                print(f"🗂️ La copia local de {self.nombre} se volverá a leer en la próxima ejecución")
+                return
+            for update in updates:
+                atributos = update["attributes"]
+                oid = int(atributos[self.campo_oid])
+                fila = self._con.execute(
+                    "SELECT registro FROM roster WHERE nombre = ? AND oid = ?", (self.nombre, oid)
+                ).fetchone()
+                registro = json.loads(fila[0]) if fila else {}
+                registro.update(atributos)
+                self._con.execute(
+                    "INSERT OR REPLACE INTO roster VALUES (?, ?, ?)",
+                    (self.nombre, oid, json.dumps(registro, default=str))
+                )
+            self._guardar_meta(self._marca)
+            self._con.commit()
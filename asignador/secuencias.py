@@ -0,0 +1,199 @@
+import contextlib
+import os
+import threading
+from collections import Counter
+
+from asignador.asignacion import _entero
+from asignador.asincrono import simultaneas
+from asignador.metricas import fase
+
+# Intentos por persona cuando otro proceso mueve el contador entre lectura y escritura
+REINTENTOS = int(os.getenv("SECUENCIA_REINTENTOS", "5"))
+
+
+class ErrorSecuencia(Exception):
+    """No se pudo reservar un bloque de números para una persona."""
+
+
+def _valor(atributos, campo):
+    """Atributo sin distinguir mayúsculas (el servicio puede devolver otro nombre)."""
+    if campo in atributos:
+        return atributos[campo]
+    return next((v for k, v in atributos.items() if k.lower() == campo.lower()), None)
+
+
+class Bloque:
+    """Números base+1 .. fin reservados para una persona."""
+
+    def __init__(self, oid, base, fin):
+        self.oid = oid
+        self.base = base
+        self.fin = fin
+        self.usado = base  # mayor número con tarea creada
+        self._siguiente = base + 1
+
+    def tomar(self):
+        numero = self._siguiente
+        self._siguiente += 1
+        return numero
+
+
+class ReservaNumeros:
+    """
+    Reserva bloques de ultimo_numero en la tabla de personal, uno por persona y
+    por ejecución, con una actualización condicional en el servidor (calculate
+    con "oid = X AND ultimo_numero = N"). Si otro proceso movió el contador entre
+    la lectura y la escritura la condición no se cumple: se cuenta el conflicto,
+    se vuelve a leer y se reintenta. Los números se reparten en memoria y al
+    terminar se devuelven los del final del bloque que no se usaron. Con FLUJO=1
+    se reserva y se devuelve una vez por lote. roster, si se da, es la
+    InstantaneaRoster de la tabla: sus escrituras se registran en ella.
+    Los bloques solo se tocan con _candado_bloques tomado; reservar, confirmar
+    y devolver no se intercalan aunque se llamen desde hilos distintos.
+    """
+
+    def __init__(self, layer, col_oid="objectid", col_ultimo="ultimo_numero", reintentos=REINTENTOS, roster=None):
+        self.layer = layer
+        self.roster = roster
+        self.col_oid = col_oid
+        self.col_ultimo = col_ultimo
+        self.reintentos = reintentos
+        self.conflictos = 0
+        self._bloques = {}
+        self._candado = threading.Lock()
+        self._candado_bloques = threading.RLock()
+
+    def _escritura(self):
+        return self.roster.escritura() if self.roster is not None else contextlib.nullcontext()
+
+    def _incierto(self):
+        """Una escritura sin respuesta: la copia local de la tabla ya no es confiable."""
+        if self.roster is not None:
+            self.roster.editada_por_otro()
+
+    def _leer(self, oids):
+        """ultimo_numero actual en el servidor de cada oid, en una consulta."""
+        resultado = self.layer.query(
+            where=f"{self.col_oid} IN ({', '.join(str(o) for o in oids)})",
+            out_fields=f"{self.col_oid},{self.col_ultimo}",
+            return_geometry=False
+        )
+        return {
+            _entero(_valor(f.attributes, self.col_oid)): _entero(_valor(f.attributes, self.col_ultimo))
+            for f in resultado.features
+        }
+
+    def _mover(self, oid, desde, hasta):
+        """Lleva ultimo_numero de desde a hasta solo si sigue en desde; True si se escribió."""
+        condicion = f"{self.col_oid} = {oid} AND "
+        if desde == 0:
+            condicion += f"({self.col_ultimo} = 0 OR {self.col_ultimo} IS NULL)"
+        else:
+            condicion += f"{self.col_ultimo} = {desde}"
+        respuesta = self.layer.calculate(
+            where=condicion,
+            calc_expression=[{"field": self.col_ultimo, "value": hasta}]
+        )
+        return bool(respuesta.get("success", True) and respuesta.get("updatedFeatureCount"))
+
+    def _reservar_bloque(self, oid, actual, cantidad):
+        for intento in range(1, self.reintentos + 1):
+            if self._mover(oid, actual, actual + cantidad):
+                return Bloque(oid, actual, actual + cantidad)
+            with self._candado:
+                self.conflictos += 1
+            if self.roster is not None:
+                self.roster.editada_por_otro()
+            nuevo = self._leer([oid]).get(oid)
+            if nuevo is None:
+                raise ErrorSecuencia(f"no existe el registro {self.col_oid} = {oid}")
+            print(f"⚠️ ultimo_numero de {oid} cambió en el servidor ({actual} → {nuevo}); reintento {intento}")
+            actual = nuevo
+        raise ErrorSecuencia(f"{oid}: el contador siguió cambiando tras {self.reintentos} intentos")
+
+    def reservar(self, registros):
+        """
+        registros: Persona elegida para cada tarea, en orden. Reserva para cada
+        persona tantos números como tareas recibió y devuelve el número de cada
+        tarea en el mismo orden (None si su persona no pudo reservar).
+        """
+        cantidades = Counter(r.oid for r in registros)
+        if not cantidades:
+            return []
+
+        def reservar_bloque(oid, actual):
+            def llamada():
+                try:
+                    return self._reservar_bloque(oid, actual, cantidades[oid])
+                except ErrorSecuencia as e:
+                    print(f"❌ No se pudo reservar números de formulario: {e}")
+                    return None
+                except Exception as e:
+                    # sin respuesta no se sabe si el contador se movió: sin bloque (a lo sumo queda un hueco)
+                    print(f"❌ Error al reservar números de formulario para {oid}: {e}")
+                    self._incierto()
+                    return None
+            return llamada
+
+        with self._candado_bloques:
+            with fase("secuencias", registros=len(registros)), self._escritura():
+                actuales = self._leer(list(cantidades))
+                bloques = simultaneas(*(
+                    (self.layer, reservar_bloque(oid, actuales.get(oid, 0))) for oid in cantidades
+                ))
+            for oid, bloque in zip(cantidades, bloques):
+                if bloque is not None:
+                    self._bloques[oid] = bloque
+            if self.conflictos:
+                print(f"⚠️ Conflictos con otro proceso al reservar números: {self.conflictos}")
+
+            numeros = []
+            for r in registros:
+                bloque = self._bloques.get(r.oid)
+                numeros.append(bloque.tomar() if bloque else None)
+            return numeros
+
+    def confirmar(self, registro, numero):
+        """Marca el número como usado (su tarea se creó)."""
+        with self._candado_bloques:
+            bloque = self._bloques[registro.oid]
+            bloque.usado = max(bloque.usado, numero)
+
+    def devolver(self):
+        """
+        Baja ultimo_numero al mayor número usado de cada bloque, si nadie reservó
+        después (si no, los números sobrantes quedan como hueco). Devuelve las
+        actualizaciones con el ultimo_numero final, para la copia local de la tabla.
+        """
+        with self._candado_bloques:
+            return self._devolver()
+
+    def _devolver(self):
+        finales = {oid: bloque.fin for oid, bloque in self._bloques.items()}
+        sobrantes = [b for b in self._bloques.values() if b.usado < b.fin]
+
+        def devolver_bloque(bloque):
+            def llamada():
+                try:
+                    return self._mover(bloque.oid, bloque.fin, bloque.usado)
+                except Exception as e:
+                    # se trata como no devuelto: quedan como hueco y los demás siguen
+                    print(f"❌ Error al devolver los números de {bloque.oid}: {e}")
+                    self._incierto()
+                    return None
+            return llamada
+
+        devueltos = []
+        if sobrantes:
+            with self._escritura():
+                devueltos = simultaneas(*((self.layer, devolver_bloque(b)) for b in sobrantes))
+        for bloque, ok in zip(sobrantes, devueltos):
+            if ok:
+                finales[bloque.oid] = bloque.usado
+            elif ok is False:
+                print(f"⚠️ No se devolvieron los números {bloque.usado + 1}-{bloque.fin} de {bloque.oid}: otro proceso reservó después")
+                if self.roster is not None:
+                    self.roster.editada_por_otro()
+        # la siguiente reserva (otro lote) vuelve a leer el contador del servidor
+        self._bloques = {}
+        return [{"attributes": {self.col_oid: oid, self.col_ultimo: final}} for oid, final in finales.items()]
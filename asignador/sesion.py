@@ -0,0 +1,143 @@
+import os
+
+from asignador.consultas import planificar_consulta, consultar_paginado
+from asignador.esquema import (
+    CAMPOS_COMISARIO, CAMPOS_INSPECTOR, OBLIGATORIOS_COMISARIO, OBLIGATORIOS_INSPECTOR, esquema,
+)
+from asignador.metricas import fase, instrumentar_http
+from asignador.trabajadores import DirectorioTrabajadores
+from asignador.rosters import InstantaneaRoster
+
+URL_PORTAL = "https://www.arcgis.com"
+# "arcgis" (por defecto) o "rest" para el motor liviano sin arcgis
+MOTOR = os.getenv("MOTOR", "arcgis").strip().lower()
+
+# Items de ArcGIS Online
+ITEM_INSPECTORES = "a255f5953df24eb08917602c1d89885e"
+ITEM_COMISARIOS = "aa7cb6814d7d44beaa2557533103e7aa"
+ITEM_DENUNCIAS = "60c69b82ab074b65a8a239fcd2067ce4"  # registro_infracciones-gadmr
+ITEM_WORKFORCE = "bf86d367917747cf82fb57a9128eed0e"
+
+
+def iniciar_sesion():
+    """
+    Inicia sesión con AGOL_USERNAME/AGOL_PASSWORD. Devuelve el GIS (o su
+    equivalente REST si MOTOR=rest) o None si falla.
+    """
+    if MOTOR == "rest":
+        from asignador.rest import GISRest as GIS
+    else:
+        from arcgis.gis import GIS
+
+    usuario = os.getenv("AGOL_USERNAME")
+    clave = os.getenv("AGOL_PASSWORD")
+    if not usuario or not clave:
+        print("❌ No se encontraron credenciales en las variables de entorno (AGOL_USERNAME/AGOL_PASSWORD).")
+        return None
+    try:
+        with fase("login"):
+            gis = GIS(URL_PORTAL, usuario, clave)
+        # las métricas cuentan las peticiones de esta sesión
+        instrumentar_http(gis.session)
+        print(f"🟢 Sesión iniciada como: {gis.users.me.username}")
+        return gis
+    except Exception as e:
+        print(f"❌ Error al iniciar sesión en ArcGIS Online: {e}")
+        return None
+
+
+class Contexto:
+    """
+    Sesión, capas y lecturas compartidas por las etapas que corren en un mismo proceso.
+    Cada item, el directorio de workers, las tablas de personal y la lectura de
+    denuncias se cargan una sola vez.
+    """
+
+    def __init__(self, gis):
+        self.gis = gis
+        self._items = {}
+        self._trabajadores = None
+        self._rosters = {}
+        self._denuncias = None
+
+    def renovar(self):
+        """
+        Prepara el contexto para otro ciclo en un proceso que sigue vivo: descarta
+        las denuncias leídas y revisa si los workers cambiaron (lastEditDate).
+        """
+        self._denuncias = None
+        if self._trabajadores is not None:
+            self._trabajadores.cargar()
+
+    def item(self, item_id):
+        if item_id not in self._items:
+            self._items[item_id] = self.gis.content.get(item_id)
+        return self._items[item_id]
+
+    @property
+    def tabla_inspectores(self):
+        return self.item(ITEM_INSPECTORES).tables[0]
+
+    @property
+    def tabla_comisarios(self):
+        return self.item(ITEM_COMISARIOS).tables[0]
+
+    @property
+    def layer_denuncias(self):
+        return self.item(ITEM_DENUNCIAS).layers[0]
+
+    @property
+    def layer_asignaciones(self):
+        return self.item(ITEM_WORKFORCE).layers[0]
+
+    @property
+    def layer_workers(self):
+        return self.item(ITEM_WORKFORCE).layers[1]
+
+    def trabajadores(self):
+        """Directorio userid -> GlobalID de los workers (con caché en disco)."""
+        if self._trabajadores is None:
+            self._trabajadores = DirectorioTrabajadores(self.layer_workers).cargar()
+        return self._trabajadores
+
+    def roster(self, nombre):
+        """Copia local de la tabla de "inspectores" o "comisarios" (ver InstantaneaRoster)."""
+        if nombre not in self._rosters:
+            tablas = {
+                "inspectores": (self.tabla_inspectores, CAMPOS_INSPECTOR, OBLIGATORIOS_INSPECTOR),
+                "comisarios": (self.tabla_comisarios, CAMPOS_COMISARIO, OBLIGATORIOS_COMISARIO),
+            }
+            tabla, campos, obligatorios = tablas[nombre]
+            self._rosters[nombre] = InstantaneaRoster(tabla, nombre, campos, obligatorios)
+        return self._rosters[nombre]
+
+    def precargar_denuncias(self, consultas):
+        """
+        Lee en una sola consulta las denuncias de varias etapas.
+        consultas: lista de (estado_tramite, where, campos); campos=None pide todos.
+        """
+        where = " OR ".join(f"({c_where})" for _, c_where, _ in consultas)
+        esquema_denuncias = esquema(self.layer_denuncias)
+        col_estado = esquema_denuncias.campo("estado_tramite")
+        if any(campos is None for _, _, campos in consultas):
+            campos = None
+        else:
+            # cada etapa exige sus campos obligatorios al empezar; aquí se quitan los que falten
+            campos = sorted({"estado_tramite"}.union(*(c for _, _, c in consultas)))
+            campos = esquema_denuncias.out_fields(campos, obligatorios=["estado_tramite"])
+        plan = planificar_consulta(where, campos, return_geometry=True, orden=esquema_denuncias.oid)
+        df = consultar_paginado(self.layer_denuncias, plan).sdf
+
+        self._denuncias = {}
+        for estado, _, _ in consultas:
+            if df.empty:
+                self._denuncias[estado] = df
+            else:
+                self._denuncias[estado] = df[df[col_estado] == estado].reset_index(drop=True)
+        print(f"📥 Denuncias leídas en una consulta: {len(df)} ({', '.join(e for e, _, _ in consultas)})")
+
+    def denuncias(self, estado):
+        """DataFrame precargado para el estado, o None si hay que consultarlo."""
+        if self._denuncias is None:
+            return None
+        return self._denuncias.get(estado)
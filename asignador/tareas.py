@@ -0,0 +1,78 @@
+import numpy as np
+import pandas as pd
+
+
+def _es_columna(valor):
+    return isinstance(valor, (list, pd.Series, pd.Index, np.ndarray))
+
+
+def _vacio(dtype):
+    """Cómo escribe str() un valor vacío de este dtype."""
+    if isinstance(dtype, pd.api.extensions.ExtensionDtype):
+        return str(dtype.na_value)
+    if dtype.kind in "mM":
+        return "NaT"
+    # en columnas object los vacíos llegan como None desde el JSON del servicio
+    return "None" if dtype.kind == "O" else "nan"
+
+
+def texto(df, col, defecto=""):
+    """
+    Columna como texto, igual que row.get(col, defecto) dentro de un f-string
+    (para columnas de texto y numéricas). Si la columna no existe se repite el
+    valor por defecto. La conversión es una sola astype("string") para todo
+    dtype, y los vacíos se escriben de una vez como lo haría str().
+    """
+    if col not in df.columns:
+        return pd.Series([str(defecto)] * len(df), index=df.index, dtype=object)
+    serie = df[col]
+    return serie.astype("string").mask(serie.isna(), _vacio(serie.dtype))
+
+
+def valores(df, col, defecto=None):
+    """Columna sin convertir (o el valor por defecto si no existe), como lista."""
+    if col not in df.columns:
+        return [defecto] * len(df)
+    return df[col].astype(object).tolist()
+
+
+def concatenar(*partes):
+    """
+    Une textos fijos y columnas de texto en una sola columna. Equivale al
+    f-string por fila, pero se evalúa una vez para todo el lote.
+    """
+    resultado = ""
+    for parte in partes:
+        resultado = resultado + parte
+    return resultado
+
+
+def vencimientos(df, col="fecha_actual", dias=3):
+    """fecha_actual + dias para toda la columna; None donde no hay fecha válida."""
+    if col not in df.columns:
+        return [None] * len(df)
+    fechas = pd.to_datetime(df[col], errors="coerce") + pd.Timedelta(days=dias)
+    return [None if pd.isna(f) else f for f in fechas.astype(object)]
+
+
+def registros(atributos, geometrias=None):
+    """
+    Arma en una sola pasada los payloads de applyEdits a partir de columnas.
+    atributos: {campo: columna o valor fijo}; las columnas (Series/listas) deben
+    tener el mismo largo; los valores fijos se repiten en todas las filas.
+    """
+    columnas = {k: (v.tolist() if hasattr(v, "tolist") else list(v)) for k, v in atributos.items() if _es_columna(v)}
+    fijos = {k: v for k, v in atributos.items() if not _es_columna(v)}
+    n = len(next(iter(columnas.values()))) if columnas else len(geometrias or [])
+    claves = list(columnas)
+    filas = zip(*columnas.values()) if columnas else ([()] * n)
+
+    salida = []
+    for i, fila in enumerate(filas):
+        attrs = dict(zip(claves, fila))
+        attrs.update(fijos)
+        registro = {"attributes": {k: attrs[k] for k in atributos}}
+        if geometrias is not None:
+            registro["geometry"] = geometrias[i]
+        salida.append(registro)
+    return salida
@@ -0,0 +1,59 @@
+"""
+Limpieza de los textos que van a la descripción de las tareas de Workforce.
+Se hace por columnas con el accesor .str de pandas y patrones compilados una
+sola vez, en lugar de un re.sub por campo y por fila; la descripción armada se
+recorta al largo del campo description de la capa de asignaciones.
+"""
+import re
+
+import pandas as pd
+
+# Etiquetas HTML (no cruzan saltos de línea, igual que antes)
+ETIQUETAS = re.compile(r"<.*?>")
+# Marca al final de una descripción recortada
+MARCA_RECORTE = "…"
+
+
+def limpiar_texto(texto):
+    """
+    Versión por valor: quita etiquetas HTML, \\r y cambia los saltos de línea
+    por " | ". None y pd.NA quedan como "".
+    """
+    if texto is None or pd.isna(texto):
+        return ""
+    texto = str(texto)
+    texto = ETIQUETAS.sub("", texto)
+    texto = texto.replace("\r", "").replace("\n", " | ")
+    return texto.strip()
+
+
+def limpiar(serie):
+    """limpiar_texto para toda una columna de una vez."""
+    # las columnas de texto del sdf ya son de tipo str: solo se rellenan los vacíos
+    serie = serie.fillna("").astype(str)
+    return (
+        serie.str.replace(ETIQUETAS, "", regex=True)
+        .str.replace("\r", "", regex=False)
+        .str.replace("\n", " | ", regex=False)
+        .str.strip()
+    )
+
+
+def texto_limpio(df, col, defecto=""):
+    """Columna limpia como texto; si no existe se repite el valor por defecto (también limpio)."""
+    if col not in df.columns:
+        return pd.Series([limpiar_texto(defecto)] * len(df), index=df.index, dtype=object)
+    return limpiar(df[col]).astype(object)
+
+
+def recortar(serie, longitud):
+    """Recorta los textos más largos que longitud (None = sin límite) y les pone MARCA_RECORTE."""
+    if not longitud or serie.empty:
+        return serie
+    largos = serie.str.len() > longitud
+    if not largos.any():
+        return serie
+    serie = serie.copy()
+    serie[largos] = serie[largos].str.slice(0, longitud - len(MARCA_RECORTE)) + MARCA_RECORTE
+    print(f"✂️ {int(largos.sum())} descripciones recortadas a {longitud} caracteres")
+    return serie
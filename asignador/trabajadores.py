@@ -0,0 +1,92 @@
+import json
+import os
+import time
+
+from asignador.consultas import planificar_consulta, consultar_paginado, ultima_edicion
+from asignador.esquema import CAMPOS_WORKER, esquema
+
+# Caché en disco del directorio de workers (compartida con el estado incremental)
+RUTA_CACHE = os.getenv("WORKERS_CACHE", os.path.join(".estado", "workers.json"))
+# Segundos que vale la caché aunque la capa no reporte ediciones
+TTL_SEGUNDOS = float(os.getenv("WORKERS_TTL", "86400"))
+
+
+class DirectorioTrabajadores:
+    """
+    Directorio userid -> GlobalID de los workers de Workforce. Se arma con una
+    consulta que trae solo esos dos campos y se guarda en disco; la siguiente
+    ejecución lo reutiliza mientras no venza el TTL ni cambie el lastEditDate
+    de la capa.
+    """
+
+    def __init__(self, layer, ruta=None, ttl=None):
+        self.layer = layer
+        self.ruta = ruta or RUTA_CACHE
+        self.ttl = TTL_SEGUNDOS if ttl is None else ttl
+        self._globalids = None
+
+    def _leer_cache(self):
+        try:
+            with open(self.ruta, encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _guardar_cache(self, entrada):
+        cache = self._leer_cache()
+        cache[self.layer.url] = entrada
+        carpeta = os.path.dirname(self.ruta)
+        if carpeta:
+            os.makedirs(carpeta, exist_ok=True)
+        temporal = f"{self.ruta}.tmp"
+        with open(temporal, "w", encoding="utf-8") as f:
+            json.dump(cache, f)
+        os.replace(temporal, self.ruta)
+
+    def _consultar(self):
+        mapa = esquema(self.layer).resolver(CAMPOS_WORKER, obligatorios=("userid", "globalid"))
+        col_user, col_gid = mapa["userid"], mapa["globalid"]
+        plan = planificar_consulta("1=1", [col_user, col_gid], return_geometry=False)
+        globalids = {}
+        for feature in consultar_paginado(self.layer, plan).features:
+            usuario = feature.attributes.get(col_user)
+            # si un usuario está repetido se queda el primero, como antes
+            if usuario is not None and usuario not in globalids:
+                globalids[usuario] = feature.attributes.get(col_gid)
+        return globalids
+
+    def cargar(self, refrescar=True):
+        """
+        Carga el directorio desde la caché si sigue vigente o desde el servicio.
+        refrescar vuelve a pedir las propiedades para comparar el lastEditDate actual.
+        """
+        ultima = ultima_edicion(self.layer, refrescar=refrescar)
+        entrada = self._leer_cache().get(self.layer.url)
+        vigente = (
+            entrada is not None
+            and time.time() - entrada.get("guardado", 0) < self.ttl
+            and (ultima is None or entrada.get("ultima_edicion") == ultima)
+        )
+        if vigente:
+            self._globalids = entrada["globalids"]
+            print(f"👷 Workers desde caché: {len(self._globalids)}")
+        else:
+            self._globalids = self._consultar()
+            self._guardar_cache({"ultima_edicion": ultima, "guardado": time.time(), "globalids": self._globalids})
+            print(f"👷 Workers consultados: {len(self._globalids)}")
+        return self
+
+    def _directorio(self):
+        if self._globalids is None:
+            self.cargar()
+        return self._globalids
+
+    def get(self, userid, defecto=None):
+        """GlobalID del worker con ese userid (O(1))."""
+        return self._directorio().get(userid, defecto)
+
+    def __contains__(self, userid):
+        return userid in self._directorio()
+
+    def __len__(self):
+        return len(self._directorio())
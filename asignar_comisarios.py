@@ -1,73 +1,39 @@
 #!/usr/bin/env python3
 # asignar_comisarios.py
-from arcgis.gis import GIS
+import os
 import pandas as pd
 from datetime import datetime, timedelta
-import os
 import json
 import pprint
 import traceback
-
-DEBUG = True
+from asignador.sesion import Contexto, iniciar_sesion
+from asignador.asignacion import IndiceCarga
+from asignador.registros import personas
+from asignador.esquema import esquema
+from asignador.asincrono import simultaneas, sin_errores
+from asignador.escritura import CLAVES_TAREA, aplicar_ediciones, exitosos
+from asignador.secuencias import ReservaNumeros
+from asignador.metricas import ejecucion, etapa, fase
+from asignador.optimizacion import asignar_lote, modo_optimo
+from asignador.geometria import geometrias, wkid_capa
+from asignador.tareas import concatenar, registros, valores
+from asignador.texto import recortar, texto_limpio
+from asignador.incremental import Diario, TareasPrevias, modo_incremental, reanudar, TAREA_CREADA, COMPLETADO
+
+# Muestra columnas, mapeos y la primera tarea armada (DEBUG=0 lo apaga)
+DEBUG = os.getenv("DEBUG", "1").strip().lower() in ("1", "true", "si", "sí")
 
 print("🟡 Script asignar_comisario iniciado...")
 
-def find_col(cols, candidates):
-    """Buscar la primera columna en cols que coincida con cualquiera de candidates (case-insensitive)."""
-    lower_map = {c.lower(): c for c in cols}
-    for cand in candidates:
-        if cand.lower() in lower_map:
-            return lower_map[cand.lower()]
-    return None
+ETAPA = "comisaria"
+ESTADO_DENUNCIA = "Supervision Finalizada"
+FILTRO_DENUNCIAS = "estado_tramite = 'Supervision Finalizada' AND proceso_administrativo = 'Si'"
 
-def safe_get(obj, key, default=None):
-    """Obtener valor con tolerancia si obj es Series/dict."""
-    try:
-        if key is None:
-            return default
-        # pandas Series supports .get
-        if hasattr(obj, "get"):
-            val = obj.get(key, default)
-            if val is not None:
-                return val
-        # fallback item access
-        return obj[key]
-    except Exception:
-        try:
-            return obj.get(key, default)
-        except Exception:
-            return default
-
-def extract_geometry_from_row(row):
-    """Intenta extraer x,y de varias posibles representaciones en la row."""
-    candidates = ['SHAPE', 'shape', 'geometry', 'geom', 'SHAPE@XY', 'Shape']
-    for c in candidates:
-        val = safe_get(row, c, None)
-        if val is None:
-            continue
-        # si ya es dict con x,y
-        if isinstance(val, dict):
-            x = val.get("x") or val.get("X")
-            y = val.get("y") or val.get("Y")
-            if x is not None and y is not None:
-                return {"x": float(x), "y": float(y), "spatialReference": {"wkid": 4326}}
-            # si viene como coordinates [lon, lat]
-            coords = val.get("coordinates") if "coordinates" in val else None
-            if coords and isinstance(coords, (list, tuple)) and len(coords) >= 2:
-                return {"x": float(coords[0]), "y": float(coords[1]), "spatialReference": {"wkid": 4326}}
-        # si es un objeto con atributos x,y
-        if hasattr(val, "x") and hasattr(val, "y"):
-            try:
-                return {"x": float(val.x), "y": float(val.y), "spatialReference": {"wkid": 4326}}
-            except Exception:
-                pass
-        # si es tupla/lista (x,y)
-        if isinstance(val, (list, tuple)) and len(val) >= 2:
-            try:
-                return {"x": float(val[0]), "y": float(val[1]), "spatialReference": {"wkid": 4326}}
-            except Exception:
-                pass
-    return None
+# Campos de la denuncia que usa la tarea del comisario
+CAMPOS_DENUNCIA = [
+    "objectid", "globalid", "siglas_area", "cedula_infractor", "proceso_administrativo", "direccion",
+]
+OBLIGATORIOS_DENUNCIA = ["objectid"]
 
 def comprobar_serializable(lista):
     """Intenta serializar con json.dumps usando default=str. Si falla, devuelve False y el error."""
@@ -77,220 +43,218 @@ def comprobar_serializable(lista):
     except Exception as e:
         return False, e
 
-def ejecutar_asignacion_comisario():
-    usuario = os.getenv("AGOL_USERNAME")
-    clave = os.getenv("AGOL_PASSWORD")
-    if not usuario or not clave:
-        print("❌ No se encontraron credenciales en las variables de entorno (AGOL_USERNAME/AGOL_PASSWORD).")
-        return
+def ejecutar_asignacion_comisario(ctx=None):
+    if ctx is None:
+        gis = iniciar_sesion()
+        if gis is None:
+            return
+        ctx = Contexto(gis)
 
-    try:
-        gis = GIS("https://www.arcgis.com", usuario, clave)
-        print(f"🟢 Sesión iniciada como: {gis.users.me.username}")
-    except Exception as e:
-        print(f"❌ Error al iniciar sesión en ArcGIS Online: {e}")
-        return
+    # Modo incremental (INCREMENTAL=1): marca de agua y diario por registro
+    diario = Diario(ETAPA) if modo_incremental() else None
+    df_leidas = None
+    completadas = set()
+    col_oid_diario = "objectid"
 
     try:
-        # IDs que usas (mantener los ids que tienes)
-        item_tabla = gis.content.get("aa7cb6814d7d44beaa2557533103e7aa")
-        item_denuncia = gis.content.get("60c69b82ab074b65a8a239fcd2067ce4")
-        item_workforce = gis.content.get("bf86d367917747cf82fb57a9128eed0e")
-
-        tabla_comisarios = item_tabla.tables[0]
-        layer_denuncias = item_denuncia.layers[0]
-        layer_asignaciones = item_workforce.layers[0]
-        layer_workers = item_workforce.layers[1]
-
-        features_comisarios = tabla_comisarios.query(where="1=1", out_fields="*", return_geometry=False)
-        features_denuncias = layer_denuncias.query(
-            where="estado_tramite = 'Supervision Finalizada' AND proceso_administrativo = 'Si'",
-            out_fields="*",
-            return_geometry=True
+        tabla_comisarios = ctx.tabla_comisarios
+        layer_denuncias = ctx.layer_denuncias
+        layer_asignaciones = ctx.layer_asignaciones
+
+        # comisarios, workers y denuncias no dependen entre sí: se consultan a la vez
+        # campos de la denuncia resueltos contra el esquema (se detiene si falta el objectid)
+        esquema_denuncias = esquema(layer_denuncias)
+        campos_denuncia = esquema_denuncias.out_fields(
+            CAMPOS_DENUNCIA + [diario.campo] if diario else CAMPOS_DENUNCIA,
+            obligatorios=OBLIGATORIOS_DENUNCIA
         )
-        features_workers = layer_workers.query(where="1=1", out_fields="*", return_geometry=False)
 
-        df_comisarios = features_comisarios.sdf
-        df_denuncias = features_denuncias.sdf
-        df_workers = features_workers.sdf
+        roster_comisarios = ctx.roster("comisarios")
+        layer_workers = ctx.layer_workers
+        consultas = [
+            (tabla_comisarios, roster_comisarios.cargar),
+            (layer_workers, ctx.trabajadores),
+        ]
+
+        # denuncias con supervisión finalizada (o la lectura compartida del orquestador)
+        df_denuncias = ctx.denuncias(ESTADO_DENUNCIA)
+        if df_denuncias is None:
+            def consultar_denuncias():
+                with fase("consulta") as medicion:
+                    features_denuncias = layer_denuncias.query(
+                        where=diario.filtro(FILTRO_DENUNCIAS) if diario else FILTRO_DENUNCIAS,
+                        out_fields=",".join(campos_denuncia),
+                        return_geometry=True
+                    )
+                    medicion.registros = len(features_denuncias.features)
+                return features_denuncias.sdf
+            consultas.append((layer_denuncias, consultar_denuncias))
+
+        df_comisarios, workers, *resto = sin_errores(simultaneas(*consultas))
+        if resto:
+            df_denuncias = resto[0]
 
         print(f"Total de denuncias para comisarios encontradas: {len(df_denuncias)}")
         if DEBUG:
             print("Columnas tabla comisarios:", list(df_comisarios.columns))
             print("Columnas capa denuncias:", list(df_denuncias.columns))
-            print("Columnas workers:", list(df_workers.columns))
-
-        # localizar columnas relevantes (tolerante)
-        col_siglas = find_col(df_comisarios.columns, ["siglas", "siglas_inspector", "sigla"])
-        col_nombre = find_col(df_comisarios.columns, ["nombre", "name"])
-        col_user = find_col(df_comisarios.columns, ["nomre_de_usuario", "username", "userid", "usuario"])
-        col_obj_comisario = find_col(df_comisarios.columns, ["objectid", "OBJECTID", "oid", "object_id"])
-        col_num_tramites = find_col(df_comisarios.columns, ["num_tramites", "numtramites", "num_tramite", "num_trámites"])
-        col_ultimo_num = find_col(df_comisarios.columns, ["ultimo_numero", "ultimo_num", "ultimo"])
+            print("Workers en el directorio:", len(workers))
 
-        col_obj_denuncia = find_col(df_denuncias.columns, ["objectid", "OBJECTID", "oid", "object_id"])
-        col_globalid_denuncia = find_col(df_denuncias.columns, ["globalid", "GlobalID", "GLOBALID"])
-        col_siglas_area_den = find_col(df_denuncias.columns, ["siglas_area", "siglas"])
+        # comisarios como registros compactos con las columnas que resolvió el esquema
+        columnas = roster_comisarios.mapa
+        comisarios = personas(df_comisarios, columnas, defectos={"nombre": "SinNombre", "siglas": "XX"})
 
-        worker_user_col = find_col(df_workers.columns, ["userid", "username", "user", "usuario"])
+        col_obj_denuncia = esquema_denuncias.campo("objectid")
+        col_globalid_denuncia = esquema_denuncias.campo("globalid", obligatorio=False)
+        col_siglas_area_den = esquema_denuncias.campo("siglas_area", ["siglas_area", "siglas"], obligatorio=False)
 
         if DEBUG:
-            print("Mappings -> siglas:", col_siglas, "nombre:", col_nombre, "user:", col_user,
-                  "obj_comisario:", col_obj_comisario, "num_tramites:", col_num_tramites, "ultimo_num:", col_ultimo_num)
+            print("Mappings ->", columnas)
             print("Denuncia obj:", col_obj_denuncia, "denuncia globalid:", col_globalid_denuncia, "siglas_area:", col_siglas_area_den)
-            print("Worker user col:", worker_user_col)
-
-        if df_denuncias.empty:
-            print("No hay denuncias para procesar.")
-            return
-
-        denuncias_actualizadas = []
-        comisarios_actualizados = []
-        tareas_creadas = []
 
         # GUID del tipo de asignación "Comisario"
         assignmenttype_guid = "33aec22e-5094-4cce-9493-a3444d8fba8c"
 
-        for idx, row in df_denuncias.iterrows():
-            try:
-                if df_comisarios.empty:
-                    print("❌ No hay comisarios disponibles en la tabla")
-                    continue
-
-                # ordenar por num_tramites (si no existe, no ordenar)
-                if col_num_tramites:
-                    sorted_df = df_comisarios.sort_values(by=col_num_tramites, ascending=True, na_position='last')
-                else:
-                    sorted_df = df_comisarios
-
-                comisario_asignado = sorted_df.iloc[0]
-
-                # obtener valores con tolerancia
-                nombre_comisario = safe_get(comisario_asignado, col_nombre, "SinNombre")
-                siglas_comisario = safe_get(comisario_asignado, col_siglas, "XX")
-                username_comisario = safe_get(comisario_asignado, col_user, None)
-                ultimo_numero_val = safe_get(comisario_asignado, col_ultimo_num, 0)
-                try:
-                    ultimo_numero_val = int(ultimo_numero_val) if ultimo_numero_val is not None else 0
-                except Exception:
-                    ultimo_numero_val = 0
-
-                ultimo_numero = ultimo_numero_val + 1
-
-                anio_actual = datetime.utcnow().year
-                siglas_area = safe_get(row, col_siglas_area_den, "XX")
-                numero_formulario = f"DGSH-CO-{siglas_comisario}-{anio_actual}-{ultimo_numero}"
-
-                # preparar actualización denuncia (usar el nombre correcto del campo objectid)
-                objid_den_value = safe_get(row, col_obj_denuncia, None)
-                globalid_den_value = safe_get(row, col_globalid_denuncia, None)
-
-                attrs_denuncia = {}
-                if col_obj_denuncia:
-                    attrs_denuncia[col_obj_denuncia] = objid_den_value
-                else:
-                    # fallback a 'objectid' por compatibilidad si no lo encontramos
-                    attrs_denuncia["objectid"] = objid_den_value
-
-                attrs_denuncia.update({
-                    "comisario_asignado": nombre_comisario,
+        # Terminar lo que una ejecución interrumpida dejó a medias (aquí no hay adjuntos);
+        # la tarea que ya está en Workforce aunque el diario no alcanzó a anotarla se
+        # toma como creada y la denuncia queda con el comisario de esa tarea
+        df_leidas = df_denuncias
+        col_oid_diario = col_obj_denuncia
+        if diario:
+            previas = TareasPrevias(
+                layer_asignaciones, assignmenttype_guid, col_globalid_denuncia or col_obj_denuncia,
+                lambda oid, clave, tarea: {"attributes": {
+                    col_obj_denuncia: oid,
+                    "comisario_asignado": tarea.get("nombrecomisario"),
                     "estado_tramite": "Asignado a comisario",
-                    "id_denuncia_comparar_comisario": str(globalid_den_value) if globalid_den_value else None
-                })
-                denuncias_actualizadas.append({"attributes": attrs_denuncia})
-
-                # preparar actualización tabla comisarios (usar su objectid real)
-                comisario_obj_val = safe_get(comisario_asignado, col_obj_comisario, None)
-                attrs_comisario = {}
-                if col_obj_comisario:
-                    attrs_comisario[col_obj_comisario] = comisario_obj_val
-                else:
-                    attrs_comisario["objectid"] = comisario_obj_val
-
-                # actualizar num_tramites y ultimo_numero si el campo existe, si no añadir como claves estándar
-                if col_num_tramites:
-                    try:
-                        cur_num = int(safe_get(comisario_asignado, col_num_tramites, 0))
-                    except Exception:
-                        cur_num = 0
-                    attrs_comisario[col_num_tramites] = cur_num + 1
-                else:
-                    attrs_comisario["num_tramites"] = 1
+                    "id_denuncia_comparar_comisario": clave if col_globalid_denuncia else None
+                }},
+                campos=("nombrecomisario",)
+            )
+            df_denuncias, completadas = reanudar(diario, df_denuncias, layer_denuncias,
+                                                 col_oid=col_oid_diario, previas=previas)
 
-                if col_ultimo_num:
-                    attrs_comisario[col_ultimo_num] = ultimo_numero
+        if df_denuncias.empty:
+            print("No hay denuncias para procesar.")
+            return
+
+        with fase("asignacion", registros=len(df_denuncias)):
+            # Cola de prioridad de comisarios (menos trámites primero, desempate por objectid).
+            # Se construye una vez y se actualiza tras cada asignación.
+            indice_comisarios = IndiceCarga(
+                comisarios,
+                col_num=columnas["num_tramites"],
+                col_ultimo=columnas["ultimo_numero"],
+                col_oid=columnas["objectid"]
+            )
+
+            # 1) Asignación: solo el recorrido que depende del orden (la cola de comisarios)
+            posiciones = []  # fila de df_denuncias de cada tarea
+            comisarios_por_tarea = []  # comisario elegido para cada tarea, en el mismo orden
+            workers_por_tarea = []
+
+            # MODO_ASIGNACION=optimo: todo el lote de una vez, respetando OPTIMO_CAPACIDAD
+            plan_lote = asignar_lote(indice_comisarios, [None] * len(df_denuncias)) if modo_optimo() else None
+
+            for posicion in range(len(df_denuncias)):
+                # elegir comisario con menos trámites (avanza num_tramites y ultimo_numero)
+                if plan_lote is not None:
+                    comisario_asignado = plan_lote[posicion]
                 else:
-                    attrs_comisario["ultimo_numero"] = ultimo_numero
+                    comisario_asignado = indice_comisarios.asignar()
+                if comisario_asignado is None:
+                    print("❌ No hay comisarios disponibles en la tabla")
+                    continue
 
-                comisarios_actualizados.append({"attributes": attrs_comisario})
+                nombre_comisario = comisario_asignado.nombre
+                username_comisario = comisario_asignado.usuario
 
                 # buscar worker en Workforce por userid/username
                 if username_comisario is None:
                     print(f"⚠️ No hay username para comisario {nombre_comisario}; se omite creación de tarea para esta denuncia.")
+                    indice_comisarios.liberar(comisario_asignado)
                     continue
 
-                # localizar index del worker en df_workers comparando con worker_user_col
-                if worker_user_col:
-                    matches = df_workers[df_workers[worker_user_col] == username_comisario]
-                else:
-                    # intentar con varias columnas comunes
-                    alt_col = find_col(df_workers.columns, ["username", "userid", "user", "usuario"])
-                    if alt_col:
-                        matches = df_workers[df_workers[alt_col] == username_comisario]
-                    else:
-                        matches = pd.DataFrame()
-
-                if matches.empty:
+                if username_comisario not in workers:
                     print(f"No se encontró al trabajador '{username_comisario}' en Workforce")
+                    indice_comisarios.liberar(comisario_asignado)
                     continue
 
-                # tomar el primer match y obtener su GlobalID desde features_workers (coincidir index)
-                worker_idx = matches.index[0]
-                try:
-                    worker_feature = features_workers.features[worker_idx]
-                    worker_globalid = worker_feature.attributes.get("GlobalID") or worker_feature.attributes.get("globalid")
-                except Exception:
-                    # fallback: intentar obtener 'GlobalID' desde el dataframe (si existe)
-                    worker_globalid = safe_get(matches.iloc[0], "GlobalID", safe_get(matches.iloc[0], "globalid", None))
-
+                worker_globalid = workers.get(username_comisario)
                 if not worker_globalid:
                     print(f"⚠️ Worker encontrado pero no tiene GlobalID: {username_comisario}")
+                    indice_comisarios.liberar(comisario_asignado)
                     continue
 
-                # geometría
-                geometry = extract_geometry_from_row(row)
-
-                descripcion_tarea = (
-                    f"Informe de supervisión finalizada\n"
-                    f"Infractor: {safe_get(row, 'cedula_infractor','')}\n"
-                    f"Proceso administrativo: {safe_get(row, 'proceso_administrativo','')}\n"
-                )
-
-                due_date_iso = (datetime.utcnow() + timedelta(days=3)).isoformat() + "Z"
-                assigned_date_iso = datetime.utcnow().isoformat() + "Z"
-
-                tarea_attributes = {
-                    "description": descripcion_tarea,
-                    "status": 1,
-                    "priority": 0,
-                    "assignmenttype": assignmenttype_guid,
-                    "location": safe_get(row, "direccion", ""),
-                    "workorderid": str(globalid_den_value) if globalid_den_value else (str(objid_den_value) if objid_den_value else ""),
-                    "codigoformulario": numero_formulario,
-                    "nombrecomisario": nombre_comisario,
-                    "workerid": worker_globalid,
-                    # fechas como ISO strings (evitamos objetos datetime crudos para prevenir problemas)
-                    "duedate": due_date_iso,
-                    "assigneddate": assigned_date_iso
-                }
-
-                tarea_dict = {"attributes": tarea_attributes, "geometry": geometry}
-                tareas_creadas.append(tarea_dict)
-
-            except Exception as e_row:
-                print("❌ Error procesando denuncia index", idx)
-                traceback.print_exc()
-                continue
+                posiciones.append(posicion)
+                comisarios_por_tarea.append(comisario_asignado)
+                workers_por_tarea.append(worker_globalid)
+
+            # números de formulario: un bloque por comisario reservado en el servidor;
+            # la denuncia cuyo comisario no pudo reservar queda para la próxima ejecución
+            reserva = ReservaNumeros(tabla_comisarios, col_oid=indice_comisarios.col_oid,
+                                     col_ultimo=indice_comisarios.col_ultimo, roster=roster_comisarios)
+            numeros = reserva.reservar(comisarios_por_tarea)
+            for comisario, numero in zip(comisarios_por_tarea, numeros):
+                if numero is None:
+                    indice_comisarios.liberar(comisario)
+            con_numero = [i for i, numero in enumerate(numeros) if numero is not None]
+            posiciones, comisarios_por_tarea, workers_por_tarea, numeros = (
+                [lista[i] for i in con_numero] for lista in (posiciones, comisarios_por_tarea, workers_por_tarea, numeros)
+            )
+
+            # 2) Payloads por columnas: formulario, descripción, geometría y actualización
+            df_tareas = df_denuncias.iloc[posiciones]
+            nombres = [c.nombre for c in comisarios_por_tarea]
+            siglas = pd.Series([str(c.siglas) for c in comisarios_por_tarea],
+                               index=df_tareas.index, dtype=object)
+
+            anio_actual = datetime.utcnow().year
+            numero_formulario = concatenar(
+                "DGSH-CO-", siglas, f"-{anio_actual}-",
+                pd.Series(numeros, index=df_tareas.index, dtype=object).map(str)
+            )
+
+            # workorderid: globalid de la denuncia, o su objectid si no tiene
+            globalids_den = valores(df_tareas, col_globalid_denuncia) if col_globalid_denuncia else [None] * len(df_tareas)
+            objids_den = valores(df_tareas, col_obj_denuncia)
+            workorderids = [
+                str(g) if g else (str(o) if o else "")
+                for g, o in zip(globalids_den, objids_den)
+            ]
+
+            # campos limpios y descripción recortada al largo de description en Workforce
+            descripcion_tarea = recortar(concatenar(
+                "Informe de supervisión finalizada\n",
+                "Infractor: ", texto_limpio(df_tareas, "cedula_infractor", ""), "\n",
+                "Proceso administrativo: ", texto_limpio(df_tareas, "proceso_administrativo", ""), "\n"
+            ), esquema(layer_asignaciones).longitud("description"))
+
+            # fechas como ISO strings (evitamos objetos datetime crudos para prevenir problemas)
+            due_date_iso = (datetime.utcnow() + timedelta(days=3)).isoformat() + "Z"
+            assigned_date_iso = datetime.utcnow().isoformat() + "Z"
+
+            tareas_creadas = registros({
+                "description": descripcion_tarea,
+                "status": 1,
+                "priority": 0,
+                "assignmenttype": assignmenttype_guid,
+                "location": valores(df_tareas, "direccion", ""),
+                "workorderid": workorderids,
+                "codigoformulario": numero_formulario,
+                "nombrecomisario": nombres,
+                "workerid": workers_por_tarea,
+                "duedate": due_date_iso,
+                "assigneddate": assigned_date_iso
+            }, geometrias=geometrias(df_tareas, destino=wkid_capa(layer_asignaciones), origen=wkid_capa(layer_denuncias)))
+
+            # preparar actualización denuncia (usar el nombre correcto del campo objectid)
+            denuncias_actualizadas = registros({
+                col_obj_denuncia: objids_den,
+                "comisario_asignado": nombres,
+                "estado_tramite": "Asignado a comisario",
+                "id_denuncia_comparar_comisario": [str(g) if g else None for g in globalids_den]
+            })
 
         # Debug: ver ejemplo y comprobar serialización
         if DEBUG:
@@ -310,28 +274,77 @@ def ejecutar_asignacion_comisario():
                     print(json.dumps(item, default=str, ensure_ascii=False))
                 except Exception as e_item:
                     print(" -> sigue sin serializarse:", e_item)
+            reserva.devolver()
             return
 
-        # Guardar tareas (adds)
+        # Guardar tareas (adds) en lotes, reintentando solo las fallidas
+        denuncias_confirmadas = []
         try:
             if tareas_creadas:
-                resp_tareas = layer_asignaciones.edit_features(adds=tareas_creadas)
-                print("Tareas de comisario creadas:", resp_tareas)
+                print("Tareas de comisario creadas:")
+                resp_tareas = aplicar_ediciones(layer_asignaciones, adds=tareas_creadas, claves=CLAVES_TAREA)
+                # solo pasa a "Asignado a comisario" la denuncia cuya tarea existe en Workforce
+                for i, ok in enumerate(exitosos(resp_tareas["addResults"])):
+                    if ok:
+                        denuncias_confirmadas.append(denuncias_actualizadas[i])
+                        reserva.confirmar(comisarios_por_tarea[i], numeros[i])
+                    else:
+                        indice_comisarios.liberar(comisarios_por_tarea[i])
+                if diario:
+                    diario.registrar([
+                        (denuncias_actualizadas[i]["attributes"][col_oid_diario], TAREA_CREADA,
+                         result.get("objectId"), denuncias_actualizadas[i])
+                        for i, result in enumerate(resp_tareas["addResults"]) if result.get("success")
+                    ])
             else:
                 print("No se crearon tareas de comisario.")
         except Exception as e:
-            print("❌ Error al llamar edit_features(adds=...):")
+            print("❌ Error al crear las tareas de comisario:")
             traceback.print_exc()
+            reserva.devolver()
             return
 
+        # una fila consolidada por comisario con sus contadores finales;
+        # ultimo_numero ya quedó escrito por la reserva (se devuelven los no usados)
+        numeros_finales = reserva.devolver()
+        comisarios_actualizados = indice_comisarios.actualizaciones(con_ultimo=False)
+
         # Actualizar denuncias y comisarios (updates)
         try:
-            if denuncias_actualizadas:
-                resp_denuncias = layer_denuncias.edit_features(updates=denuncias_actualizadas)
-                print("Denuncias actualizadas:", resp_denuncias)
+            # tablas distintas: las dos ediciones van a la vez
+            ediciones = []
+            if denuncias_confirmadas:
+                ediciones.append((layer_denuncias, lambda: aplicar_ediciones(
+                    layer_denuncias, updates=denuncias_confirmadas, nombre="denuncias")))
             if comisarios_actualizados:
-                resp_comisarios = tabla_comisarios.edit_features(updates=comisarios_actualizados)
-                print("Comisarios actualizados:", resp_comisarios)
+                def escribir_comisarios():
+                    with roster_comisarios.escritura():
+                        return aplicar_ediciones(tabla_comisarios, updates=comisarios_actualizados, nombre="comisarios")
+                ediciones.append((tabla_comisarios, escribir_comisarios))
+            # cada edición trae su resultado o su excepción: una no descarta la otra
+            respuestas = simultaneas(*ediciones)
+
+            if denuncias_confirmadas:
+                resp_denuncias = respuestas.pop(0)
+                if isinstance(resp_denuncias, Exception):
+                    print(f"❌ Error al actualizar las denuncias: {resp_denuncias}")
+                    resp_denuncias = {"updateResults": []}
+                for feature, ok in zip(denuncias_confirmadas, exitosos(resp_denuncias["updateResults"])):
+                    if ok:
+                        completadas.add(feature["attributes"][col_oid_diario])
+                    else:
+                        print(f"⚠️ La tarea se creó pero la denuncia {feature['attributes']} no se actualizó")
+            if comisarios_actualizados:
+                resp_comisarios = respuestas.pop(0)
+                if isinstance(resp_comisarios, Exception):
+                    # no se sabe qué contadores quedaron escritos: la copia local se vuelve a leer
+                    print(f"❌ Error al actualizar los comisarios: {resp_comisarios}")
+                    roster_comisarios.editada_por_otro()
+                    resp_comisarios = {"updateResults": []}
+                # la copia local queda al día con lo que el servicio confirmó
+                roster_comisarios.aplicar([
+                    update for update, ok in zip(comisarios_actualizados, exitosos(resp_comisarios["updateResults"])) if ok
+                ] + numeros_finales)
         except Exception as e:
             print("❌ Error al actualizar denuncias/comisarios:")
             traceback.print_exc()
@@ -341,5 +354,15 @@ def ejecutar_asignacion_comisario():
         print("❌ Error general en la ejecución:")
         traceback.print_exc()
 
+    finally:
+        if diario:
+            if completadas:
+                diario.registrar([(oid, COMPLETADO, None, None) for oid in completadas])
+            if df_leidas is not None:
+                diario.avanzar(df_leidas, completadas, col_oid=col_oid_diario)
+            diario.purgar()
+            diario.cerrar()
+
 if __name__ == "__main__":
-    ejecutar_asignacion_comisario()
+    with ejecucion(ETAPA), etapa(ETAPA):
+        ejecutar_asignacion_comisario()
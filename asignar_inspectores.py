@@ -1,228 +1,401 @@
-from arcgis.gis import GIS
 import pandas as pd
-from arcgis.features import FeatureLayer, Feature
-from datetime import timedelta, datetime
-import os
+from datetime import datetime
+from asignador.sesion import Contexto, iniciar_sesion
+from asignador.consultas import (
+    planificar_consulta, consultar_paginado, paginas, verificacion_activa, verificar_globalids
+)
+from asignador.asignacion import IndiceCarga
+from asignador.registros import personas
+from asignador.esquema import esquema
+from asignador.adjuntos import copiar_adjuntos
+from asignador.asincrono import simultaneas, sin_errores
+from asignador.escritura import CLAVES_TAREA, aplicar_ediciones, exitosos
+from asignador.secuencias import ReservaNumeros
+from asignador.flujo import COLA, LOTE, encadenar, modo_flujo, tramos
+from asignador.metricas import ejecucion, etapa, fase
+from asignador.espacial import modo_espacial, preparar
+from asignador.optimizacion import asignar_lote, modo_optimo
+from asignador.geometria import geometrias, puntos, wkid_capa
+from asignador.tareas import concatenar, registros, texto, valores, vencimientos
+from asignador.texto import recortar, texto_limpio
+from asignador.incremental import (
+    Diario, TareasPrevias, modo_incremental, reanudar, TAREA_CREADA, ADJUNTOS_COPIADOS, COMPLETADO
+)
 
 print("🟡 Script iniciado...")  # <-- Rastreo inicial
 
-def ejecutar_asignacion():
-    print("🟡 Ejecutando función asignar_inspectores")
-    usuario = os.getenv("AGOL_USERNAME")
-    clave = os.getenv("AGOL_PASSWORD")
-    if not usuario or not clave:
-        print("❌ No se encontraron credenciales en las variables de entorno.")
-        return
-    try:
-        gis = GIS("https://www.arcgis.com", usuario, clave)
-        print(f"🟢 Sesión iniciada como: {gis.users.me.username}")
-    except Exception as e:
-        print(f"❌ Error al iniciar sesión en ArcGIS Online: {e}")
-        return
-
-    # Items
-    item_tabla = gis.content.get("a255f5953df24eb08917602c1d89885e")  # inspectores
-    item_denuncia = gis.content.get("60c69b82ab074b65a8a239fcd2067ce4")  # denuncias
-    item_workforce = gis.content.get("bf86d367917747cf82fb57a9128eed0e")  # workforce
-
-    # Capas y tablas
-    tabla_inspectores = item_tabla.tables[0]
-    layer_denuncias = item_denuncia.layers[0]
-    layer_asignaciones = item_workforce.layers[0]
-    layer_workers = item_workforce.layers[1]
+ETAPA = "inspeccion"
+ESTADO_DENUNCIA = "Recibido"
+FILTRO_DENUNCIAS = "estado_tramite = 'Recibido'"
 
-    # Consultas
-    features_inspectores = tabla_inspectores.query(where="1=1", out_fields="*", return_geometry=False)
-    features_denuncias = layer_denuncias.query(where="1=1", out_fields="*", return_geometry=True)
-    features_workers = layer_workers.query(where="1=1", out_fields="*", return_geometry=False)
+# Campos de la denuncia que realmente usa la asignación
+CAMPOS_DENUNCIA = [
+    "objectid", "globalid", "direccion_responsable", "area_responsable", "siglas_area",
+    "tipo_infraccion", "direccion_infraccion", "denunciado", "comentario_denuncia",
+    "contacto_denunciante_no", "fecha_actual",
+]
+# Sin estos no se puede asignar: el resto, si falta en la capa, queda vacío
+OBLIGATORIOS_DENUNCIA = ["objectid", "globalid", "direccion_responsable", "area_responsable"]
 
-    df_inspectores = features_inspectores.sdf
-    df_denuncias = features_denuncias.sdf
-    df_workers = features_workers.sdf
-
-    # Filtrar denuncias con estado "Recibido"
-    df_nuevas = df_denuncias[df_denuncias["estado_tramite"] == "Recibido"].copy()
-    print(f"Total de denuncias 'Recibido' encontradas: {len(df_nuevas)}")
+def ejecutar_asignacion(ctx=None):
+    print("🟡 Ejecutando función asignar_inspectores")
+    if ctx is None:
+        gis = iniciar_sesion()
+        if gis is None:
+            return
+        ctx = Contexto(gis)
 
-    # Listas de actualizaciones
-    denuncias_actualizadas = []
-    inspectores_actualizados = []
-    tareas_creadas = []
+    # Capas y tablas
+    tabla_inspectores = ctx.tabla_inspectores
+    layer_denuncias = ctx.layer_denuncias
+    layer_asignaciones = ctx.layer_asignaciones
+
+    # Modo incremental (INCREMENTAL=1): marca de agua y diario por registro
+    diario = Diario(ETAPA) if modo_incremental() else None
+    # Modo por flujo (FLUJO=1): las páginas de denuncias se procesan y escriben por lotes
+    flujo = modo_flujo()
+
+    # Campos de la denuncia resueltos contra el esquema (se detiene si falta uno obligatorio)
+    esquema_denuncias = esquema(layer_denuncias)
+    campos_denuncia = esquema_denuncias.out_fields(
+        CAMPOS_DENUNCIA + [diario.campo] if diario else CAMPOS_DENUNCIA,
+        obligatorios=OBLIGATORIOS_DENUNCIA
+    )
+    # Nombres reales del objectid y el globalid de la capa (las columnas del sdf)
+    col_oid = esquema_denuncias.campo("objectid")
+    col_gid = esquema_denuncias.campo("globalid")
+    # Largo del campo description de las tareas (la descripción se recorta a él)
+    longitud_descripcion = esquema(layer_asignaciones).longitud("description")
+
+    # Consultas: inspectores, workers y denuncias son independientes y van a la vez
+    roster_inspectores = ctx.roster("inspectores")
+    layer_workers = ctx.layer_workers
+    consultas = [
+        (tabla_inspectores, roster_inspectores.cargar),
+        (layer_workers, ctx.trabajadores),
+    ]
+
+    # Denuncias "Recibido": el filtro y los campos se resuelven en el servidor
+    # (o vienen de la lectura compartida del orquestador)
+    df_nuevas = ctx.denuncias(ESTADO_DENUNCIA)
+    plan_denuncias = planificar_consulta(
+        where=diario.filtro(FILTRO_DENUNCIAS) if diario else FILTRO_DENUNCIAS,
+        campos=campos_denuncia,
+        return_geometry=True,
+        orden=col_oid
+    )
+    if df_nuevas is None and not flujo:
+        consultas.append((layer_denuncias, lambda: consultar_paginado(layer_denuncias, plan_denuncias).sdf))
+
+    df_inspectores, workers, *resto = sin_errores(simultaneas(*consultas))
+    if resto:
+        df_nuevas = resto[0]
+
+    def leer_paginas():
+        # paginación por objectid: lo que ya se escribió deja de ser "Recibido"
+        iterador = paginas(layer_denuncias, plan_denuncias, LOTE, por_clave=True)
+        while True:
+            with fase("consulta") as medicion:
+                pagina = next(iterador, None)
+                if pagina is None:
+                    return
+                df_pagina = pagina.sdf
+                medicion.registros = len(df_pagina)
+            if not df_pagina.empty:
+                yield df_pagina
+
+    if flujo:
+        fuente = tramos(df_nuevas) if df_nuevas is not None else leer_paginas()
+    else:
+        print(f"Total de denuncias 'Recibido' encontradas: {len(df_nuevas)}")
+        fuente = [df_nuevas]
+
+    # Índice de carga: un montículo por (direccion, area), construido una sola vez
+    # sobre registros compactos con las columnas que resolvió el esquema de la tabla.
+    # Con FLUJO=1 el índice y la reserva solo se usan en el hilo de crear_tareas;
+    # al hilo principal llegan copias (lote["inspectores"], lote["numeros_finales"])
+    columnas = roster_inspectores.mapa
+    indice_inspectores = IndiceCarga(
+        personas(df_inspectores, columnas),
+        col_num=columnas["num_tramites"],
+        col_ultimo=columnas["ultimo_numero"],
+        col_oid=columnas["objectid"]
+    )
+
+    # Números de formulario: un bloque por inspector reservado en el servidor
+    reserva = ReservaNumeros(tabla_inspectores, col_oid=indice_inspectores.col_oid,
+                             col_ultimo=indice_inspectores.col_ultimo, roster=roster_inspectores)
 
     # GUID del tipo de asignación "Inspeccion"
     assignmenttype_guid = "22309f2f-e893-4443-97eb-1b6944a27d00"
 
-    for _, row in df_nuevas.iterrows():
-        direccion = row["direccion_responsable"]
-        area = row["area_responsable"]
-
-        disponibles = df_inspectores[
-            (df_inspectores["direccion"] == direccion) &
-            (df_inspectores["area"] == area)
-        ]
-
-        if disponibles.empty:
-            print(f"No hay inspectores activos para dirección: {direccion}, área: {area}")
-            continue
-
-        # Seleccionar inspector con menos trámites asignados
-        inspector_asignado = disponibles.sort_values("num_tramites").iloc[0]
-
-        # Generar número de formulario
-        siglas_area = row["siglas_area"]  # viene de la denuncia
-        nombre_inspector = inspector_asignado["nombre"]
-        siglas_inspector = inspector_asignado["siglas"]
-        anio_actual = datetime.utcnow().year
-        ultimo_numero = inspector_asignado.get("ultimo_numero", 0) + 1
-
-        numero_formulario = f"DGSH-IC-{siglas_inspector}-{siglas_area}-{anio_actual}-{ultimo_numero}"
-
-        # ✅ Bloque de comprobación del GLOBALID
-        globalid_test = row["globalid"]
-        print("🔎 Probando GlobalID:", globalid_test)
-
-        result = layer_denuncias.query(
-            where=f"GLOBALID = '{globalid_test}'",
-            out_fields="*",
-            return_geometry=False
-        )
-
-        if result.features:
-            print("✅ Registro encontrado en layer_denuncias:")
-            atributos = result.features[0].attributes
-            for k, v in atributos.items():
-                print(f"   {k}: {v}")
-        else:
-            print("❌ No se encontró ningún registro con ese GLOBALID en layer_denuncias")
-
-        # Actualizar denuncia
-        feature_denuncia = Feature.from_dict({
-            "attributes": {
-                "objectid": row["objectid"],
-                "inspector_asignado": inspector_asignado["nombre"],
-                "username": inspector_asignado["usernamearc"],
+    # Tareas que una ejecución interrumpida creó sin llegar a anotarlas en el diario:
+    # la denuncia se actualiza con el inspector de la tarea que ya está en Workforce
+    previas = None
+    if diario:
+        inspector_de_worker = {workers.get(p.usuario): p for p in indice_inspectores.registros}
+
+        def actualizacion_previa(oid, globalid, tarea):
+            atributos = {
+                col_oid: oid,
+                "inspector_asignado": tarea.get("nombreinspector"),
                 "estado_tramite": "En proceso",
-                "id_denuncia_c": str(row["globalid"])
-            }
-        })
-        denuncias_actualizadas.append(feature_denuncia)
-
-        # Actualizar inspector
-        feature_inspector = Feature.from_dict({
-            "attributes": {
-                "objectid": inspector_asignado["ObjectID"],
-                "num_tramites": inspector_asignado["num_tramites"] + 1,
-                "ultimo_numero": ultimo_numero
+                "id_denuncia_c": globalid
             }
-        })
-        inspectores_actualizados.append(feature_inspector)
-
-        # Obtener GlobalID del trabajador
-        worker_index = df_workers[df_workers["userid"] == inspector_asignado["usernamearc"]].index
-        if worker_index.empty:
-            print(f"No se encontró al trabajador {inspector_asignado['usernamearc']} en Workforce")
-            continue
-
-        worker_feature = features_workers.features[worker_index[0]]
-        worker_globalid = worker_feature.attributes["GlobalID"]
-
-        # Geometría
-        shape_dict = row.get("SHAPE") or row.get("geometry")
-        geometry = None
-        if shape_dict:
-            geometry = {
-                "x": shape_dict.get("x"),
-                "y": shape_dict.get("y"),
-                "spatialReference": {"wkid": 4326}
-            }
-
-        # Campos adicionales para la descripción
-        tipo_infraccion = row.get("tipo_infraccion", "Sin especificar")
-        direccion_infraccion = row.get("direccion_infraccion", "Sin referencia")
-        denunciado = row.get("denunciado", "No registrado")
-        descripcion_infraccion = row.get("comentario_denuncia", "Sin detalle")
-        contacto = row.get("contacto_denunciante_no", "No disponible")
-
-        # Descripción formateada
-        descripcion_tarea = (
-            f"Infracción reportada: {tipo_infraccion}\n"
-            f"Referencia: {direccion_infraccion}\n"
-            f"Denunciado: {denunciado}\n"
-            f"Información adicional: {descripcion_infraccion}\n"
-            f"Contacto del denunciante: {contacto}"
-        )
-
-        # Fecha de vencimiento
-        fecha_actual_str = row.get("fecha_actual")
-        due_date = None
-        if fecha_actual_str:
-            try:
-                fecha_actual = pd.to_datetime(fecha_actual_str)
-                due_date = fecha_actual + timedelta(days=3)
-            except Exception as e:
-                print(f"Error al convertir fecha_actual: {e}")
-
-        # Crear tarea
-        tarea = Feature.from_dict({
-            "attributes": {
-                "description": descripcion_tarea,
-                "status": 1,
-                "priority": 0,
-                "assignmenttype": assignmenttype_guid,
-                "location": row["area_responsable"],
-                "workorderid": str(row["globalid"]),
-                "codigoformulario": numero_formulario,
-                "nombreinspector": nombre_inspector,
-                "workerid": worker_globalid,
-                "duedate": due_date,
-                "assigneddate": datetime.utcnow()
-            },
-            "geometry": geometry
-        })
-        tareas_creadas.append(tarea)
-
-    # Guardar tareas y obtener sus IDs
-    if tareas_creadas:
-        respuesta_tareas = layer_asignaciones.edit_features(adds=tareas_creadas)
-        print("Tareas creadas en Workforce:")
-        print(respuesta_tareas)
-
-        # Asociar adjuntos
-        for i, result in enumerate(respuesta_tareas.get("addResults", [])):
-            if result.get("success"):
-                oid_tarea = result.get("objectId")
-                oid_denuncia = df_nuevas.iloc[i]["objectid"]
-                adjuntos = layer_denuncias.attachments.get_list(oid=oid_denuncia)
-
-                for adj in adjuntos:
-                    try:
-                        contenido = layer_denuncias.attachments.download(
-                            oid=int(oid_denuncia),
-                            attachment_id=adj["id"]
+            inspector = inspector_de_worker.get(tarea.get("workerid"))
+            if inspector is not None:
+                atributos["username"] = inspector.usuario
+            return {"attributes": atributos}
+
+        previas = TareasPrevias(layer_asignaciones, assignmenttype_guid, col_gid, actualizacion_previa,
+                                campos=("nombreinspector", "workerid"))
+
+    # MODO_ASIGNACION=espacial: además de la carga, la distancia a la denuncia;
+    # MODO_ASIGNACION=optimo: todo el lote resuelto de una vez (carga + distancia)
+    espacial = {"asignador": None}
+
+    def depurar(lotes):
+        """Termina lo que una ejecución interrumpida dejó a medias y verifica los GlobalID."""
+        for df_leidas in lotes:
+            df_lote = df_leidas
+            completadas_lote = set()
+            if diario:
+                df_lote, completadas_lote = reanudar(diario, df_lote, layer_denuncias, layer_asignaciones,
+                                                     col_oid=col_oid, previas=previas)
+
+            # ✅ Comprobación de GLOBALID en lote (se desactiva con VERIFICAR_GLOBALID=0)
+            if verificacion_activa() and not df_lote.empty:
+                confirmados, faltantes = verificar_globalids(layer_denuncias, df_lote[col_gid], campo=col_gid)
+                if faltantes:
+                    df_lote = df_lote[df_lote[col_gid].astype(str).isin(confirmados)]
+            yield {"leidas": df_leidas, "denuncias": df_lote, "completadas": completadas_lote}
+
+    def crear_tareas(lotes):
+        """Asigna inspector, reserva números, arma y crea las tareas del lote."""
+        for lote in lotes:
+            df_lote = lote["denuncias"]
+            asignador_espacial = espacial["asignador"]
+            plan_lote = None
+            if (modo_espacial() or modo_optimo()) and not df_lote.empty:
+                x_denuncias, y_denuncias, wkid_denuncias = puntos(
+                    df_lote, destino=wkid_capa(layer_asignaciones), origen=wkid_capa(layer_denuncias)
+                )
+                if asignador_espacial is None:
+                    asignador_espacial = espacial["asignador"] = preparar(indice_inspectores, layer_workers, wkid_denuncias)
+                if modo_optimo():
+                    plan_lote = asignar_lote(
+                        indice_inspectores, zip(df_lote["direccion_responsable"], df_lote["area_responsable"]),
+                        asignador_espacial, x_denuncias, y_denuncias
+                    )
+
+            with fase("asignacion", registros=len(df_lote)):
+                # 1) Asignación: solo el recorrido que depende del orden (el índice de carga)
+                posiciones = []  # fila de df_lote de cada tarea
+                inspectores_por_tarea = []  # inspector elegido para cada tarea, en el mismo orden
+                workers_por_tarea = []
+                grupos = zip(df_lote["direccion_responsable"], df_lote["area_responsable"]) if not df_lote.empty else []
+                for posicion, (direccion, area) in enumerate(grupos):
+                    # Seleccionar inspector con menos trámites asignados (actualiza sus contadores)
+                    if plan_lote is not None:
+                        inspector_asignado = plan_lote[posicion]
+                    elif asignador_espacial:
+                        inspector_asignado = asignador_espacial.asignar(
+                            (direccion, area), x_denuncias[posicion], y_denuncias[posicion]
                         )
-                        if isinstance(contenido, list) and contenido:
-                            resultado = layer_asignaciones.attachments.add(oid_tarea, contenido[0])
-                        else:
-                            print(f"⚠️ No se pudo descargar el adjunto '{adj['name']}' correctamente.")
-                    except Exception as e:
-                        print(f"❌ Excepción al copiar adjunto '{adj['name']}': {e}")
-    else:
-        print("No hay tareas para crear.")
-
-    # Actualizar denuncias e inspectores
-    if denuncias_actualizadas:
-        respuesta_denuncias = layer_denuncias.edit_features(updates=denuncias_actualizadas)
-        print("Actualización de denuncias:")
-        print(respuesta_denuncias)
-    else:
-        print("No hay denuncias para actualizar.")
-
-    if inspectores_actualizados:
-        respuesta_inspectores = tabla_inspectores.edit_features(updates=inspectores_actualizados)
-        print("Actualización de inspectores:")
-        print(respuesta_inspectores)
-    else:
-        print("No hay inspectores para actualizar.")
+                    else:
+                        inspector_asignado = indice_inspectores.asignar((direccion, area))
+                    if inspector_asignado is None:
+                        print(f"No hay inspectores activos para dirección: {direccion}, área: {area}")
+                        continue
+
+                    # Obtener GlobalID del trabajador
+                    worker_globalid = workers.get(inspector_asignado.usuario)
+                    if worker_globalid is None:
+                        print(f"No se encontró al trabajador {inspector_asignado.usuario} en Workforce")
+                        indice_inspectores.liberar(inspector_asignado)
+                        continue
+
+                    posiciones.append(posicion)
+                    inspectores_por_tarea.append(inspector_asignado)
+                    workers_por_tarea.append(worker_globalid)
+
+                # la tarea cuyo inspector no pudo reservar números se deja para la próxima ejecución
+                numeros = reserva.reservar(inspectores_por_tarea)
+                for inspector, numero in zip(inspectores_por_tarea, numeros):
+                    if numero is None:
+                        indice_inspectores.liberar(inspector)
+                con_numero = [i for i, numero in enumerate(numeros) if numero is not None]
+                posiciones, inspectores_por_tarea, workers_por_tarea, numeros = (
+                    [lista[i] for i in con_numero] for lista in (posiciones, inspectores_por_tarea, workers_por_tarea, numeros)
+                )
+
+                # 2) Payloads: descripción, fechas, formulario y geometría por columnas
+                df_tareas = df_lote.iloc[posiciones]
+                oids_origen = df_tareas[col_oid].tolist() if posiciones else []  # objectid de la denuncia de cada tarea
+                tareas_creadas = []
+                denuncias_actualizadas = []
+                if posiciones:
+                    nombres = [insp.nombre for insp in inspectores_por_tarea]
+                    usuarios = [insp.usuario for insp in inspectores_por_tarea]
+                    siglas = pd.Series([insp.siglas for insp in inspectores_por_tarea], index=df_tareas.index)
+                    globalids = df_tareas[col_gid].astype(object).map(str)
+
+                    # Generar número de formulario
+                    anio_actual = datetime.utcnow().year
+                    numero_formulario = concatenar(
+                        "DGSH-IC-", siglas.map(str), "-", texto(df_tareas, "siglas_area"),
+                        f"-{anio_actual}-", pd.Series(numeros, index=df_tareas.index).map(str)
+                    )
+
+                    # Descripción formateada (campos limpios, recortada al largo de description)
+                    descripcion_tarea = recortar(concatenar(
+                        "Infracción reportada: ", texto_limpio(df_tareas, "tipo_infraccion", "Sin especificar"),
+                        "\nReferencia: ", texto_limpio(df_tareas, "direccion_infraccion", "Sin referencia"),
+                        "\nDenunciado: ", texto_limpio(df_tareas, "denunciado", "No registrado"),
+                        "\nInformación adicional: ", texto_limpio(df_tareas, "comentario_denuncia", "Sin detalle"),
+                        "\nContacto del denunciante: ", texto_limpio(df_tareas, "contacto_denunciante_no", "No disponible")
+                    ), longitud_descripcion)
+
+                    # Crear tareas
+                    tareas_creadas = registros({
+                        "description": descripcion_tarea,
+                        "status": 1,
+                        "priority": 0,
+                        "assignmenttype": assignmenttype_guid,
+                        "location": valores(df_tareas, "area_responsable"),
+                        "workorderid": globalids,
+                        "codigoformulario": numero_formulario,
+                        "nombreinspector": nombres,
+                        "workerid": workers_por_tarea,
+                        "duedate": vencimientos(df_tareas, "fecha_actual", dias=3),
+                        "assigneddate": datetime.utcnow()
+                    }, geometrias=geometrias(df_tareas, destino=wkid_capa(layer_asignaciones), origen=wkid_capa(layer_denuncias)))
+
+                    # Actualizar denuncias
+                    denuncias_actualizadas = registros({
+                        col_oid: oids_origen,
+                        "inspector_asignado": nombres,
+                        "username": usuarios,
+                        "estado_tramite": "En proceso",
+                        "id_denuncia_c": globalids
+                    })
+
+            # Guardar tareas y obtener sus IDs
+            denuncias_confirmadas = []
+            pares = []
+            if tareas_creadas:
+                print("Tareas creadas en Workforce:")
+                respuesta_tareas = aplicar_ediciones(layer_asignaciones, adds=tareas_creadas, claves=CLAVES_TAREA)
+                resultados_tareas = respuesta_tareas["addResults"]
+
+                # Solo pasa a "En proceso" la denuncia cuya tarea existe en Workforce;
+                # si la tarea falló, el inspector no suma el trámite
+                for i, ok in enumerate(exitosos(resultados_tareas)):
+                    if ok:
+                        denuncias_confirmadas.append(denuncias_actualizadas[i])
+                        reserva.confirmar(inspectores_por_tarea[i], numeros[i])
+                    else:
+                        indice_inspectores.liberar(inspectores_por_tarea[i])
+                if diario:
+                    diario.registrar([
+                        (oids_origen[i], TAREA_CREADA, result.get("objectId"), denuncias_actualizadas[i])
+                        for i, result in enumerate(resultados_tareas) if result.get("success")
+                    ])
+                pares = [
+                    (oids_origen[i], result.get("objectId"))
+                    for i, result in enumerate(resultados_tareas)
+                    if result.get("success")
+                ]
+            else:
+                print("No hay tareas para crear.")
+
+            # Una actualización consolidada por inspector con sus contadores del lote;
+            # ultimo_numero ya quedó escrito por la reserva (se devuelven los no usados)
+            lote["numeros_finales"] = reserva.devolver()
+            lote["inspectores"] = indice_inspectores.actualizaciones(con_ultimo=False, vaciar=True)
+            lote["denuncias_confirmadas"] = denuncias_confirmadas
+            lote["pares"] = pares
+            yield lote
+
+    def asociar_adjuntos(lotes):
+        """Copia los adjuntos de cada denuncia a su tarea (en paralelo)."""
+        for lote in lotes:
+            if lote["pares"]:
+                copiar_adjuntos(layer_denuncias, layer_asignaciones, lote["pares"])
+                if diario:
+                    diario.registrar([(oid, ADJUNTOS_COPIADOS, None, None) for oid, _ in lote["pares"]])
+            yield lote
+
+    completadas = set()
+    leidas = []
+    total = 0
+    for lote in encadenar(fuente, depurar, crear_tareas, asociar_adjuntos, maximo=COLA if flujo else 0):
+        total += len(lote["leidas"])
+        completadas |= lote["completadas"]
+        denuncias_confirmadas = lote["denuncias_confirmadas"]
+        inspectores_actualizados = lote["inspectores"]
+
+        # Actualizar denuncias e inspectores (son tablas distintas: van a la vez)
+        ediciones = []
+        if denuncias_confirmadas:
+            ediciones.append((layer_denuncias, lambda: aplicar_ediciones(layer_denuncias, updates=denuncias_confirmadas, nombre="denuncias")))
+        else:
+            print("No hay denuncias para actualizar.")
+        if inspectores_actualizados:
+            def escribir_inspectores():
+                with roster_inspectores.escritura():
+                    return aplicar_ediciones(tabla_inspectores, updates=inspectores_actualizados, nombre="inspectores")
+            ediciones.append((tabla_inspectores, escribir_inspectores))
+        else:
+            print("No hay inspectores para actualizar.")
+        # cada edición trae su resultado o su excepción: una no descarta la otra
+        respuestas = simultaneas(*ediciones)
+
+        completadas_lote = set()
+        if denuncias_confirmadas:
+            respuesta_denuncias = respuestas.pop(0)
+            if isinstance(respuesta_denuncias, Exception):
+                print(f"❌ Error al actualizar las denuncias: {respuesta_denuncias}")
+                respuesta_denuncias = {"updateResults": []}
+            for feature, ok in zip(denuncias_confirmadas, exitosos(respuesta_denuncias["updateResults"])):
+                if ok:
+                    completadas_lote.add(feature["attributes"][col_oid])
+                else:
+                    print(f"⚠️ La tarea se creó pero la denuncia {feature['attributes'][col_oid]} sigue en 'Recibido'")
+        completadas |= completadas_lote
+
+        # la copia local queda al día con lo que el servicio confirmó
+        confirmados = []
+        if inspectores_actualizados:
+            respuesta_inspectores = respuestas.pop(0)
+            if isinstance(respuesta_inspectores, Exception):
+                # no se sabe qué contadores quedaron escritos: la copia local se vuelve a leer
+                print(f"❌ Error al actualizar los inspectores: {respuesta_inspectores}")
+                roster_inspectores.editada_por_otro()
+                respuesta_inspectores = {"updateResults": []}
+            confirmados = [
+                update for update, ok in zip(inspectores_actualizados, exitosos(respuesta_inspectores["updateResults"])) if ok
+            ]
+        if confirmados or lote["numeros_finales"]:
+            roster_inspectores.aplicar(confirmados + lote["numeros_finales"])
+
+        if diario:
+            diario.registrar([(oid, COMPLETADO, None, None) for oid in completadas_lote])
+            # para la marca de agua basta el objectid y el campo de la marca de cada denuncia leída
+            columnas = [c for c in (col_oid, diario.campo) if c in lote["leidas"].columns]
+            leidas.append(lote["leidas"][columnas])
+
+    if flujo:
+        print(f"Total de denuncias 'Recibido' procesadas por lotes: {total}")
+    if espacial["asignador"] and not modo_optimo():
+        espacial["asignador"].imprimir_reporte()
+
+    if diario:
+        if leidas:
+            diario.avanzar(pd.concat(leidas), completadas, col_oid=col_oid)
+        diario.purgar()
+        diario.cerrar()
 
 if __name__ == "__main__":
-    ejecutar_asignacion()
+    with ejecucion(ETAPA), etapa(ETAPA):
+        ejecutar_asignacion()
@@ -1,187 +1,189 @@
-from arcgis.gis import GIS
 import pandas as pd
-from arcgis.features import Feature
-from datetime import timedelta, datetime
-import os
-import re
+from datetime import datetime
+from asignador.sesion import Contexto, iniciar_sesion
+from asignador.consultas import verificacion_activa, verificar_globalids
+from asignador.esquema import esquema
+from asignador.adjuntos import copiar_adjuntos
+from asignador.escritura import CLAVES_TAREA, aplicar_ediciones, exitosos
+from asignador.metricas import ejecucion, etapa, fase
+from asignador.geometria import geometrias, wkid_capa
+from asignador.tareas import concatenar, registros, valores, vencimientos
+from asignador.texto import recortar, texto_limpio
+from asignador.incremental import (
+    Diario, TareasPrevias, modo_incremental, reanudar, TAREA_CREADA, ADJUNTOS_COPIADOS, COMPLETADO
+)
 
 print("🟡 Script de supervisión iniciado...")
 
-def limpiar_texto(texto):
-    """
-    Limpia caracteres que pueden causar errores en campos HTML (como description en Workforce).
-    Maneja valores None y pd.NA de Pandas.
-    """
-    if texto is None or pd.isna(texto):
-        return ""
-    texto = str(texto)
-    texto = re.sub(r"<.*?>", "", texto)  # elimina etiquetas HTML si existen
-    texto = texto.replace("\r", "").replace("\n", " | ")
-    return texto.strip()
-
-def ejecutar_asignacion_supervision():
-    usuario = os.getenv("AGOL_USERNAME")
-    clave = os.getenv("AGOL_PASSWORD")
-    if not usuario or not clave:
-        print("❌ No se encontraron credenciales en las variables de entorno.")
-        return
-    try:
-        gis = GIS("https://www.arcgis.com", usuario, clave)
-        print(f"🟢 Sesión iniciada como: {gis.users.me.username}")
-    except Exception as e:
-        print(f"❌ Error al iniciar sesión en ArcGIS Online: {e}")
-        return
-
-    # Items
-    item_denuncia = gis.content.get("60c69b82ab074b65a8a239fcd2067ce4")  # registro_infracciones-gadmr
-    item_workforce = gis.content.get("bf86d367917747cf82fb57a9128eed0e")  # Workforce
+ETAPA = "supervision"
+ESTADO_INFORME = "Informe enviado"
+FILTRO_INFORMES = "estado_tramite = 'Informe enviado'"
+
+# Campos del informe que usa la tarea de supervisión
+CAMPOS_INFORME = [
+    "objectid", "globalid", "infractor", "direccion_infraccion", "inspector_inspeccion",
+    "cedula_infractor", "nombre_denunciado", "antecedentes", "desarrollo", "conclusiones",
+    "direccion", "fecha_actual",
+]
+OBLIGATORIOS_INFORME = ["objectid", "globalid"]
+
+def ejecutar_asignacion_supervision(ctx=None):
+    if ctx is None:
+        gis = iniciar_sesion()
+        if gis is None:
+            return
+        ctx = Contexto(gis)
 
     # Capas
-    layer_denuncias = item_denuncia.layers[0]
-    layer_asignaciones = item_workforce.layers[0]
-    layer_workers = item_workforce.layers[1]
-
-    # Consultar informes con estado "Informe enviado"
-    features_denuncias = layer_denuncias.query(
-        where="estado_tramite = 'Informe enviado'",
-        out_fields="*",
-        return_geometry=True
+    layer_denuncias = ctx.layer_denuncias
+    layer_asignaciones = ctx.layer_asignaciones
+
+    # Modo incremental (INCREMENTAL=1): marca de agua y diario por registro
+    diario = Diario(ETAPA) if modo_incremental() else None
+
+    # Campos resueltos contra el esquema (se detiene si falta uno obligatorio)
+    esquema_denuncias = esquema(layer_denuncias)
+    campos_informe = esquema_denuncias.out_fields(
+        CAMPOS_INFORME + [diario.campo] if diario else CAMPOS_INFORME,
+        obligatorios=OBLIGATORIOS_INFORME
     )
-    df_informes = features_denuncias.sdf
+
+    # Nombres reales del objectid y el globalid de la capa (las columnas del sdf)
+    col_oid = esquema_denuncias.campo("objectid")
+    col_gid = esquema_denuncias.campo("globalid")
+
+    # Consultar informes con estado "Informe enviado" (o tomar la lectura compartida)
+    df_informes = ctx.denuncias(ESTADO_INFORME)
+    if df_informes is None:
+        with fase("consulta") as medicion:
+            features_denuncias = layer_denuncias.query(
+                where=diario.filtro(FILTRO_INFORMES) if diario else FILTRO_INFORMES,
+                out_fields=",".join(campos_informe),
+                return_geometry=True
+            )
+            df_informes = features_denuncias.sdf
+            medicion.registros = len(df_informes)
     print(f"Total de informes para supervisión encontrados: {len(df_informes)}")
 
+    # GUID del tipo de asignación "Supervisión"
+    assignmenttype_guid = "52de28ac-8476-42ca-8e16-d8b7872ad3c5"
+
+    # Terminar lo que una ejecución interrumpida dejó a medias; la tarea que ya está
+    # en Workforce aunque el diario no alcanzó a anotarla se toma como creada
+    df_leidos = df_informes
+    completados = set()
+    if diario:
+        previas = TareasPrevias(
+            layer_asignaciones, assignmenttype_guid, col_gid,
+            lambda oid, globalid, tarea: {"attributes": {
+                col_oid: oid, "estado_tramite": "En supervisión", "id_denuncia_comparar_supervisor": globalid
+            }}
+        )
+        df_informes, completados = reanudar(diario, df_informes, layer_denuncias, layer_asignaciones,
+                                            col_oid=col_oid, previas=previas)
+
     if df_informes.empty:
+        if diario:
+            diario.avanzar(df_leidos, completados, col_oid=col_oid)
+            diario.cerrar()
         return
 
-    # GUID del tipo de asignación "Supervisión"
-    assignmenttype_guid = "52de28ac-8476-42ca-8e16-d8b7872ad3c5"
+    # ✅ Comprobación de GLOBALID en lote (se desactiva con VERIFICAR_GLOBALID=0)
+    if verificacion_activa():
+        confirmados, faltantes = verificar_globalids(layer_denuncias, df_informes[col_gid], campo=col_gid)
+        if faltantes:
+            df_informes = df_informes[df_informes[col_gid].astype(str).isin(confirmados)]
 
     # Usuario fijo del supervisor
     supervisor_user = "coellop_gadmriobamba"
-    features_workers = layer_workers.query(
-        where=f"userid='{supervisor_user}'",
-        out_fields="*",
-        return_geometry=False
-    )
-    if not features_workers.features:
+    worker_globalid = ctx.trabajadores().get(supervisor_user)
+    if worker_globalid is None:
         print(f"❌ No se encontró el supervisor {supervisor_user} en Workforce.")
+        if diario:
+            diario.cerrar()
         return
-    worker_globalid = features_workers.features[0].attributes["GlobalID"]
-
-    # Listas de actualizaciones
-    informes_actualizados = []
-    tareas_creadas = []
-
-    for _, row in df_informes.iterrows():
-        # ✅ Debug: imprimir atributos de la denuncia
-        print("🔎 Procesando informe con GLOBALID:", row["globalid"])
-        result = layer_denuncias.query(
-            where=f"GLOBALID = '{row['globalid']}'",
-            out_fields="*",
-            return_geometry=False
-        )
-        if result.features:
-            atributos = result.features[0].attributes
-            for k, v in atributos.items():
-                print(f"   {k}: {v}")
-        else:
-            print("❌ No se encontró ningún registro con ese GLOBALID en layer_denuncias")
-
-        # Geometría
-        shape_dict = row.get("SHAPE") or row.get("geometry")
-        geometry = None
-        if shape_dict:
-            geometry = {
-                "x": shape_dict.get("x"),
-                "y": shape_dict.get("y"),
-                "spatialReference": {"wkid": 4326}
-            }
-
-        # Campos adicionales (limpiados para evitar error HTML)
-        tipo_infraccion = limpiar_texto(row.get("infractor", "Sin especificar"))
-        direccion_infraccion = limpiar_texto(row.get("direccion_infraccion", "Sin referencia"))
-        inspector = limpiar_texto(row.get("inspector_inspeccion", "No registrado"))
-        cedula_infractor = limpiar_texto(row.get("cedula_infractor", "No registrado"))
-        nombre_denunciado = limpiar_texto(row.get("nombre_denunciado", "No registrado"))
-        antecedentes = limpiar_texto(row.get("antecedentes", "---"))
-        desarrollo = limpiar_texto(row.get("desarrollo", "---"))
-        conclusiones = limpiar_texto(row.get("conclusiones", "---"))
-
-        descripcion_tarea = (
-            f"Infracción reportada: {tipo_infraccion} | "
-            f"Referencia: {direccion_infraccion} | "
-            f"Inspector: {inspector} | "
-            f"Cédula Infractor: {cedula_infractor} | "
-            f"Nombre denunciado: {nombre_denunciado} | "
-            f"Antecedentes: {antecedentes} | "
-            f"Desarrollo: {desarrollo} | "
-            f"Conclusiones: {conclusiones}"
-        )
 
-        # Fecha de vencimiento
-        fecha_actual_str = row.get("fecha_actual")
-        due_date = None
-        if fecha_actual_str:
-            try:
-                fecha_actual = pd.to_datetime(fecha_actual_str)
-                due_date = fecha_actual + timedelta(days=3)
-            except Exception as e:
-                print(f"Error al convertir fecha_actual: {e}")
-
-        # Crear tarea
-        tarea = Feature.from_dict({
-            "attributes": {
-                "description": descripcion_tarea,
-                "status": 1,
-                "priority": 0,
-                "assignmenttype": assignmenttype_guid,
-                "location": row.get("direccion", "Sin área"),
-                "workorderid": str(row["globalid"]),
-                "workerid": worker_globalid,
-                "duedate": due_date,
-                "assigneddate": datetime.utcnow()
-            },
-            "geometry": geometry
-        })
-        tareas_creadas.append(tarea)
+    with fase("asignacion", registros=len(df_informes)):
+        # Payloads por columnas: descripción, fechas, geometría y actualización del informe
+        oids_origen = df_informes[col_oid].tolist()  # objectid del informe de cada tarea, en el mismo orden
+        globalids = df_informes[col_gid].astype(object).map(str)
+
+        # Campos adicionales (limpiados por columna para evitar error HTML),
+        # recortados al largo del campo description de Workforce
+        descripcion_tarea = recortar(concatenar(
+            "Infracción reportada: ", texto_limpio(df_informes, "infractor", "Sin especificar"),
+            " | Referencia: ", texto_limpio(df_informes, "direccion_infraccion", "Sin referencia"),
+            " | Inspector: ", texto_limpio(df_informes, "inspector_inspeccion", "No registrado"),
+            " | Cédula Infractor: ", texto_limpio(df_informes, "cedula_infractor", "No registrado"),
+            " | Nombre denunciado: ", texto_limpio(df_informes, "nombre_denunciado", "No registrado"),
+            " | Antecedentes: ", texto_limpio(df_informes, "antecedentes", "---"),
+            " | Desarrollo: ", texto_limpio(df_informes, "desarrollo", "---"),
+            " | Conclusiones: ", texto_limpio(df_informes, "conclusiones", "---")
+        ), esquema(layer_asignaciones).longitud("description"))
+
+        # Crear tareas
+        tareas_creadas = registros({
+            "description": descripcion_tarea,
+            "status": 1,
+            "priority": 0,
+            "assignmenttype": assignmenttype_guid,
+            "location": valores(df_informes, "direccion", "Sin área"),
+            "workorderid": globalids,
+            "workerid": worker_globalid,
+            "duedate": vencimientos(df_informes, "fecha_actual", dias=3),
+            "assigneddate": datetime.utcnow()
+        }, geometrias=geometrias(df_informes, destino=wkid_capa(layer_asignaciones), origen=wkid_capa(layer_denuncias)))
 
         # Actualizar estado
-        feature_update = Feature.from_dict({
-            "attributes": {
-                "objectid": row["objectid"],
-                "estado_tramite": "En supervisión",
-                "id_denuncia_comparar_supervisor": str(row["globalid"])  # Campo de vínculo
-            }
+        informes_actualizados = registros({
+            col_oid: oids_origen,
+            "estado_tramite": "En supervisión",
+            "id_denuncia_comparar_supervisor": globalids  # Campo de vínculo
         })
-        informes_actualizados.append(feature_update)
 
     # Guardar tareas
+    informes_confirmados = []
     if tareas_creadas:
-        resp_tareas = layer_asignaciones.edit_features(adds=tareas_creadas)
-        print("Tareas de supervisión creadas:", resp_tareas)
-
-        # Asociar adjuntos
-        for i, result in enumerate(resp_tareas.get("addResults", [])):
-            if result.get("success"):
-                oid_tarea = result.get("objectId")
-                oid_informe = df_informes.iloc[i]["objectid"]
-                adjuntos = layer_denuncias.attachments.get_list(oid=oid_informe)
-                for adj in adjuntos:
-                    try:
-                        contenido = layer_denuncias.attachments.download(
-                            oid=int(oid_informe),
-                            attachment_id=adj["id"]
-                        )
-                        if isinstance(contenido, list) and contenido:
-                            layer_asignaciones.attachments.add(oid_tarea, contenido[0])
-                            print(f"Adjunto '{adj['name']}' copiado a la tarea.")
-                    except Exception as e:
-                        print(f"❌ Error al copiar adjunto '{adj['name']}': {e}")
+        print("Tareas de supervisión creadas:")
+        resp_tareas = aplicar_ediciones(layer_asignaciones, adds=tareas_creadas, claves=CLAVES_TAREA)
+        resultados_tareas = resp_tareas["addResults"]
+
+        # Solo pasa a "En supervisión" el informe cuya tarea existe en Workforce
+        informes_confirmados = [
+            update for update, ok in zip(informes_actualizados, exitosos(resultados_tareas)) if ok
+        ]
+        if diario:
+            diario.registrar([
+                (oids_origen[i], TAREA_CREADA, result.get("objectId"), informes_actualizados[i])
+                for i, result in enumerate(resultados_tareas) if result.get("success")
+            ])
+
+        # Asociar adjuntos (copia en paralelo)
+        pares = [
+            (oids_origen[i], result.get("objectId"))
+            for i, result in enumerate(resultados_tareas)
+            if result.get("success")
+        ]
+        copiar_adjuntos(layer_denuncias, layer_asignaciones, pares)
+        if diario:
+            diario.registrar([(oid, ADJUNTOS_COPIADOS, None, None) for oid, _ in pares])
 
     # Actualizar informes
-    if informes_actualizados:
-        resp_informes = layer_denuncias.edit_features(updates=informes_actualizados)
-        print("Informes actualizados:", resp_informes)
+    if informes_confirmados:
+        print("Informes actualizados:")
+        resp_informes = aplicar_ediciones(layer_denuncias, updates=informes_confirmados)
+        for feature, ok in zip(informes_confirmados, exitosos(resp_informes["updateResults"])):
+            if ok:
+                completados.add(feature["attributes"][col_oid])
+            else:
+                print(f"⚠️ La tarea se creó pero el informe {feature['attributes'][col_oid]} sigue en 'Informe enviado'")
+
+    if diario:
+        diario.registrar([(oid, COMPLETADO, None, None) for oid in completados])
+        diario.avanzar(df_leidos, completados, col_oid=col_oid)
+        diario.purgar()
+        diario.cerrar()
 
 if __name__ == "__main__":
-    ejecutar_asignacion_supervision()
+    with ejecucion(ETAPA), etapa(ETAPA):
+        ejecutar_asignacion_supervision()
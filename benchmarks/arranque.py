@@ -0,0 +1,120 @@
+"""
+Costo de arranque en frío de los dos motores (arcgis y rest): instalación de
+dependencias, importación y primera petición (inicio de sesión + una consulta).
+
+    python -m benchmarks.arranque                 # importación
+    python -m benchmarks.arranque --instalar      # + pip install en un venv nuevo
+    python -m benchmarks.arranque --peticion      # + primera petición (AGOL_USERNAME/AGOL_PASSWORD)
+
+Cada medición corre en un proceso nuevo para que no influyan los módulos ya cargados.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import venv
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+MOTORES = {
+    "arcgis": {
+        "paquetes": ["arcgis", "pandas"],
+        "importar": "import pandas; from arcgis.gis import GIS; import arcgis.features",
+    },
+    "rest": {
+        "paquetes": ["requests", "pandas"],
+        "importar": "import pandas, requests; import asignador.rest",
+    },
+}
+
+# Inicio de sesión y conteo de denuncias "Recibido" con el motor indicado por MOTOR
+PRIMERA_PETICION = """
+import time
+inicio = time.perf_counter()
+from asignador.sesion import iniciar_sesion, ITEM_DENUNCIAS
+gis = iniciar_sesion()
+if gis is None:
+    raise SystemExit(1)
+capa = gis.content.get(ITEM_DENUNCIAS).layers[0]
+capa.query(where="estado_tramite = 'Recibido'", return_count_only=True)
+print(time.perf_counter() - inicio)
+"""
+
+
+def _segundos(python, codigo, entorno=None):
+    """Ejecuta codigo en un proceso nuevo y devuelve su tiempo de reloj."""
+    inicio = time.perf_counter()
+    subprocess.run([python, "-c", codigo], cwd=RAIZ, env=entorno, check=True,
+                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    return time.perf_counter() - inicio
+
+
+def _tamano_mb(carpeta):
+    total = 0
+    for raiz, _, archivos in os.walk(carpeta):
+        for a in archivos:
+            try:
+                total += os.path.getsize(os.path.join(raiz, a))
+            except OSError:
+                pass
+    return total / 1024 / 1024
+
+
+def medir(motor, instalar, peticion):
+    config = MOTORES[motor]
+    resultado = {"motor": motor, "instalacion_s": None, "instalacion_mb": None,
+                 "importacion_s": None, "primera_peticion_s": None}
+    python = sys.executable
+
+    if instalar:
+        carpeta = tempfile.mkdtemp(prefix=f"venv_{motor}_")
+        venv.create(carpeta, with_pip=True)
+        python = os.path.join(carpeta, "bin", "python")
+        inicio = time.perf_counter()
+        subprocess.run([python, "-m", "pip", "install", "-q", *config["paquetes"]], check=True)
+        resultado["instalacion_s"] = round(time.perf_counter() - inicio, 1)
+        resultado["instalacion_mb"] = round(_tamano_mb(carpeta), 1)
+
+    # se descuenta el arranque del intérprete vacío
+    base = _segundos(python, "pass")
+    resultado["importacion_s"] = round(_segundos(python, config["importar"]) - base, 2)
+
+    if peticion:
+        entorno = dict(os.environ, MOTOR=motor)
+        salida = subprocess.run([python, "-c", PRIMERA_PETICION], cwd=RAIZ, env=entorno,
+                                capture_output=True, text=True)
+        if salida.returncode == 0:
+            resultado["primera_peticion_s"] = round(float(salida.stdout.strip().splitlines()[-1]), 2)
+    return resultado
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--motores", default=",".join(MOTORES))
+    parser.add_argument("--instalar", action="store_true", help="medir pip install en un venv nuevo (lento)")
+    parser.add_argument("--peticion", action="store_true", help="medir inicio de sesión + primera consulta")
+    parser.add_argument("--json", help="guardar resultados en este archivo")
+    args = parser.parse_args()
+
+    if args.peticion and not (os.getenv("AGOL_USERNAME") and os.getenv("AGOL_PASSWORD")):
+        print("⚠️ Sin AGOL_USERNAME/AGOL_PASSWORD no se mide la primera petición.")
+        args.peticion = False
+
+    resultados = []
+    print(f"{'motor':<8} {'instalación s':>13} {'instalación MB':>14} {'importación s':>13} {'1ª petición s':>13}")
+    for motor in [m.strip() for m in args.motores.split(",") if m.strip()]:
+        r = medir(motor, args.instalar, args.peticion)
+        resultados.append(r)
+        print(f"{r['motor']:<8} {str(r['instalacion_s']):>13} {str(r['instalacion_mb']):>14} "
+              f"{str(r['importacion_s']):>13} {str(r['primera_peticion_s']):>13}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(resultados, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""
+Compara las estrategias de asignación de inspectores sobre el mismo lote de
+denuncias del servicio simulado, sin escribir nada:
+
+    python -m benchmarks.bench_asignacion --pendientes 5000 --inspectores-por-grupo 6
+
+- carga:    el montículo de IndiceCarga, una denuncia tras otra
+- espacial: los más cercanos con peso de carga (MODO_ASIGNACION=espacial)
+- optimo:   todo el lote con linear_sum_assignment (MODO_ASIGNACION=optimo)
+
+Para cada una informa segundos, kilómetros recorridos y el desbalance (máximo -
+mínimo de num_tramites dentro de cada grupo, el peor de todos).
+"""
+import argparse
+import contextlib
+import io
+import json
+import time
+
+import numpy as np
+
+from asignador import espacial as modulo_espacial
+from asignador.asignacion import IndiceCarga
+from asignador.geometria import puntos, wkid_capa
+from asignador.optimizacion import asignar_lote
+from asignador.esquema import CAMPOS_INSPECTOR, OBLIGATORIOS_INSPECTOR, esquema
+from asignador.registros import personas
+from asignador.sesion import ITEM_DENUNCIAS, ITEM_INSPECTORES, ITEM_WORKFORCE
+from benchmarks.datos_sinteticos import generar_servicio
+
+ESTRATEGIAS = ["carga", "espacial", "optimo"]
+
+
+def _datos(args):
+    _, gis = generar_servicio(pendientes=args.pendientes, historico=0, adjuntos_por_denuncia=0,
+                              inspectores_por_grupo=args.inspectores_por_grupo, semilla=args.semilla)
+    tabla = gis.content.get(ITEM_INSPECTORES).tables[0]
+    denuncias = gis.content.get(ITEM_DENUNCIAS).layers[0]
+    asignaciones, workers = gis.content.get(ITEM_WORKFORCE).layers[:2]
+    roster = tabla.query(where="1=1").sdf
+    mapa = esquema(tabla).resolver(CAMPOS_INSPECTOR, OBLIGATORIOS_INSPECTOR)
+    df = denuncias.query(where="estado_tramite = 'Recibido'").sdf
+    return roster, mapa, df, workers, wkid_capa(asignaciones), wkid_capa(denuncias)
+
+
+def medir(estrategia, args, datos):
+    roster, mapa, df, workers, destino, origen = datos
+    indice = IndiceCarga(personas(roster, mapa), col_oid=mapa["objectid"])
+    grupos = list(zip(df["direccion_responsable"], df["area_responsable"]))
+    with contextlib.redirect_stdout(io.StringIO()):
+        x, y, wkid = puntos(df, destino=destino, origen=origen)
+        espacial = modulo_espacial.preparar(indice, workers, wkid)
+
+        inicio = time.perf_counter()
+        if estrategia == "carga":
+            elegidos = [indice.asignar(g) for g in grupos]
+        elif estrategia == "espacial":
+            elegidos = [espacial.asignar(g, xi, yi) for g, xi, yi in zip(grupos, x, y)]
+        else:
+            elegidos = asignar_lote(indice, grupos, espacial, x, y, capacidad=args.capacidad)
+        segundos = time.perf_counter() - inicio
+
+    metros = 0.0
+    for reg, xi, yi in zip(elegidos, x, y):
+        if reg is not None:
+            metros += espacial.distancia(indice.posicion(reg), xi, yi) or 0.0
+    desbalance = 0
+    for grupo in indice.grupos():
+        nums = [indice.registros[o].num_tramites for o in indice.miembros(grupo)]
+        desbalance = max(desbalance, max(nums) - min(nums))
+    return {
+        "estrategia": estrategia,
+        "segundos": round(segundos, 3),
+        "asignadas": sum(r is not None for r in elegidos),
+        "km": round(metros / 1000, 1),
+        "desbalance": desbalance,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--estrategias", default=",".join(ESTRATEGIAS))
+    parser.add_argument("--pendientes", type=int, default=3000, help="denuncias 'Recibido'")
+    parser.add_argument("--inspectores-por-grupo", type=int, default=3)
+    parser.add_argument("--capacidad", type=int, default=0, help="trámites máximos por inspector (0 = sin límite)")
+    parser.add_argument("--semilla", type=int, default=42)
+    parser.add_argument("--json", help="guardar resultados en este archivo")
+    args = parser.parse_args()
+
+    if modulo_espacial.cKDTree is None:
+        print("⚠️ scipy no está instalado: 'optimo' usa el montículo y 'espacial' la rejilla")
+    datos = _datos(args)
+    resultados = []
+    print(f"{'estrategia':<10} {'segundos':>9} {'asignadas':>9} {'km':>10} {'desbalance':>10}")
+    for estrategia in [e.strip() for e in args.estrategias.split(",") if e.strip()]:
+        r = medir(estrategia, args, datos)
+        resultados.append(r)
+        print(f"{r['estrategia']:<10} {r['segundos']:>9} {r['asignadas']:>9} {r['km']:>10} {r['desbalance']:>10}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"parametros": vars(args), "resultados": resultados}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
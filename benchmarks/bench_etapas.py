@@ -0,0 +1,93 @@
+"""
+Benchmark de las etapas de asignación contra el servicio simulado.
+
+    python -m benchmarks.bench_etapas --pendientes 10000 --historico 50000 --latencia 0.02
+
+Para cada etapa (y para las tres juntas con ejecutar_etapas) informa tiempo de
+reloj, número de peticiones, bytes enviados/recibidos y memoria pico.
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import tempfile
+import time
+import tracemalloc
+
+import asignar_inspectores
+import asignar_supervision
+import asignar_comisarios
+import ejecutar_etapas
+from asignador import adjuntos, rosters, trabajadores
+from asignador.sesion import Contexto
+from benchmarks.datos_sinteticos import generar_servicio
+
+ETAPAS = {
+    "inspeccion": asignar_inspectores.ejecutar_asignacion,
+    "supervision": asignar_supervision.ejecutar_asignacion_supervision,
+    "comisaria": asignar_comisarios.ejecutar_asignacion_comisario,
+    "todas": lambda ctx: ejecutar_etapas.ejecutar_etapas(list(ejecutar_etapas.ETAPAS), ctx),
+}
+
+
+def medir(nombre, args):
+    servidor, gis = generar_servicio(
+        pendientes=args.pendientes, historico=args.historico, adjuntos_por_denuncia=args.adjuntos,
+        semilla=args.semilla, latencia=args.latencia, tasa_fallos=args.tasa_fallos,
+    )
+    ctx = Contexto(gis)
+    salida = io.StringIO()
+    # cada medición arranca con las cachés locales vacías (servicio recién generado)
+    carpeta = tempfile.mkdtemp(prefix="bench_")
+    trabajadores.RUTA_CACHE = os.path.join(carpeta, "workers.json")
+    rosters.RUTA_ROSTERS = os.path.join(carpeta, "rosters.sqlite")
+    adjuntos._ALMACEN = adjuntos.AlmacenAdjuntos(os.path.join(carpeta, "adjuntos")) if adjuntos.CACHE_MB > 0 else None
+
+    if args.memoria:
+        tracemalloc.start()
+    inicio = time.perf_counter()
+    silencio = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(salida)
+    with silencio:
+        ETAPAS[nombre](ctx)
+    segundos = time.perf_counter() - inicio
+    pico = None
+    if args.memoria:
+        pico = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+    resultado = {"etapa": nombre, "segundos": round(segundos, 3), **servidor.metricas()}
+    resultado["pico_mb"] = round(pico / 1024 / 1024, 1) if pico is not None else None
+    return resultado
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--etapas", default=",".join(ETAPAS))
+    parser.add_argument("--pendientes", type=int, default=1000, help="denuncias pendientes por etapa")
+    parser.add_argument("--historico", type=int, default=5000, help="denuncias en otros estados")
+    parser.add_argument("--adjuntos", type=float, default=1.0, help="adjuntos promedio por denuncia")
+    parser.add_argument("--latencia", type=float, default=0.0, help="segundos por petición simulada")
+    parser.add_argument("--tasa-fallos", type=float, default=0.0, help="fracción de ediciones que fallan")
+    parser.add_argument("--semilla", type=int, default=42)
+    parser.add_argument("--sin-memoria", dest="memoria", action="store_false",
+                        help="no medir memoria pico (tracemalloc hace más lenta la ejecución)")
+    parser.add_argument("--json", help="guardar resultados en este archivo")
+    parser.add_argument("--verbose", action="store_true", help="mostrar la salida de los scripts")
+    args = parser.parse_args()
+
+    resultados = []
+    print(f"{'etapa':<12} {'segundos':>9} {'peticiones':>10} {'MB enviados':>11} {'MB recibidos':>12} {'pico MB':>8}")
+    for nombre in [n.strip() for n in args.etapas.split(",") if n.strip()]:
+        r = medir(nombre, args)
+        resultados.append(r)
+        print(f"{r['etapa']:<12} {r['segundos']:>9} {r['peticiones']:>10} "
+              f"{r['bytes_enviados'] / 1e6:>11.2f} {r['bytes_recibidos'] / 1e6:>12.2f} {str(r['pico_mb']):>8}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"parametros": vars(args), "resultados": resultados}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""
+Compara la limpieza de textos fila por fila (limpiar_texto en cada valor) con
+la limpieza por columnas de asignador.texto, sobre campos largos como
+desarrollo y conclusiones, sin servicio:
+
+    python -m benchmarks.bench_texto --filas 20000 --palabras 800
+
+Los textos llevan saltos de línea, algunos vacíos y, en la fracción --html,
+etiquetas HTML. Para cada campo informa los segundos de cada versión, la
+aceleración y si el resultado es idéntico; al final, cuántas descripciones de
+supervisión hay que recortar al largo de description.
+"""
+import argparse
+import json
+import random
+import time
+
+import pandas as pd
+
+from asignador.tareas import concatenar
+from asignador.texto import limpiar_texto, recortar, texto_limpio
+
+CAMPOS = ["antecedentes", "desarrollo", "conclusiones"]
+PALABRAS = ["obra", "ruido", "basura", "vecino", "calle", "urgente", "local", "humo", "\r\n", "\n"]
+ETIQUETAS = ["<b>urgente</b>", "<br>", "<i>obra</i>"]
+
+
+def _datos(args):
+    azar = random.Random(args.semilla)
+    columnas = {}
+    for campo in CAMPOS:
+        textos = []
+        for _ in range(args.filas):
+            if azar.random() < 0.05:
+                textos.append(None)
+                continue
+            palabras = PALABRAS + ETIQUETAS if azar.random() < args.html else PALABRAS
+            textos.append(" ".join(azar.choice(palabras) for _ in range(args.palabras)))
+        columnas[campo] = textos
+    return pd.DataFrame(columnas)
+
+
+def _medir(funcion, repeticiones):
+    mejor = None
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        resultado = funcion()
+        segundos = time.perf_counter() - inicio
+        mejor = segundos if mejor is None else min(mejor, segundos)
+    return mejor, resultado
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--filas", type=int, default=10000)
+    parser.add_argument("--palabras", type=int, default=600, help="palabras por texto")
+    parser.add_argument("--html", type=float, default=0.1, help="fracción de textos con etiquetas HTML")
+    parser.add_argument("--longitud", type=int, default=4000, help="largo del campo description")
+    parser.add_argument("--repeticiones", type=int, default=3)
+    parser.add_argument("--semilla", type=int, default=42)
+    parser.add_argument("--json", help="guardar resultados en este archivo")
+    args = parser.parse_args()
+
+    df = _datos(args)
+    resultados = []
+    print(f"{'campo':<14} {'por fila':>9} {'columna':>9} {'x':>6} {'iguales':>8}")
+    for campo in CAMPOS:
+        por_fila, esperado = _medir(lambda: df[campo].map(limpiar_texto), args.repeticiones)
+        columna, obtenido = _medir(lambda: texto_limpio(df, campo, "---"), args.repeticiones)
+        r = {
+            "campo": campo,
+            "por_fila": round(por_fila, 4),
+            "columna": round(columna, 4),
+            "aceleracion": round(por_fila / columna, 2) if columna else None,
+            "iguales": esperado.tolist() == obtenido.tolist(),
+        }
+        resultados.append(r)
+        print(f"{campo:<14} {r['por_fila']:>9} {r['columna']:>9} {r['aceleracion']:>6} {str(r['iguales']):>8}")
+
+    descripcion = concatenar(*(p for campo in CAMPOS for p in (f" | {campo}: ", texto_limpio(df, campo, "---"))))
+    recortadas = int((recortar(descripcion, args.longitud) != descripcion).sum())
+    print(f"Descripciones recortadas a {args.longitud}: {recortadas} de {len(df)}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"parametros": vars(args), "resultados": resultados, "recortadas": recortadas}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
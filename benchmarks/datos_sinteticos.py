@@ -0,0 +1,178 @@
+"""
+Generador con semilla de datos sintéticos para el servicio simulado: denuncias en
+todos los estados, inspectores, comisarios, workers y la capa de asignaciones de
+Workforce, con los mismos ids de item que usan los scripts.
+"""
+import random
+from datetime import datetime, timedelta
+
+from asignador import sesion
+from benchmarks.servicio_simulado import CapaSimulada, GISSimulado, ItemSimulado, ServidorSimulado
+
+URL_BASE = "https://simulado.local/arcgis/rest/services"
+SUPERVISOR = "coellop_gadmriobamba"
+
+DIRECCIONES = ["Gestión Ambiental", "Higiene", "Control Urbano", "Salud"]
+AREAS = ["Ruido", "Residuos", "Construcciones"]
+ESTADOS_HISTORICOS = ["En proceso", "En supervisión", "Asignado a comisario", "Finalizado"]
+
+
+def _campo(nombre, tipo="esriFieldTypeString", longitud=None):
+    campo = {"name": nombre, "type": tipo, "alias": nombre, "nullable": True, "editable": True}
+    if tipo == "esriFieldTypeString":
+        campo["length"] = longitud or 255
+    return campo
+
+
+def _oid(nombre="objectid"):
+    return {"name": nombre, "type": "esriFieldTypeOID", "alias": nombre, "nullable": False, "editable": False}
+
+
+def _gid(nombre="globalid"):
+    return {"name": nombre, "type": "esriFieldTypeGlobalID", "alias": nombre, "length": 38,
+            "nullable": False, "editable": False}
+
+
+CAMPOS_DENUNCIAS = [
+    _oid("objectid"), _gid("globalid"),
+    _campo("estado_tramite"), _campo("direccion_responsable"), _campo("area_responsable"),
+    _campo("siglas_area"), _campo("tipo_infraccion"), _campo("direccion_infraccion"),
+    _campo("denunciado"), _campo("comentario_denuncia", longitud=4000), _campo("contacto_denunciante_no"),
+    _campo("fecha_actual", "esriFieldTypeDate"), _campo("infractor"), _campo("inspector_inspeccion"),
+    _campo("cedula_infractor"), _campo("nombre_denunciado"), _campo("antecedentes", longitud=4000),
+    _campo("desarrollo", longitud=8000), _campo("conclusiones", longitud=8000), _campo("direccion"),
+    _campo("proceso_administrativo"), _campo("inspector_asignado"), _campo("username"),
+    _campo("id_denuncia_c"), _campo("id_denuncia_comparar_supervisor"), _campo("comisario_asignado"),
+    _campo("id_denuncia_comparar_comisario"), _campo("EditDate", "esriFieldTypeDate"),
+]
+
+CAMPOS_INSPECTORES = [
+    _oid("ObjectID"), _campo("nombre"), _campo("siglas"), _campo("usernamearc"), _campo("direccion"),
+    _campo("area"), _campo("num_tramites", "esriFieldTypeInteger"), _campo("ultimo_numero", "esriFieldTypeInteger"),
+]
+
+CAMPOS_COMISARIOS = [
+    _oid("objectid"), _campo("nombre"), _campo("siglas"), _campo("nomre_de_usuario"),
+    _campo("num_tramites", "esriFieldTypeInteger"), _campo("ultimo_numero", "esriFieldTypeInteger"),
+]
+
+CAMPOS_ASIGNACIONES = [
+    _oid("OBJECTID"), _gid("GlobalID"), _campo("description", longitud=4000),
+    _campo("status", "esriFieldTypeInteger"), _campo("priority", "esriFieldTypeInteger"),
+    _campo("assignmenttype"), _campo("location"), _campo("workorderid"), _campo("codigoformulario"),
+    _campo("nombreinspector"), _campo("nombrecomisario"), _campo("workerid"),
+    _campo("duedate", "esriFieldTypeDate"), _campo("assigneddate", "esriFieldTypeDate"),
+]
+
+CAMPOS_WORKERS = [
+    _oid("OBJECTID"), _gid("GlobalID"), _campo("userid"), _campo("name"),
+    _campo("status", "esriFieldTypeInteger"),
+]
+
+
+def _texto(azar, palabras):
+    vocabulario = ["vereda", "basura", "ruido", "obra", "sin", "permiso", "calle", "vecino",
+                   "noche", "local", "<b>urgente</b>", "parque", "escombros", "humo"]
+    return " ".join(azar.choice(vocabulario) for _ in range(palabras))
+
+
+def generar_servicio(pendientes=1000, historico=5000, inspectores_por_grupo=3, comisarios=5,
+                     adjuntos_por_denuncia=1.0, tamano_adjunto=4096, semilla=42, latencia=0.0,
+                     tasa_fallos=0.0, max_record_count=2000, limite_ediciones=None, campos_denuncias=None):
+    """
+    Crea un ServidorSimulado poblado y devuelve (servidor, gis).
+    pendientes: denuncias en cada uno de los tres estados que procesan las etapas.
+    historico: denuncias en estados que ninguna etapa toca.
+    campos_denuncias: esquema de la capa de denuncias (por defecto CAMPOS_DENUNCIAS),
+    p. ej. con OBJECTID/GlobalID en lugar de objectid/globalid.
+    """
+    azar = random.Random(semilla)
+    servidor = ServidorSimulado(latencia=latencia, tasa_fallos=tasa_fallos, semilla=semilla)
+
+    def capa(nombre, campos, geometria=False, wkid=None):
+        return CapaSimulada(servidor, f"{URL_BASE}/{nombre}/FeatureServer/0", campos,
+                            geometry_type="esriGeometryPoint" if geometria else None, wkid=wkid,
+                            max_record_count=max_record_count, limite_ediciones=limite_ediciones)
+
+    denuncias = capa("registro_infracciones", campos_denuncias or CAMPOS_DENUNCIAS, geometria=True, wkid=4326)
+    inspectores = capa("inspectores", CAMPOS_INSPECTORES)
+    tabla_comisarios = capa("comisarios", CAMPOS_COMISARIOS)
+    asignaciones = capa("workforce_asignaciones", CAMPOS_ASIGNACIONES, geometria=True, wkid=102100)
+    workers = capa("workforce_workers", CAMPOS_WORKERS, geometria=True, wkid=102100)
+
+    # Roster de inspectores: inspectores_por_grupo por cada (direccion, area)
+    usuarios = [SUPERVISOR]
+    filas = []
+    for d in DIRECCIONES:
+        for a in AREAS:
+            for k in range(inspectores_por_grupo):
+                usuario = f"insp_{len(filas):03d}_gadmriobamba"
+                usuarios.append(usuario)
+                filas.append(({
+                    "nombre": f"Inspector {len(filas)}", "siglas": f"I{len(filas):03d}",
+                    "usernamearc": usuario, "direccion": d, "area": a,
+                    "num_tramites": azar.randint(0, 30), "ultimo_numero": azar.randint(0, 200),
+                }, None))
+    inspectores.cargar(filas)
+
+    filas = []
+    for k in range(comisarios):
+        usuario = f"comi_{k:02d}_gadmriobamba"
+        usuarios.append(usuario)
+        filas.append(({
+            "nombre": f"Comisario {k}", "siglas": f"C{k:02d}", "nomre_de_usuario": usuario,
+            "num_tramites": azar.randint(0, 30), "ultimo_numero": azar.randint(0, 200),
+        }, None))
+    tabla_comisarios.cargar(filas)
+
+    workers.cargar([
+        ({"userid": u, "name": u, "status": 0},
+         {"x": -8755000 + azar.uniform(-6000, 6000), "y": -186000 + azar.uniform(-6000, 6000),
+          "spatialReference": {"wkid": 102100}})
+        for u in usuarios
+    ])
+
+    # Denuncias: pendientes por etapa + histórico
+    estados = (["Recibido"] * pendientes + ["Informe enviado"] * pendientes
+               + ["Supervision Finalizada"] * pendientes
+               + [azar.choice(ESTADOS_HISTORICOS) for _ in range(historico)])
+    azar.shuffle(estados)
+    hoy = datetime(2025, 1, 1)
+    filas = []
+    for estado in estados:
+        filas.append(({
+            "estado_tramite": estado,
+            "direccion_responsable": azar.choice(DIRECCIONES),
+            "area_responsable": azar.choice(AREAS),
+            "siglas_area": azar.choice(["RU", "RE", "CO"]),
+            "tipo_infraccion": azar.choice(["Ruido", "Basura", "Construcción"]),
+            "direccion_infraccion": f"Calle {azar.randint(1, 500)}",
+            "denunciado": f"Persona {azar.randint(1, 9999)}",
+            "comentario_denuncia": _texto(azar, 20),
+            "contacto_denunciante_no": f"09{azar.randint(10000000, 99999999)}",
+            "fecha_actual": hoy - timedelta(days=azar.randint(0, 365)),
+            "infractor": f"Infractor {azar.randint(1, 9999)}",
+            "inspector_inspeccion": f"Inspector {azar.randint(0, 30)}",
+            "cedula_infractor": f"06{azar.randint(10000000, 99999999)}",
+            "nombre_denunciado": f"Denunciado {azar.randint(1, 9999)}",
+            "antecedentes": _texto(azar, 40),
+            "desarrollo": _texto(azar, 120) + "\r\nsegunda línea",
+            "conclusiones": _texto(azar, 60),
+            "direccion": f"Av. {azar.randint(1, 99)}",
+            "proceso_administrativo": "Si" if estado != "Supervision Finalizada" or azar.random() < 0.9 else "No",
+        }, {"x": -78.65 + azar.uniform(-0.05, 0.05), "y": -1.67 + azar.uniform(-0.05, 0.05),
+            "spatialReference": {"wkid": 4326}}))
+    denuncias.cargar(filas)
+
+    for oid in range(1, len(filas) + 1):
+        n = int(adjuntos_por_denuncia) + (1 if azar.random() < adjuntos_por_denuncia % 1 else 0)
+        for k in range(n):
+            denuncias.attachments.sembrar(oid, f"foto_{oid}_{k}.jpg", tamano_adjunto)
+
+    servidor.items = {
+        sesion.ITEM_DENUNCIAS: ItemSimulado(layers=[denuncias]),
+        sesion.ITEM_INSPECTORES: ItemSimulado(tables=[inspectores]),
+        sesion.ITEM_COMISARIOS: ItemSimulado(tables=[tabla_comisarios]),
+        sesion.ITEM_WORKFORCE: ItemSimulado(layers=[asignaciones, workers]),
+    }
+    return servidor, GISSimulado(servidor)
@@ -0,0 +1,484 @@
+"""
+Servicio de entidades simulado en memoria.
+
+Imita la parte de la API de arcgis que usan los scripts (GIS.content.get, capas y
+tablas con query / edit_features / attachments, FeatureSet.sdf) para poder
+ejecutar las etapas sin conexión a ArcGIS Online. Cada llamada cuenta como una
+petición HTTP y puede llevar una latencia simulada.
+"""
+import json
+import os
+import random
+import re
+import threading
+import time
+import uuid
+from datetime import date, datetime
+
+import pandas as pd
+
+from asignador.metricas import registrar_peticion
+
+
+def _epoch_ms(valor):
+    """Convierte fechas a milisegundos epoch como hace el servicio real."""
+    if isinstance(valor, pd.Timestamp):
+        valor = valor.to_pydatetime()
+    if isinstance(valor, datetime):
+        if valor.tzinfo is None:
+            return int((valor - datetime(1970, 1, 1)).total_seconds() * 1000)
+        return int(valor.timestamp() * 1000)
+    if isinstance(valor, date):
+        return _epoch_ms(datetime(valor.year, valor.month, valor.day))
+    return valor
+
+
+def _tamano_json(obj):
+    return len(json.dumps(obj, default=str))
+
+
+class Propiedades(dict):
+    """dict con acceso por atributo, como el PropertyMap de arcgis."""
+
+    def __getattr__(self, nombre):
+        try:
+            valor = self[nombre]
+        except KeyError:
+            raise AttributeError(nombre)
+        return Propiedades(valor) if isinstance(valor, dict) else valor
+
+
+class FeatureSimulada:
+    def __init__(self, geometry=None, attributes=None):
+        self.geometry = geometry
+        self.attributes = attributes if attributes is not None else {}
+
+    @property
+    def as_dict(self):
+        d = {"attributes": self.attributes}
+        if self.geometry is not None:
+            d["geometry"] = self.geometry
+        return d
+
+
+class FeatureSetSimulado:
+    """Mismo constructor que arcgis.features.FeatureSet."""
+
+    def __init__(self, features, fields=None, has_z=False, has_m=False, geometry_type=None,
+                 spatial_reference=None, display_field_name=None, object_id_field_name=None,
+                 global_id_field_name=None):
+        self.features = list(features)
+        self.fields = fields or []
+        self.geometry_type = geometry_type
+        self.spatial_reference = spatial_reference
+        self.object_id_field_name = object_id_field_name
+        self.global_id_field_name = global_id_field_name
+        self.exceeded_transfer_limit = None
+
+    @property
+    def sdf(self):
+        columnas = [f["name"] for f in self.fields]
+        df = pd.DataFrame([f.attributes for f in self.features], columns=columnas)
+        for campo in self.fields:
+            if campo.get("type") == "esriFieldTypeDate":
+                df[campo["name"]] = pd.to_datetime(df[campo["name"]], unit="ms")
+        if self.features and any(f.geometry is not None for f in self.features):
+            df["SHAPE"] = [f.geometry for f in self.features]
+        return df
+
+
+# --- Filtros WHERE ------------------------------------------------------------
+
+_TOKEN = re.compile(
+    r"\s*(?:(?P<cadena>'(?:[^']|'')*')|(?P<numero>-?\d+(?:\.\d+)?)"
+    r"|(?P<op><>|!=|>=|<=|=|<|>|\(|\)|,)|(?P<palabra>[A-Za-z_][A-Za-z0-9_]*))"
+)
+_PALABRAS = {"AND": "and", "OR": "or", "NOT": "not", "IN": "in", "IS": "is", "NULL": "None"}
+_OPERADORES = {"=": "==", "<>": "!=", "!=": "!="}
+
+
+def compilar_where(where, nombres):
+    """
+    Traduce el subconjunto de SQL que usan los scripts (comparaciones, AND/OR/NOT,
+    IN (...), IS NULL, TIMESTAMP '...') a una función Python sobre los atributos.
+    nombres: dict nombre_en_minúsculas -> nombre real del campo.
+    """
+    partes = []
+    pos = 0
+    timestamp = False
+    en_lista = []
+    while pos < len(where):
+        m = _TOKEN.match(where, pos)
+        if not m or m.end() == pos:
+            if where[pos:].strip():
+                raise ValueError(f"WHERE no soportado: {where!r}")
+            break
+        pos = m.end()
+        if m.group("cadena") is not None:
+            texto = m.group("cadena")[1:-1].replace("''", "'")
+            if timestamp:
+                partes.append(repr(_epoch_ms(datetime.fromisoformat(texto))))
+                timestamp = False
+            else:
+                partes.append(repr(texto))
+        elif m.group("numero") is not None:
+            partes.append(m.group("numero"))
+        elif m.group("op") is not None:
+            op = m.group("op")
+            if op == "(":
+                en_lista.append(bool(partes) and partes[-1] == "in")
+            elif op == ")" and en_lista.pop():
+                partes.append(",")
+            partes.append(_OPERADORES.get(op, op))
+        else:
+            palabra = m.group("palabra")
+            if palabra.upper() == "TIMESTAMP":
+                timestamp = True
+            elif palabra.upper() in _PALABRAS:
+                partes.append(_PALABRAS[palabra.upper()])
+            else:
+                real = nombres.get(palabra.lower())
+                if real is None:
+                    raise ValueError(f"Campo desconocido en WHERE: {palabra}")
+                partes.append(f"r.get({real!r})")
+    funcion = eval("lambda r: " + (" ".join(partes) or "True"))
+
+    def filtro(atributos):
+        try:
+            return bool(funcion(atributos))
+        except TypeError:
+            return False  # comparación con NULL
+
+    return filtro
+
+
+# --- Servidor, capas y adjuntos ----------------------------------------------
+
+class ServidorSimulado:
+    """Cuenta peticiones y bytes de todas las capas y aplica la latencia simulada."""
+
+    def __init__(self, latencia=0.0, tasa_fallos=0.0, semilla=0):
+        self.latencia = latencia
+        self.tasa_fallos = tasa_fallos
+        self.peticiones = 0
+        self.bytes_enviados = 0
+        self.bytes_recibidos = 0
+        self.items = {}
+        self._azar = random.Random(semilla)
+        self._candado = threading.Lock()
+
+    def registrar(self, enviado, recibido):
+        with self._candado:
+            self.peticiones += 1
+            self.bytes_enviados += enviado
+            self.bytes_recibidos += recibido
+        # las mismas cuentas que instrumentar_http() hace con requests
+        registrar_peticion(enviado, recibido)
+        if self.latencia:
+            time.sleep(self.latencia)
+
+    def falla(self):
+        if not self.tasa_fallos:
+            return False
+        with self._candado:
+            return self._azar.random() < self.tasa_fallos
+
+    def metricas(self):
+        return {
+            "peticiones": self.peticiones,
+            "bytes_enviados": self.bytes_enviados,
+            "bytes_recibidos": self.bytes_recibidos,
+        }
+
+
+class AdjuntosSimulados:
+    """Imita AttachmentManager: get_list, download y add."""
+
+    def __init__(self, capa):
+        self._capa = capa
+        self._por_oid = {}
+        self._siguiente_id = 1
+        self._candado = threading.Lock()
+
+    def sembrar(self, oid, nombre, tamano):
+        with self._candado:
+            adjunto = {"id": self._siguiente_id, "name": nombre, "size": tamano,
+                       "contentType": "image/jpeg", "datos": None}
+            self._siguiente_id += 1
+            self._por_oid.setdefault(int(oid), []).append(adjunto)
+
+    def _contenido(self, oid, adjunto):
+        if adjunto["datos"] is not None:
+            return adjunto["datos"]
+        # contenido determinista generado al vuelo para no ocupar memoria
+        return random.Random(f"{oid}-{adjunto['id']}").randbytes(adjunto["size"])
+
+    def get_list(self, oid):
+        lista = [{k: v for k, v in a.items() if k != "datos"} for a in self._por_oid.get(int(oid), [])]
+        self._capa._servidor.registrar(64, _tamano_json(lista))
+        return lista
+
+    def download(self, oid=None, attachment_id=None, save_path=None):
+        adjunto = next(a for a in self._por_oid.get(int(oid), []) if a["id"] == int(attachment_id))
+        datos = self._contenido(oid, adjunto)
+        self._capa._servidor.registrar(64, len(datos))
+        carpeta = save_path or os.getcwd()
+        os.makedirs(carpeta, exist_ok=True)
+        ruta = os.path.join(carpeta, adjunto["name"])
+        with open(ruta, "wb") as f:
+            f.write(datos)
+        return [ruta]
+
+    def add(self, oid, file_path, keywords=None, return_moment=False):
+        with open(file_path, "rb") as f:
+            datos = f.read()
+        self._capa._servidor.registrar(len(datos), 64)
+        if self._capa._servidor.falla():
+            return {"addAttachmentResult": {"success": False}}
+        with self._candado:
+            adjunto = {"id": self._siguiente_id, "name": os.path.basename(file_path), "size": len(datos),
+                       "contentType": "application/octet-stream", "datos": datos}
+            self._siguiente_id += 1
+            self._por_oid.setdefault(int(oid), []).append(adjunto)
+        return {"addAttachmentResult": {"objectId": adjunto["id"], "success": True}}
+
+
+class ConexionSimulada:
+    """Imita la conexión de arcgis (layer._con): get(path, params) devuelve el JSON de la capa."""
+
+    def __init__(self, capa):
+        self._capa = capa
+
+    def get(self, path, params=None):
+        self._capa._servidor.registrar(64, 2048)
+        return self._capa._actuales()
+
+
+class CapaSimulada:
+    """Capa o tabla de entidades con query, edit_features, calculate y attachments."""
+
+    def __init__(self, servidor, url, campos, geometry_type=None, wkid=None,
+                 max_record_count=2000, limite_ediciones=None):
+        self._servidor = servidor
+        self.url = url
+        self._campos = campos
+        self._nombres = {c["name"].lower(): c["name"] for c in campos}
+        self._oid = next(c["name"] for c in campos if c["type"] == "esriFieldTypeOID")
+        self._gid = next((c["name"] for c in campos if c["type"] == "esriFieldTypeGlobalID"), None)
+        self._fechas = {c["name"] for c in campos if c["type"] == "esriFieldTypeDate"}
+        self._geometry_type = geometry_type
+        self._wkid = wkid
+        self._max_record_count = max_record_count
+        self._limite_ediciones = limite_ediciones
+        self._filas = {}
+        self._siguiente_oid = 1
+        self._ultima_edicion = _epoch_ms(datetime.utcnow())
+        self._propiedades = None
+        self._candado = threading.Lock()
+        self.attachments = AdjuntosSimulados(self)
+        self._con = ConexionSimulada(self)
+
+    @property
+    def properties(self):
+        """Como en arcgis, se piden una vez y quedan en caché hasta _refresh()."""
+        if self._propiedades is None:
+            self._refresh()
+        return self._propiedades
+
+    def _refresh(self):
+        self._servidor.registrar(64, 2048)
+        self._propiedades = Propiedades(self._actuales())
+
+    def _actuales(self):
+        """Las propiedades que el servicio devolvería ahora ({url}?f=json)."""
+        props = {
+            "name": self.url.rsplit("/", 1)[-1],
+            "maxRecordCount": self._max_record_count,
+            "objectIdField": self._oid,
+            "globalIdField": self._gid,
+            "fields": self._campos,
+            "editingInfo": {"lastEditDate": self._ultima_edicion, "schemaLastEditDate": 0,
+                            "dataLastEditDate": self._ultima_edicion},
+        }
+        if self._geometry_type:
+            props["geometryType"] = self._geometry_type
+            props["extent"] = {"spatialReference": {"wkid": self._wkid, "latestWkid": self._wkid}}
+        return props
+
+    def _normalizar(self, atributos):
+        """Deja solo los campos del esquema (sin distinguir mayúsculas) y fechas en epoch ms."""
+        salida = {}
+        for clave, valor in atributos.items():
+            real = self._nombres.get(clave.lower())
+            if real is not None:
+                salida[real] = _epoch_ms(valor) if real in self._fechas else valor
+        return salida
+
+    def _nueva_fila(self, atributos, geometria):
+        oid = self._siguiente_oid
+        self._siguiente_oid += 1
+        fila = {c["name"]: None for c in self._campos}
+        fila.update(self._normalizar(atributos))
+        fila[self._oid] = oid
+        if self._gid:
+            fila[self._gid] = "{" + str(uuid.uuid4()).upper() + "}"
+        if "EditDate" in fila:
+            fila["EditDate"] = self._ultima_edicion
+        self._filas[oid] = {"attributes": fila, "geometry": geometria}
+        return oid, fila.get(self._gid)
+
+    def cargar(self, registros):
+        """Inserta datos iniciales sin contarlos como peticiones."""
+        with self._candado:
+            for atributos, geometria in registros:
+                self._nueva_fila(atributos, geometria)
+
+    def query(self, where="1=1", out_fields="*", return_geometry=True, order_by_fields=None,
+              result_offset=None, result_record_count=None, return_all_records=True,
+              object_ids=None, return_count_only=False, return_ids_only=False, **kwargs):
+        filtro = compilar_where(where or "1=1", self._nombres)
+        with self._candado:
+            filas = [f for f in self._filas.values() if filtro(f["attributes"])]
+        if object_ids:
+            ids = {int(i) for i in str(object_ids).split(",")} if isinstance(object_ids, str) else set(map(int, object_ids))
+            filas = [f for f in filas if f["attributes"][self._oid] in ids]
+        if return_count_only:
+            self._servidor.registrar(_tamano_json(where), 32)
+            return len(filas)
+
+        if order_by_fields:
+            campo, _, sentido = order_by_fields.split(",")[0].strip().partition(" ")
+            real = self._nombres[campo.lower()]
+            filas.sort(key=lambda f: (f["attributes"][real] is None, f["attributes"][real]),
+                       reverse=sentido.strip().upper() == "DESC")
+        excedido = False
+        if not return_all_records:
+            inicio = result_offset or 0
+            cantidad = min(result_record_count or self._max_record_count, self._max_record_count)
+            excedido = len(filas) > inicio + cantidad
+            filas = filas[inicio:inicio + cantidad]
+
+        if out_fields in (None, "*"):
+            campos = list(self._campos)
+        else:
+            pedidos = [c.strip().lower() for c in (out_fields.split(",") if isinstance(out_fields, str) else out_fields)]
+            desconocidos = [c for c in pedidos if c not in self._nombres]
+            if desconocidos:
+                raise ValueError(f"Campos desconocidos: {', '.join(desconocidos)}")
+            campos = [c for c in self._campos if c["name"].lower() in set(pedidos) | {self._oid.lower()}]
+        nombres = [c["name"] for c in campos]
+
+        features = [
+            FeatureSimulada(
+                dict(f["geometry"]) if return_geometry and f["geometry"] else None,
+                {n: f["attributes"][n] for n in nombres},
+            )
+            for f in filas
+        ]
+        self._servidor.registrar(_tamano_json(where) + 256, sum(_tamano_json(f.as_dict) for f in features) + 512)
+        resultado = FeatureSetSimulado(
+            features,
+            fields=campos,
+            geometry_type=self._geometry_type,
+            spatial_reference={"wkid": self._wkid} if self._wkid else None,
+            object_id_field_name=self._oid,
+            global_id_field_name=self._gid,
+        )
+        resultado.exceeded_transfer_limit = excedido
+        return resultado
+
+    def edit_features(self, adds=None, updates=None, deletes=None, rollback_on_failure=True, **kwargs):
+        adds = [a.as_dict if hasattr(a, "as_dict") else a for a in (adds or [])]
+        updates = [u.as_dict if hasattr(u, "as_dict") else u for u in (updates or [])]
+        enviado = _tamano_json({"adds": adds, "updates": updates})
+        if self._limite_ediciones and len(adds) + len(updates) > self._limite_ediciones:
+            self._servidor.registrar(enviado, 128)
+            raise RuntimeError("Request size limit exceeded")
+
+        respuesta = {"addResults": [], "updateResults": [], "deleteResults": []}
+        with self._candado:
+            for feature in adds:
+                if self._servidor.falla():
+                    respuesta["addResults"].append({"success": False, "error": {"code": 500, "description": "Fallo simulado"}})
+                    continue
+                oid, gid = self._nueva_fila(feature.get("attributes") or {}, feature.get("geometry"))
+                respuesta["addResults"].append({"objectId": oid, "globalId": gid, "success": True})
+            for feature in updates:
+                atributos = self._normalizar(feature.get("attributes") or {})
+                oid = atributos.get(self._oid)
+                fila = self._filas.get(int(oid)) if oid is not None else None
+                if fila is None:
+                    respuesta["updateResults"].append({"objectId": oid, "success": False,
+                                                       "error": {"code": 1019, "description": "Object is missing"}})
+                    continue
+                if self._servidor.falla():
+                    respuesta["updateResults"].append({"objectId": oid, "success": False,
+                                                       "error": {"code": 500, "description": "Fallo simulado"}})
+                    continue
+                fila["attributes"].update(atributos)
+                if feature.get("geometry"):
+                    fila["geometry"] = feature["geometry"]
+                respuesta["updateResults"].append({"objectId": oid, "success": True})
+            if adds or updates:
+                self._ultima_edicion = max(self._ultima_edicion + 1, _epoch_ms(datetime.utcnow()))
+                if "EditDate" in self._nombres.values():
+                    for r in respuesta["addResults"] + respuesta["updateResults"]:
+                        if r.get("success"):
+                            self._filas[int(r["objectId"])]["attributes"]["EditDate"] = self._ultima_edicion
+        self._servidor.registrar(enviado, _tamano_json(respuesta))
+        return respuesta
+
+    def calculate(self, where, calc_expression, sql_format="standard", **kwargs):
+        """Actualiza en el servidor las filas que cumplen where (solo expresiones {"field", "value"})."""
+        expresiones = calc_expression if isinstance(calc_expression, list) else [calc_expression]
+        valores = {}
+        for e in expresiones:
+            if "value" not in e:
+                raise ValueError("solo se simulan expresiones con value")
+            valores[self._nombres[e["field"].lower()]] = e["value"]
+        filtro = compilar_where(where or "1=1", self._nombres)
+        with self._candado:
+            filas = [f for f in self._filas.values() if filtro(f["attributes"])]
+            for fila in filas:
+                fila["attributes"].update(valores)
+            if filas:
+                self._ultima_edicion = max(self._ultima_edicion + 1, _epoch_ms(datetime.utcnow()))
+        respuesta = {"success": True, "updatedFeatureCount": len(filas)}
+        self._servidor.registrar(_tamano_json({"where": where, "calcExpression": expresiones}), _tamano_json(respuesta))
+        return respuesta
+
+    def registros(self):
+        """Atributos de todas las filas (para inspeccionar resultados en los benchmarks)."""
+        return [dict(f["attributes"]) for f in self._filas.values()]
+
+
+class ItemSimulado:
+    def __init__(self, layers=(), tables=()):
+        self.layers = list(layers)
+        self.tables = list(tables)
+
+
+class _Contenido:
+    def __init__(self, servidor):
+        self._servidor = servidor
+
+    def get(self, item_id):
+        self._servidor.registrar(64, 4096)
+        return self._servidor.items[item_id]
+
+
+class _Usuario:
+    username = "usuario_simulado"
+
+
+class _Usuarios:
+    me = _Usuario()
+
+
+class GISSimulado:
+    """Sustituto de arcgis.gis.GIS para el servidor simulado."""
+
+    def __init__(self, servidor):
+        self.servidor = servidor
+        self.content = _Contenido(servidor)
+        self.users = _Usuarios()
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+# ejecutar_etapas.py
+"""
+Ejecuta en un solo proceso cualquier combinación de las etapas de inspección,
+supervisión y comisaría, compartiendo la sesión, los workers de Workforce y una
+única lectura de la capa de denuncias separada por estado_tramite.
+
+    python ejecutar_etapas.py --etapas inspeccion,supervision,comisaria
+"""
+import argparse
+import traceback
+
+import asignar_inspectores
+import asignar_supervision
+import asignar_comisarios
+from asignador.sesion import Contexto, iniciar_sesion
+from asignador.asincrono import simultaneas, sin_errores
+from asignador.incremental import Diario, modo_incremental
+from asignador.metricas import ejecucion, etapa
+
+# etapa -> (función, estado_tramite, filtro, campos de la denuncia o None para todos)
+ETAPAS = {
+    "inspeccion": (
+        asignar_inspectores.ejecutar_asignacion,
+        asignar_inspectores.ESTADO_DENUNCIA,
+        asignar_inspectores.FILTRO_DENUNCIAS,
+        asignar_inspectores.CAMPOS_DENUNCIA,
+    ),
+    "supervision": (
+        asignar_supervision.ejecutar_asignacion_supervision,
+        asignar_supervision.ESTADO_INFORME,
+        asignar_supervision.FILTRO_INFORMES,
+        asignar_supervision.CAMPOS_INFORME,
+    ),
+    "comisaria": (
+        asignar_comisarios.ejecutar_asignacion_comisario,
+        asignar_comisarios.ESTADO_DENUNCIA,
+        asignar_comisarios.FILTRO_DENUNCIAS,
+        asignar_comisarios.CAMPOS_DENUNCIA,
+    ),
+}
+
+
+def ejecutar_etapas(nombres, ctx=None):
+    """Ejecuta las etapas indicadas, en el orden de ETAPAS, con un contexto compartido."""
+    nombres = [n for n in ETAPAS if n in nombres]
+    if ctx is None:
+        gis = iniciar_sesion()
+        if gis is None:
+            return
+        ctx = Contexto(gis)
+
+    consultas = [ETAPAS[n][1:] for n in nombres]
+    if modo_incremental():
+        # cada etapa lee solo lo posterior a su propia marca de agua
+        consultas = []
+        for n in nombres:
+            _, estado, filtro, campos = ETAPAS[n]
+            diario = Diario(n)
+            consultas.append((estado, diario.filtro(filtro), campos + [diario.campo] if campos else None))
+            diario.cerrar()
+    # la lectura de denuncias y el directorio de workers van a la vez
+    layer_denuncias, layer_workers = ctx.layer_denuncias, ctx.layer_workers
+    sin_errores(simultaneas(
+        (layer_denuncias, lambda: ctx.precargar_denuncias(consultas)),
+        (layer_workers, ctx.trabajadores),
+    ))
+
+    for nombre in nombres:
+        print(f"\n===== Etapa: {nombre} =====")
+        try:
+            with etapa(nombre):
+                ETAPAS[nombre][0](ctx)
+        except Exception:
+            # una etapa con error no impide que corran las demás
+            print(f"❌ Error en la etapa {nombre}:")
+            traceback.print_exc()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Asignación de inspección, supervisión y comisaría")
+    parser.add_argument(
+        "--etapas",
+        default=",".join(ETAPAS),
+        help="Etapas separadas por coma (por defecto: %(default)s)"
+    )
+    args = parser.parse_args()
+
+    nombres = [n.strip() for n in args.etapas.split(",") if n.strip()]
+    desconocidas = [n for n in nombres if n not in ETAPAS]
+    if desconocidas:
+        parser.error(f"Etapas desconocidas: {', '.join(desconocidas)}")
+    with ejecucion("etapas"):
+        ejecutar_etapas(nombres)
+
+
+if __name__ == "__main__":
+    main()
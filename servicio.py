@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+# servicio.py
+"""
+Servicio residente: mantiene la sesión, los workers y las tablas de personal en
+caliente y ejecuta las etapas cuando llega un disparo HTTP o cuando, cada
+--intervalo segundos, hay denuncias pendientes. Los disparos que llegan en
+ráfaga dentro de --espera segundos se juntan en una sola ejecución.
+
+    python servicio.py --puerto 8080 --intervalo 300
+
+    curl -X POST localhost:8080/ejecutar -d '{"etapas": "inspeccion"}'
+    curl localhost:8080/estado
+
+Con SERVICIO_TOKEN definido, los POST deben traer la cabecera X-Token. En
+metricas/ quedan solo los SERVICIO_METRICAS últimos ciclos.
+"""
+import argparse
+import json
+import os
+import re
+import signal
+import threading
+import time
+import traceback
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import ejecutar_etapas
+from asignador.metricas import ejecucion
+from asignador.sesion import Contexto, iniciar_sesion
+
+TOKEN = os.getenv("SERVICIO_TOKEN")
+# JSON de métricas por ciclo que se conservan (0 = todos)
+CONSERVAR_METRICAS = int(os.getenv("SERVICIO_METRICAS", "100"))
+
+# Mensajes de ArcGIS (arcgis o REST) cuando el token venció o no es válido
+_ERROR_TOKEN = re.compile(r"(invalid|expired) token|token required|error code: 49[89]|^49[89]:", re.I | re.M)
+
+
+class ErrorSesion(RuntimeError):
+    """No se pudo iniciar sesión en el portal."""
+
+
+def _error_de_sesion(e):
+    """True si el error es de sesión o token: solo esos se reintentan con una sesión nueva."""
+    return isinstance(e, ErrorSesion) or bool(_ERROR_TOKEN.search(str(e)))
+
+
+class Servicio:
+    """Cola de disparos coalescidos y el ciclo que ejecuta las etapas con un contexto caliente."""
+
+    def __init__(self, intervalo=300, espera=5.0, etapas=None):
+        self.intervalo = intervalo
+        self.espera = espera
+        self.etapas = list(etapas or ejecutar_etapas.ETAPAS)
+        self.ctx = None
+        self._candado = threading.Lock()
+        self._disparo = threading.Event()
+        self._detener = threading.Event()
+        self._pendientes = set()
+        # lo escribe el hilo del ciclo y lo leen los hilos de GET /estado
+        self._candado_estado = threading.Lock()
+        self.estado = {"ciclos": 0, "ejecutando": False, "ultimo_ciclo": None, "ultimo_error": None}
+
+    def instantanea(self):
+        """Copia del estado para responder /estado sin ver un ciclo a medio anotar."""
+        with self._candado_estado:
+            return dict(self.estado)
+
+    def _anotar(self, **cambios):
+        with self._candado_estado:
+            self.estado.update(cambios)
+
+    # --- disparos ----------------------------------------------------------------
+
+    def disparar(self, etapas=None):
+        """Encola las etapas; si ya hay un disparo pendiente se suman a él."""
+        with self._candado:
+            self._pendientes.update(etapas or self.etapas)
+            self._disparo.set()
+
+    def detener(self):
+        self._detener.set()
+        self._disparo.set()
+
+    def _tomar_pendientes(self):
+        # el evento se limpia junto con el cambio de conjunto: un disparo que llega
+        # después deja el evento puesto y sus etapas en el conjunto nuevo
+        with self._candado:
+            self._disparo.clear()
+            etapas, self._pendientes = self._pendientes, set()
+        return etapas
+
+    # --- sesión ------------------------------------------------------------------
+
+    def _contexto(self, renovar=False):
+        if self.ctx is None or renovar:
+            gis = iniciar_sesion()
+            if gis is None:
+                raise ErrorSesion("no se pudo iniciar sesión")
+            self.ctx = Contexto(gis)
+        return self.ctx
+
+    def _hay_pendientes(self):
+        """Una consulta de conteo con los filtros de las etapas."""
+        ctx = self._contexto()
+        where = " OR ".join(f"({ejecutar_etapas.ETAPAS[n][2]})" for n in self.etapas)
+        return ctx.layer_denuncias.query(where=where, return_count_only=True) > 0
+
+    # --- ciclo -------------------------------------------------------------------
+
+    def _ciclo(self, etapas):
+        nombres = [n for n in ejecutar_etapas.ETAPAS if n in etapas]
+        print(f"\n🔁 Ciclo {self.instantanea()['ciclos'] + 1}: {', '.join(nombres)}")
+        self._anotar(ejecutando=True)
+        try:
+            with ejecucion("servicio", conservar=CONSERVAR_METRICAS):
+                for intento in (1, 2):
+                    try:
+                        ctx = self._contexto(renovar=intento == 2)
+                        ctx.renovar()
+                        ejecutar_etapas.ejecutar_etapas(nombres, ctx)
+                        self._anotar(ultimo_error=None)
+                        break
+                    except Exception as e:
+                        print(f"❌ Error en el ciclo (intento {intento}): {e}")
+                        traceback.print_exc()
+                        self._anotar(ultimo_error=str(e))
+                        # solo un token vencido o una sesión caída se reintenta (con sesión
+                        # nueva): repetir las etapas por otro error podría duplicar tareas
+                        if intento == 2 or not _error_de_sesion(e):
+                            break
+                        print("🔑 Error de sesión: se inicia sesión de nuevo y se reintenta")
+        finally:
+            with self._candado_estado:
+                self.estado["ejecutando"] = False
+                self.estado["ciclos"] += 1
+                self.estado["ultimo_ciclo"] = time.strftime("%Y-%m-%dT%H:%M:%S")
+
+    def ejecutar(self):
+        """Bucle principal: espera un disparo o el intervalo de sondeo."""
+        while not self._detener.is_set():
+            disparado = self._disparo.wait(timeout=self.intervalo)
+            if self._detener.is_set():
+                break
+            if disparado:
+                # los disparos de la ráfaga que llegan durante la espera se juntan
+                time.sleep(self.espera)
+                etapas = self._tomar_pendientes()
+            else:
+                try:
+                    if not self._hay_pendientes():
+                        continue
+                except Exception as e:
+                    print(f"⚠️ No se pudo sondear las denuncias: {e}")
+                    self.ctx = None
+                    continue
+                etapas = set(self.etapas)
+            if etapas:
+                self._ciclo(etapas)
+
+
+def _manejador(servicio):
+    class Manejador(BaseHTTPRequestHandler):
+        def _responder(self, codigo, cuerpo):
+            datos = json.dumps(cuerpo, ensure_ascii=False).encode("utf-8")
+            self.send_response(codigo)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(datos)))
+            self.end_headers()
+            self.wfile.write(datos)
+
+        def do_GET(self):
+            if self.path.rstrip("/") == "/estado":
+                self._responder(200, servicio.instantanea())
+            else:
+                self._responder(404, {"error": "ruta desconocida"})
+
+        def do_POST(self):
+            if self.path.rstrip("/") != "/ejecutar":
+                return self._responder(404, {"error": "ruta desconocida"})
+            if TOKEN and self.headers.get("X-Token") != TOKEN:
+                return self._responder(403, {"error": "token inválido"})
+            largo = int(self.headers.get("Content-Length") or 0)
+            try:
+                cuerpo = json.loads(self.rfile.read(largo) or b"{}")
+            except ValueError:
+                return self._responder(400, {"error": "JSON inválido"})
+            etapas = [n.strip() for n in str(cuerpo.get("etapas") or "").split(",") if n.strip()]
+            desconocidas = [n for n in etapas if n not in ejecutar_etapas.ETAPAS]
+            if desconocidas:
+                return self._responder(400, {"error": f"Etapas desconocidas: {', '.join(desconocidas)}"})
+            servicio.disparar(etapas)
+            self._responder(202, {"encolado": etapas or servicio.etapas})
+
+        def log_message(self, formato, *args):
+            pass
+
+    return Manejador
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Servicio residente de asignación")
+    parser.add_argument("--puerto", type=int, default=int(os.getenv("SERVICIO_PUERTO", "8080")))
+    parser.add_argument("--host", default=os.getenv("SERVICIO_HOST", "127.0.0.1"))
+    parser.add_argument("--intervalo", type=float, default=300, help="segundos entre sondeos (0 = sin sondeo)")
+    parser.add_argument("--espera", type=float, default=5, help="segundos para juntar disparos en ráfaga")
+    parser.add_argument("--etapas", default=",".join(ejecutar_etapas.ETAPAS))
+    args = parser.parse_args()
+
+    nombres = [n.strip() for n in args.etapas.split(",") if n.strip()]
+    desconocidas = [n for n in nombres if n not in ejecutar_etapas.ETAPAS]
+    if desconocidas:
+        parser.error(f"Etapas desconocidas: {', '.join(desconocidas)}")
+
+    servicio = Servicio(intervalo=args.intervalo or None, espera=args.espera, etapas=nombres)
+    servidor = ThreadingHTTPServer((args.host, args.puerto), _manejador(servicio))
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    signal.signal(signal.SIGTERM, lambda *_: servicio.detener())
+    print(f"🟢 Servicio escuchando en http://{args.host}:{args.puerto} (sondeo cada {args.intervalo} s)")
+
+    try:
+        servicio._contexto()  # sesión y caché en caliente desde el arranque
+    except Exception as e:
+        print(f"⚠️ {e}; se reintentará en el primer ciclo")
+    try:
+        servicio.ejecutar()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        servidor.shutdown()
+        print("🔴 Servicio detenido")
+
+
+if __name__ == "__main__":
+    main()
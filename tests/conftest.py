@@ -0,0 +1,20 @@
+"""
+Cada prueba corre en una carpeta temporal: las cachés y el estado que los
+scripts guardan en .estado/ (workers, rosters, diario, adjuntos) y las métricas
+no pasan de una prueba a otra.
+"""
+import pytest
+
+from asignador import adjuntos, esquema
+
+
+@pytest.fixture(autouse=True)
+def carpeta_temporal(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.delenv("INCREMENTAL", raising=False)
+    monkeypatch.delenv("FLUJO", raising=False)
+    monkeypatch.delenv("MODO_ASIGNACION", raising=False)
+    monkeypatch.setattr(adjuntos, "_ALMACEN", None)
+    # las capas simuladas repiten url entre pruebas
+    monkeypatch.setattr(esquema, "_CACHE", {})
+    return tmp_path
@@ -0,0 +1,69 @@
+"""
+copiar_adjuntos cuando la subida se corta: antes de reenviar un adjunto cuya
+petición lanzó una excepción se revisa el destino, así no queda duplicado.
+"""
+from collections import Counter
+
+from asignador.adjuntos import copiar_adjuntos
+from asignador.sesion import ITEM_DENUNCIAS, ITEM_WORKFORCE
+from benchmarks.datos_sinteticos import generar_servicio
+
+
+class SubidaCortada:
+    """
+    Los adjuntos de la capa simulada; la primera subida de cada archivo llega
+    al servidor pero su respuesta se pierde (aplicada=True) o se pierde antes.
+    """
+
+    def __init__(self, adjuntos_capa, aplicada=True):
+        self._adjuntos = adjuntos_capa
+        self.aplicada = aplicada
+        self.subidas = Counter()
+
+    def __getattr__(self, nombre):
+        return getattr(self._adjuntos, nombre)
+
+    def add(self, oid, file_path, **kwargs):
+        self.subidas[oid] += 1
+        if self.subidas[oid] == 1:
+            if self.aplicada:
+                self._adjuntos.add(oid, file_path, **kwargs)
+            raise TimeoutError("sin respuesta")
+        return self._adjuntos.add(oid, file_path, **kwargs)
+
+
+class Destino:
+    def __init__(self, capa, aplicada):
+        self._capa = capa
+        self.attachments = SubidaCortada(capa.attachments, aplicada)
+
+    def __getattr__(self, nombre):
+        return getattr(self._capa, nombre)
+
+
+def _copiar(aplicada):
+    servidor, _ = generar_servicio(pendientes=2, historico=0, adjuntos_por_denuncia=1)
+    origen = servidor.items[ITEM_DENUNCIAS].layers[0]
+    capa = servidor.items[ITEM_WORKFORCE].layers[0]
+    oids = sorted({oid for oid in range(1, 200) if origen.attachments.get_list(oid)})
+    pares = [(oid, 1000 + oid) for oid in oids]
+    destino = Destino(capa, aplicada)
+    copiar_adjuntos(origen, destino, pares, reintentos=3)
+    return origen, capa, pares, destino
+
+
+def test_subida_sin_respuesta_no_se_duplica():
+    origen, capa, pares, destino = _copiar(aplicada=True)
+    for oid_origen, oid_destino in pares:
+        esperados = [a["name"] for a in origen.attachments.get_list(oid_origen)]
+        assert [a["name"] for a in capa.attachments.get_list(oid_destino)] == esperados
+    # una sola subida por archivo: la revisión del destino lo encontró
+    assert set(destino.attachments.subidas.values()) == {1}
+
+
+def test_subida_perdida_se_reenvia():
+    origen, capa, pares, destino = _copiar(aplicada=False)
+    for oid_origen, oid_destino in pares:
+        esperados = [a["name"] for a in origen.attachments.get_list(oid_origen)]
+        assert [a["name"] for a in capa.attachments.get_list(oid_destino)] == esperados
+    assert set(destino.attachments.subidas.values()) == {2}
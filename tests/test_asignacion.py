@@ -0,0 +1,62 @@
+"""IndiceCarga: siempre la persona con menos trámites de su grupo, con desempate por objectid."""
+from asignador.asignacion import IndiceCarga
+from asignador.registros import Persona
+
+GRUPO = ("Higiene", "Ruido")
+
+
+def _indice():
+    personas = [
+        Persona(oid=3, usuario="c", grupo=GRUPO, num_tramites=2, ultimo_numero=10),
+        Persona(oid=1, usuario="a", grupo=GRUPO, num_tramites=2, ultimo_numero=4),
+        Persona(oid=2, usuario="b", grupo=GRUPO, num_tramites=5, ultimo_numero=7),
+        Persona(oid=4, usuario="d", grupo=("Otra", "Area"), num_tramites=0),
+    ]
+    return IndiceCarga(personas, col_oid="ObjectID")
+
+
+def test_reparto_balanceado_y_determinista():
+    indice = _indice()
+
+    elegidos = [indice.asignar(GRUPO).usuario for _ in range(6)]
+
+    # empate entre a y c (2 trámites): primero el menor objectid
+    assert elegidos == ["a", "c", "a", "c", "a", "c"]
+    assert {p.usuario: p.num_tramites for p in indice.registros} == {"c": 5, "a": 5, "b": 5, "d": 0}
+    assert indice.asignar(("Sin", "Personal")) is None
+
+
+def test_liberar_devuelve_el_tramite_pero_no_el_numero():
+    indice = _indice()
+    a = indice.asignar(GRUPO)
+    indice.liberar(a)
+
+    assert (a.num_tramites, a.ultimo_numero) == (2, 5)
+    assert indice.primero(GRUPO) is a
+
+
+def test_tomar_fuera_de_orden_actualiza_el_monticulo():
+    indice = _indice()
+    b = next(p for p in indice.registros if p.usuario == "b")
+    for _ in range(2):
+        indice.tomar(indice.primero(GRUPO))
+    indice.tomar(b)
+
+    assert indice.asignar(GRUPO).usuario == "a"
+    assert b.num_tramites == 6
+
+
+def test_actualizaciones_solo_lo_modificado():
+    indice = _indice()
+    indice.asignar(GRUPO)
+    indice.asignar(GRUPO)
+
+    filas = indice.actualizaciones(con_ultimo=False, vaciar=True)
+    assert filas == [
+        {"attributes": {"ObjectID": 1, "num_tramites": 3}},
+        {"attributes": {"ObjectID": 3, "num_tramites": 3}},
+    ]
+    assert indice.actualizaciones() == []
+
+    indice.asignar(("Otra", "Area"))
+    assert indice.actualizaciones() == [{"attributes": {"ObjectID": 4, "num_tramites": 1, "ultimo_numero": 1}}]
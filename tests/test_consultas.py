@@ -0,0 +1,74 @@
+"""
+Paginación de consultas cuando el servidor corta las páginas por debajo de lo
+pedido y la capa no publica su maxRecordCount, y lectura de lastEditDate.
+"""
+import pytest
+
+from asignador.consultas import consultar_paginado, paginas, planificar_consulta, ultima_edicion
+from benchmarks.datos_sinteticos import CAMPOS_DENUNCIAS
+from benchmarks.servicio_simulado import CapaSimulada, ServidorSimulado
+
+
+class SinLimite:
+    """La capa simulada sin maxRecordCount en sus propiedades y, si se pide, sin exceededTransferLimit."""
+
+    def __init__(self, capa, con_bandera=True):
+        self._capa = capa
+        self.url = capa.url
+        self.con_bandera = con_bandera
+        self.consultas = 0
+
+    @property
+    def properties(self):
+        return {k: v for k, v in self._capa.properties.items() if k != "maxRecordCount"}
+
+    def query(self, **kwargs):
+        self.consultas += 1
+        pagina = self._capa.query(**kwargs)
+        if not self.con_bandera:
+            pagina.exceeded_transfer_limit = None  # como el FeatureSet de arcgis
+        return pagina
+
+
+def _capa(filas, limite):
+    capa = CapaSimulada(ServidorSimulado(), "https://simulado.local/denuncias/FeatureServer/0",
+                        CAMPOS_DENUNCIAS, max_record_count=limite)
+    capa.cargar([({"estado_tramite": "Recibido"}, None) for _ in range(filas)])
+    return capa
+
+
+@pytest.mark.parametrize("con_bandera", [True, False])
+@pytest.mark.parametrize("por_clave", [False, True])
+def test_servidor_corta_paginas_sin_max_record_count(con_bandera, por_clave):
+    capa = SinLimite(_capa(2500, limite=300), con_bandera)
+    plan = planificar_consulta("estado_tramite = 'Recibido'", ["objectid"])
+
+    leidas = [f.attributes["objectid"] for p in paginas(capa, plan, 1000, por_clave=por_clave) for f in p.features]
+
+    assert leidas == list(range(1, 2501))
+    # 9 páginas de 300 (la última de 100); sin la bandera hace falta una vacía al final
+    assert capa.consultas == (9 if con_bandera else 10)
+
+
+def test_pagina_corta_con_max_record_count_es_la_ultima():
+    capa = _capa(1100, limite=500)
+    consultas = []
+    query = capa.query
+    capa.query = lambda **kwargs: consultas.append(kwargs) or query(**kwargs)
+
+    resultado = consultar_paginado(capa, planificar_consulta("1=1", ["objectid"]))
+
+    assert len(resultado.features) == 1100
+    assert len(consultas) == 3
+
+
+def test_ultima_edicion_refrescada_sin_tocar_la_cache():
+    capa = _capa(3, limite=500)
+    antes = ultima_edicion(capa)
+    capa.calculate(where="objectid = 1", calc_expression=[{"field": "estado_tramite", "value": "En proceso"}])
+
+    # layer.properties sigue en caché; refrescar pide {url}?f=json a la conexión de la capa
+    assert ultima_edicion(capa) == antes
+    assert ultima_edicion(capa, refrescar=True) > antes
+    assert capa.properties["editingInfo"]["lastEditDate"] == antes
+
@@ -0,0 +1,93 @@
+"""
+aplicar_ediciones cuando la conexión se corta: un add cuya petición lanzó una
+excepción pudo haberse creado igual, así que con claves se busca en la capa
+antes de reenviarlo y sin claves no se reenvía.
+"""
+from collections import Counter
+
+import pytest
+
+from asignador import escritura
+from asignador.escritura import CLAVES_TAREA, aplicar_ediciones, exitosos
+from asignador.sesion import ITEM_DENUNCIAS, ITEM_WORKFORCE
+from benchmarks.datos_sinteticos import generar_servicio
+
+
+class Cortada:
+    """
+    La capa simulada detrás de una conexión que se corta: las primeras `cortes`
+    llamadas a edit_features lanzan TimeoutError, después (aplicada=True) o
+    antes de que el servidor aplique la edición.
+    """
+
+    def __init__(self, capa, cortes=1, aplicada=True):
+        self._capa = capa
+        self.cortes = cortes
+        self.aplicada = aplicada
+        self.envios = 0
+
+    def __getattr__(self, nombre):
+        return getattr(self._capa, nombre)
+
+    def edit_features(self, **kwargs):
+        self.envios += 1
+        if self.cortes:
+            self.cortes -= 1
+            if self.aplicada:
+                self._capa.edit_features(**kwargs)
+            raise TimeoutError("sin respuesta")
+        return self._capa.edit_features(**kwargs)
+
+
+@pytest.fixture(autouse=True)
+def sin_espera(monkeypatch):
+    monkeypatch.setattr(escritura, "ESPERA_REINTENTO", 0)
+
+
+def _servicio(**kwargs):
+    servidor, _ = generar_servicio(pendientes=5, historico=0, adjuntos_por_denuncia=0, **kwargs)
+    return servidor
+
+
+def _tareas(n):
+    return [{"attributes": {"workorderid": f"{{{i:08d}}}", "assignmenttype": "tipo", "description": f"tarea {i}"}}
+            for i in range(n)]
+
+
+@pytest.mark.parametrize("aplicada", [True, False])
+def test_add_sin_respuesta_se_reconcilia_por_claves(aplicada):
+    capa = _servicio().items[ITEM_WORKFORCE].layers[0]
+    cortada = Cortada(capa, aplicada=aplicada)
+
+    resultados = aplicar_ediciones(cortada, adds=_tareas(30), tamano_lote=10, paralelo=False,
+                                   claves=CLAVES_TAREA)["addResults"]
+
+    assert all(exitosos(resultados))
+    # el primer lote se creó una sola vez: encontrado en la capa o reenviado
+    assert Counter(t["workorderid"] for t in capa.registros()) == Counter(f"{{{i:08d}}}" for i in range(30))
+    assert cortada.envios == (3 if aplicada else 4)
+    creados = {t["workorderid"]: t["OBJECTID"] for t in capa.registros()}
+    assert [r["objectId"] for r in resultados] == [creados[f"{{{i:08d}}}"] for i in range(30)]
+
+
+def test_add_sin_respuesta_y_sin_claves_no_se_reenvia():
+    capa = _servicio().items[ITEM_WORKFORCE].layers[0]
+    cortada = Cortada(capa)
+
+    resultados = aplicar_ediciones(cortada, adds=_tareas(30), tamano_lote=10, paralelo=False)["addResults"]
+
+    assert exitosos(resultados) == [False] * 10 + [True] * 20
+    assert len(capa.registros()) == 30
+    assert cortada.envios == 3
+
+
+def test_updates_rechazados_se_reintentan():
+    servidor = _servicio(tasa_fallos=0.3)
+    capa = servidor.items[ITEM_DENUNCIAS].layers[0]
+    oids = [d["objectid"] for d in capa.registros()]
+    updates = [{"attributes": {"objectid": oid, "estado_tramite": "Revisado"}} for oid in oids]
+
+    resultados = aplicar_ediciones(capa, updates=updates, tamano_lote=4, reintentos=10)["updateResults"]
+
+    assert all(exitosos(resultados))
+    assert {d["estado_tramite"] for d in capa.registros()} == {"Revisado"}
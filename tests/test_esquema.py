@@ -0,0 +1,72 @@
+"""
+Las etapas contra una capa de denuncias que publica OBJECTID/GlobalID (en vez
+de objectid/globalid): el esquema resuelve los nombres y todo lo que se lee y
+escribe usa el nombre real.
+"""
+from collections import Counter
+
+import pytest
+
+import asignar_comisarios
+import asignar_inspectores
+import asignar_supervision
+import ejecutar_etapas
+from asignador import esquema as modulo_esquema
+from asignador.esquema import esquema
+from asignador.sesion import Contexto, ITEM_DENUNCIAS, ITEM_WORKFORCE
+from benchmarks.datos_sinteticos import CAMPOS_DENUNCIAS, _gid, _oid, generar_servicio
+
+PENDIENTES = 20
+CAMPOS_MAYUSCULAS = [_oid("OBJECTID"), _gid("GlobalID")] + CAMPOS_DENUNCIAS[2:]
+
+
+def _servicio():
+    return generar_servicio(pendientes=PENDIENTES, historico=0, adjuntos_por_denuncia=0,
+                            campos_denuncias=CAMPOS_MAYUSCULAS)
+
+
+def _comprobar(servidor):
+    denuncias = servidor.items[ITEM_DENUNCIAS].layers[0].registros()
+    estados = Counter(d["estado_tramite"] for d in denuncias)
+    assert estados["Recibido"] == estados["Informe enviado"] == 0
+    # a comisaría solo pasan las que tienen proceso administrativo
+    sin_proceso = sum(d["estado_tramite"] == "Supervision Finalizada" and d["proceso_administrativo"] != "Si"
+                      for d in denuncias)
+    assert estados["Supervision Finalizada"] == sin_proceso
+    tareas = servidor.items[ITEM_WORKFORCE].layers[0].registros()
+    assert len(tareas) == 3 * PENDIENTES - sin_proceso
+    # workorderid es el GlobalID de la denuncia de cada tarea
+    globalids = {d["GlobalID"] for d in denuncias}
+    assert {t["workorderid"] for t in tareas} <= globalids
+
+
+@pytest.mark.parametrize("flujo", ["0", "1"])
+def test_etapas_por_separado(monkeypatch, flujo):
+    monkeypatch.setenv("FLUJO", flujo)
+    servidor, gis = _servicio()
+    ctx = Contexto(gis)
+    asignar_inspectores.ejecutar_asignacion(ctx)
+    asignar_supervision.ejecutar_asignacion_supervision(ctx)
+    asignar_comisarios.ejecutar_asignacion_comisario(ctx)
+    _comprobar(servidor)
+
+
+def test_etapas_con_lectura_compartida(monkeypatch):
+    monkeypatch.setenv("INCREMENTAL", "1")
+    servidor, gis = _servicio()
+    ejecutar_etapas.ejecutar_etapas(list(ejecutar_etapas.ETAPAS), Contexto(gis))
+    _comprobar(servidor)
+
+
+def test_cache_una_entrada_por_capa():
+    _, gis = _servicio()
+    capa = gis.content.get(ITEM_DENUNCIAS).layers[0]
+    primero = esquema(capa)
+    assert esquema(capa) is primero
+
+    # un cambio de esquema reemplaza la entrada de la capa en lugar de sumar otra
+    capa.properties["editingInfo"]["schemaLastEditDate"] = 1
+    segundo = esquema(capa)
+    assert segundo is not primero
+    assert len(modulo_esquema._CACHE) == 1
+    assert segundo.oid == "OBJECTID" and segundo.gid == "GlobalID"
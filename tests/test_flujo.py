@@ -0,0 +1,61 @@
+"""
+FLUJO=1 con lotes chicos: la reserva de números y el índice de carga trabajan en
+el hilo de crear_tareas mientras el principal escribe la tabla de inspectores y
+actualiza su copia local. El resultado tiene que ser el mismo que sin flujo.
+"""
+from collections import Counter
+
+import asignar_inspectores
+from asignador import adjuntos
+from asignador.sesion import Contexto, ITEM_DENUNCIAS, ITEM_INSPECTORES, ITEM_WORKFORCE
+from benchmarks.datos_sinteticos import generar_servicio
+
+PENDIENTES = 40
+
+
+def _correr(carpeta, monkeypatch, flujo):
+    carpeta.mkdir()
+    monkeypatch.chdir(carpeta)
+    monkeypatch.setenv("FLUJO", flujo)
+    monkeypatch.setattr(adjuntos, "_ALMACEN", None)
+    servidor, gis = generar_servicio(pendientes=PENDIENTES, historico=0, adjuntos_por_denuncia=0.5)
+    asignar_inspectores.ejecutar_asignacion(Contexto(gis))
+    return servidor, gis
+
+
+def _resultado(servidor):
+    denuncias = servidor.items[ITEM_DENUNCIAS].layers[0].registros()
+    oids = {d["globalid"]: d["objectid"] for d in denuncias}
+    usuarios = {w["GlobalID"]: w["userid"] for w in servidor.items[ITEM_WORKFORCE].layers[1].registros()}
+    tareas = sorted(
+        (oids.get(t["workorderid"]), t["codigoformulario"], usuarios.get(t["workerid"]))
+        for t in servidor.items[ITEM_WORKFORCE].layers[0].registros()
+    )
+    estados = sorted((d["objectid"], d["estado_tramite"]) for d in denuncias)
+    inspectores = sorted(
+        (i["ObjectID"], i["num_tramites"], i["ultimo_numero"])
+        for i in servidor.items[ITEM_INSPECTORES].tables[0].registros()
+    )
+    return tareas, estados, inspectores
+
+
+def test_flujo_igual_que_sin_flujo(tmp_path, monkeypatch):
+    # lotes de 7 denuncias: varias reservas y escrituras de la tabla se solapan
+    monkeypatch.setattr(asignar_inspectores, "LOTE", 7)
+    secuencial = _resultado(_correr(tmp_path / "secuencial", monkeypatch, "0")[0])
+    servidor, gis = _correr(tmp_path / "flujo", monkeypatch, "1")
+    en_flujo = _resultado(servidor)
+
+    assert en_flujo == secuencial
+    tareas, estados, inspectores = en_flujo
+    assert len(tareas) == PENDIENTES
+    assert not [oid for oid, estado in estados if estado == "Recibido"]
+    # un número de formulario por tarea y por inspector, sin repetir
+    assert not [c for c, n in Counter((t[1], t[2]) for t in tareas).items() if n > 1]
+
+    # la copia local quedó vigente y coincide con la tabla del servidor
+    roster = Contexto(gis).roster("inspectores")
+    df = roster.cargar()
+    assert roster._meta() is not None
+    copia = sorted(zip(df["ObjectID"], df["num_tramites"], df["ultimo_numero"]))
+    assert [tuple(int(v) for v in fila) for fila in copia] == inspectores
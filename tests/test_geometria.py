@@ -0,0 +1,52 @@
+"""Reproyección WGS84 ↔ Web Mercator y distancias en metros en cualquiera de las dos."""
+import numpy as np
+import pytest
+
+from asignador.geometria import ErrorGeometria, geografica, metros, reproyectar
+
+# Riobamba y un punto ~1 km al norte y ~1 km al este
+LON, LAT = -78.6483, -1.6636
+NORTE = (LON, LAT + 1000 / 111195)
+ESTE = (LON + 1000 / (111195 * np.cos(np.radians(LAT))), LAT)
+
+
+def test_ida_y_vuelta_a_web_mercator():
+    x = np.array([LON, 0.0, 120.5])
+    y = np.array([LAT, 0.0, 60.25])
+    mx, my = reproyectar(x, y, 4326, {"wkid": 102100, "latestWkid": 3857})
+    assert (mx[1], my[1]) == pytest.approx((0, 0), abs=1e-6)
+    assert mx[2] == pytest.approx(13413998.64, abs=0.01)
+    lon, lat = reproyectar(mx, my, 102100, 4326)
+    np.testing.assert_allclose(lon, x, atol=1e-9)
+    np.testing.assert_allclose(lat, y, atol=1e-9)
+
+
+def test_misma_referencia_o_desconocida_no_cambia():
+    x, y = np.array([1.0]), np.array([2.0])
+    assert reproyectar(x, y, 3857, 102100) == (x, y)
+    assert reproyectar(x, y, None, 4326) == (x, y)
+
+
+def test_otra_referencia_sin_pyproj(monkeypatch):
+    from asignador import geometria
+    monkeypatch.setattr(geometria, "Transformer", None)
+    with pytest.raises(ErrorGeometria):
+        reproyectar(np.array([500000.0]), np.array([9800000.0]), 32717, 4326)
+
+
+@pytest.mark.parametrize("destino", [NORTE, ESTE])
+def test_metros_en_grados_y_en_web_mercator(destino):
+    assert geografica(4326) and not geografica(102100)
+    en_grados = metros(LON, LAT, *destino, 4326)
+    assert en_grados == pytest.approx(1000, rel=1e-3)
+
+    # Web Mercator usa el radio ecuatorial y haversine el medio: difieren en 0,11 %
+    (x1, x2), (y1, y2) = reproyectar(np.array([LON, destino[0]]), np.array([LAT, destino[1]]), 4326, 3857)
+    assert metros(x1, y1, x2, y2, 102100) == pytest.approx(en_grados, rel=2e-3)
+
+
+def test_metros_lejos_del_ecuador():
+    # a 60° de latitud Web Mercator exagera las distancias al doble
+    (x1, x2), (y1, y2) = reproyectar(np.array([10.0, 10.0]), np.array([60.0, 60.01]), 4326, 3857)
+    assert np.hypot(x2 - x1, y2 - y1) == pytest.approx(2 * metros(10.0, 60.0, 10.0, 60.01, 4326), rel=2e-3)
+    assert metros(x1, y1, x2, y2, 3857) == pytest.approx(metros(10.0, 60.0, 10.0, 60.01, 4326), rel=2e-3)
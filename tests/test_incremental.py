@@ -0,0 +1,102 @@
+"""
+Modo incremental: la marca de agua no deja atrás registros pendientes, y una
+ejecución que se corta entre crear las tareas y anotarlas en el diario no las
+duplica en la siguiente, en ninguna de las tres etapas.
+"""
+from collections import Counter
+
+import pandas as pd
+import pytest
+
+import asignar_comisarios
+import asignar_inspectores
+import asignar_supervision
+from asignador import incremental
+from asignador.sesion import Contexto, ITEM_DENUNCIAS, ITEM_WORKFORCE
+from benchmarks.datos_sinteticos import generar_servicio
+
+PENDIENTES = 15
+
+
+class Corte(BaseException):
+    """El proceso se interrumpe (no lo atrapa ningún except Exception de las etapas)."""
+
+
+ETAPAS = [
+    (asignar_inspectores.ejecutar_asignacion, "Recibido", "En proceso", "inspector_asignado", "nombreinspector"),
+    (asignar_supervision.ejecutar_asignacion_supervision, "Informe enviado", "En supervisión", None, None),
+    (asignar_comisarios.ejecutar_asignacion_comisario, "Supervision Finalizada", "Asignado a comisario",
+     "comisario_asignado", "nombrecomisario"),
+]
+
+
+@pytest.mark.parametrize("ejecutar, antes, despues, campo_denuncia, campo_tarea", ETAPAS)
+def test_tarea_creada_sin_anotar_no_se_duplica(monkeypatch, ejecutar, antes, despues, campo_denuncia, campo_tarea):
+    monkeypatch.setenv("INCREMENTAL", "1")
+    servidor, gis = generar_servicio(pendientes=PENDIENTES, historico=0, adjuntos_por_denuncia=1)
+    denuncias = servidor.items[ITEM_DENUNCIAS].layers[0]
+    tareas = servidor.items[ITEM_WORKFORCE].layers[0]
+
+    registrar = incremental.Diario.registrar
+
+    def cortar(diario, entradas):
+        if entradas and entradas[0][1] == incremental.TAREA_CREADA:
+            raise Corte()
+        return registrar(diario, entradas)
+
+    monkeypatch.setattr(incremental.Diario, "registrar", cortar)
+    with pytest.raises(Corte):
+        ejecutar(Contexto(gis))
+    creadas = len(tareas.registros())
+    assert creadas
+    assert not [d for d in denuncias.registros() if d["estado_tramite"] == despues]
+
+    monkeypatch.setattr(incremental.Diario, "registrar", registrar)
+    ejecutar(Contexto(gis))
+
+    assert len(tareas.registros()) == creadas
+    assert Counter(t["workorderid"] for t in tareas.registros()).most_common(1)[0][1] == 1
+    por_globalid = {d["globalid"]: d for d in denuncias.registros()}
+    assert all(por_globalid[t["workorderid"]]["estado_tramite"] == despues for t in tareas.registros())
+    if campo_denuncia:
+        # la denuncia queda con la persona de la tarea que ya existía
+        assert all(por_globalid[t["workorderid"]][campo_denuncia] == t[campo_tarea] for t in tareas.registros())
+    assert not [d for d in denuncias.registros() if d["estado_tramite"] == antes
+                and (d["estado_tramite"] != "Supervision Finalizada" or d["proceso_administrativo"] == "Si")]
+
+
+def test_marca_no_pasa_a_un_pendiente(tmp_path):
+    diario = incremental.Diario("prueba", ruta=str(tmp_path / "estado.sqlite"), campo="objectid")
+    df = pd.DataFrame({"objectid": [1, 2, 3, 4, 5]})
+
+    diario.avanzar(df, completados={1, 2, 4, 5})
+    # 3 sigue pendiente: la marca queda justo antes
+    assert diario.marca() == 2
+    assert diario.filtro("1=1") == "(1=1) AND objectid > 2"
+
+    diario.avanzar(df, completados={1, 2, 3, 4, 5})
+    assert diario.marca() == 5
+    # una lectura anterior no la hace retroceder
+    diario.avanzar(df.head(2), completados=set())
+    assert diario.marca() == 5
+
+
+def test_marca_por_fecha_en_milisegundos(tmp_path):
+    diario = incremental.Diario("prueba", ruta=str(tmp_path / "estado.sqlite"), campo="EditDate")
+    fechas = pd.to_datetime(["2024-03-01 10:00:00", "2024-03-01 10:00:05", "2024-03-01 10:00:09"], utc=True)
+    df = pd.DataFrame({"objectid": [1, 2, 3], "EditDate": fechas})
+
+    diario.avanzar(df, completados={1, 3})
+    assert diario.marca() == int(fechas[1].timestamp() * 1000) - 1
+    # TIMESTAMP va en segundos: >= para no saltarse registros del mismo segundo
+    assert diario.filtro("1=1") == "(1=1) AND EditDate >= TIMESTAMP '2024-03-01 10:00:04'"
+
+
+def test_diario_a_medias_hasta_completar(tmp_path):
+    diario = incremental.Diario("prueba", ruta=str(tmp_path / "estado.sqlite"))
+    actualizacion = {"attributes": {"objectid": 7, "estado_tramite": "En proceso"}}
+    diario.registrar([(7, incremental.TAREA_CREADA, 70, actualizacion), (8, incremental.TAREA_CREADA, 80, None)])
+    diario.registrar([(7, incremental.ADJUNTOS_COPIADOS, None, None), (8, incremental.COMPLETADO, None, None)])
+
+    # el oid de la tarea y la actualización se conservan al cambiar de estado
+    assert diario.a_medias() == {7: (incremental.ADJUNTOS_COPIADOS, 70, actualizacion)}
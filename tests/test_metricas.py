@@ -0,0 +1,40 @@
+"""instrumentar_http cuenta solo las peticiones de la sesión instrumentada."""
+import requests
+from requests.adapters import BaseAdapter, HTTPAdapter
+
+from asignador.metricas import METRICAS, instrumentar_http
+
+
+class Eco(BaseAdapter):
+    """Adaptador sin red: responde 200 con un cuerpo fijo."""
+
+    def send(self, request, **kwargs):
+        respuesta = requests.Response()
+        respuesta.status_code = 200
+        respuesta._content = b'{"ok": true}'
+        respuesta.request = request
+        return respuesta
+
+    def close(self):
+        pass
+
+
+def _sesion():
+    sesion = requests.Session()
+    sesion.mount("https://", Eco())
+    return sesion
+
+
+def test_solo_la_sesion_instrumentada():
+    send = HTTPAdapter.send
+    METRICAS.reiniciar("prueba")
+    sesion, otra = _sesion(), _sesion()
+    instrumentar_http(sesion)
+    instrumentar_http(sesion)  # dos veces no cuenta doble
+
+    sesion.post("https://simulado.local/query", data="where=1%3D1")
+    otra.get("https://simulado.local/query")
+
+    assert METRICAS.resumen()["http"] == {"peticiones": 1, "bytes_enviados": 11, "bytes_recibidos": 12}
+    assert HTTPAdapter.send is send
+    assert METRICAS.resumen()["inicio"].endswith("Z")
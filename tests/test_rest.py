@@ -0,0 +1,63 @@
+"""SesionRest: los hilos que piden el token a la vez generan uno solo."""
+import json
+import threading
+import time
+
+import requests
+from requests.adapters import BaseAdapter
+
+from asignador.rest import SesionRest
+
+
+class Portal(BaseAdapter):
+    """generateToken sin red: tarda un poco y cuenta las veces que se pidió."""
+
+    def __init__(self):
+        super().__init__()
+        self.pedidos = 0
+        self._candado = threading.Lock()
+
+    def send(self, request, **kwargs):
+        with self._candado:
+            self.pedidos += 1
+            numero = self.pedidos
+        time.sleep(0.05)
+        respuesta = requests.Response()
+        respuesta.status_code = 200
+        respuesta._content = json.dumps({"token": f"t{numero}", "expires": (time.time() + 7200) * 1000}).encode()
+        respuesta.request = request
+        return respuesta
+
+    def close(self):
+        pass
+
+
+def _sesion():
+    sesion = SesionRest("https://portal.local", "usuario", "clave")
+    portal = Portal()
+    sesion.http.mount("https://", portal)
+    return sesion, portal
+
+
+def _a_la_vez(funcion, hilos=8):
+    resultados = []
+    trabajos = [threading.Thread(target=lambda: resultados.append(funcion())) for _ in range(hilos)]
+    for t in trabajos:
+        t.start()
+    for t in trabajos:
+        t.join()
+    return resultados
+
+
+def test_un_solo_token_para_todos_los_hilos():
+    sesion, portal = _sesion()
+    assert _a_la_vez(sesion.token) == ["t1"] * 8
+    assert portal.pedidos == 1
+
+
+def test_token_vencido_se_renueva_una_vez():
+    sesion, portal = _sesion()
+    sesion.token()
+    sesion._vence = time.time() + 30  # dentro del minuto previo al vencimiento
+    assert _a_la_vez(sesion.token) == ["t2"] * 8
+    assert portal.pedidos == 2
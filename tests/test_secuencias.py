@@ -0,0 +1,126 @@
+"""
+ReservaNumeros contra la tabla del servicio simulado, con otro proceso que
+reserva en la misma tabla entre la lectura del contador y la escritura
+condicional: el calculate "ultimo_numero = N" del servidor deja de cumplirse y
+la reserva tiene que contar el conflicto y reintentar.
+
+    python -m pytest -q tests
+"""
+from asignador.registros import Persona
+from asignador.secuencias import ReservaNumeros
+from asignador.sesion import ITEM_INSPECTORES
+from benchmarks.datos_sinteticos import generar_servicio
+
+
+class TablaCompartida:
+    """
+    La tabla simulada vista por este proceso. Tras cada una de las primeras
+    `veces` consultas, otro proceso (su propia ReservaNumeros sobre la misma
+    tabla) reserva y usa `cantidad` números de cada persona consultada.
+    fallar: oids cuyo calculate lanza TimeoutError (sin respuesta).
+    """
+
+    def __init__(self, tabla, veces=0, cantidad=5):
+        self._tabla = tabla
+        self.veces = veces
+        self.cantidad = cantidad
+        self.fallar = set()
+        self.ajenos = []
+        self.otro = ReservaNumeros(tabla, col_oid="ObjectID")
+
+    def __getattr__(self, nombre):
+        return getattr(self._tabla, nombre)
+
+    def competir(self, oid):
+        persona = Persona(oid=oid)
+        numeros = self.otro.reservar([persona] * self.cantidad)
+        self.otro.confirmar(persona, max(numeros))
+        self.otro.devolver()
+        self.ajenos.extend(numeros)
+
+    def query(self, **kwargs):
+        resultado = self._tabla.query(**kwargs)
+        if self.veces:
+            self.veces -= 1
+            for feature in resultado.features:
+                self.competir(feature.attributes["ObjectID"])
+        return resultado
+
+    def calculate(self, where, calc_expression, **kwargs):
+        if any(where.startswith(f"ObjectID = {oid} ") for oid in self.fallar):
+            raise TimeoutError("sin respuesta")
+        return self._tabla.calculate(where=where, calc_expression=calc_expression, **kwargs)
+
+
+def _tabla():
+    _, gis = generar_servicio(pendientes=1, historico=0, adjuntos_por_denuncia=0)
+    return gis.content.get(ITEM_INSPECTORES).tables[0]
+
+
+def _ultimo(tabla, oid):
+    fila = next(r for r in tabla.registros() if r["ObjectID"] == oid)
+    return fila["ultimo_numero"] or 0
+
+
+def test_conflicto_se_reintenta_sin_repetir_numeros():
+    tabla = _tabla()
+    compartida = TablaCompartida(tabla, veces=2)
+    reserva = ReservaNumeros(compartida, col_oid="ObjectID", reintentos=3)
+    persona = Persona(oid=1)
+    inicial = _ultimo(tabla, 1)
+
+    numeros = reserva.reservar([persona] * 4)
+
+    # la primera lectura y el primer reintento chocan con el otro proceso
+    assert reserva.conflictos == 2
+    assert None not in numeros
+    assert len(set(numeros)) == 4
+    assert not set(numeros) & set(compartida.ajenos)
+    assert _ultimo(tabla, 1) == max(numeros) == inicial + len(compartida.ajenos) + 4
+
+
+def test_reintentos_agotados_no_reserva():
+    tabla = _tabla()
+    compartida = TablaCompartida(tabla, veces=10)
+    reserva = ReservaNumeros(compartida, col_oid="ObjectID", reintentos=3)
+
+    numeros = reserva.reservar([Persona(oid=1)] * 2)
+
+    assert numeros == [None, None]
+    assert reserva.conflictos == reserva.reintentos
+    # el contador quedó donde lo dejó el otro proceso
+    assert _ultimo(tabla, 1) == max(compartida.ajenos)
+
+
+def test_devolucion_tras_otra_reserva_deja_hueco():
+    tabla = _tabla()
+    compartida = TablaCompartida(tabla)
+    reserva = ReservaNumeros(compartida, col_oid="ObjectID")
+    persona = Persona(oid=1)
+    numeros = reserva.reservar([persona] * 3)
+    reserva.confirmar(persona, numeros[0])
+
+    # otro proceso reserva después: ya no se pueden devolver los números sin usar
+    compartida.competir(1)
+    finales = reserva.devolver()
+
+    assert finales == [{"attributes": {"ObjectID": 1, "ultimo_numero": numeros[2]}}]
+    assert _ultimo(tabla, 1) == max(compartida.ajenos) == numeros[2] + compartida.cantidad
+
+
+def test_devolucion_parcial_no_pierde_las_demas():
+    tabla = _tabla()
+    compartida = TablaCompartida(tabla)
+    uno, dos = Persona(oid=1), Persona(oid=2)
+    reserva = ReservaNumeros(compartida, col_oid="ObjectID")
+    numeros = reserva.reservar([uno, uno, uno, dos, dos, dos])
+    reserva.confirmar(uno, numeros[0])
+    reserva.confirmar(dos, numeros[3])
+
+    compartida.fallar.add(1)
+    finales = {u["attributes"]["ObjectID"]: u["attributes"]["ultimo_numero"] for u in reserva.devolver()}
+
+    # el bloque de 1 queda entero (hueco); el de 2 se devolvió hasta el usado
+    assert finales == {1: numeros[2], 2: numeros[3]}
+    assert _ultimo(tabla, 1) == numeros[2]
+    assert _ultimo(tabla, 2) == numeros[3]
@@ -0,0 +1,79 @@
+"""
+Servicio residente: GET /estado responde una copia del estado mientras el hilo
+del ciclo lo cambia, y los JSON de métricas por ciclo no crecen sin límite.
+"""
+import json
+import os
+import threading
+import urllib.request
+from http.server import ThreadingHTTPServer
+
+import ejecutar_etapas
+import servicio as modulo_servicio
+from asignador import metricas
+from servicio import Servicio, _manejador
+
+
+class ContextoCaliente:
+    def renovar(self):
+        pass
+
+
+def _servicio():
+    servicio = Servicio(intervalo=None, espera=0)
+    servicio.ctx = ContextoCaliente()
+    return servicio
+
+
+def _estado(servidor):
+    with urllib.request.urlopen(f"http://127.0.0.1:{servidor.server_port}/estado") as respuesta:
+        return json.loads(respuesta.read())
+
+
+def test_estado_durante_el_ciclo(monkeypatch):
+    empezo, seguir = threading.Event(), threading.Event()
+
+    def etapas(nombres, ctx):
+        empezo.set()
+        seguir.wait(5)
+
+    monkeypatch.setattr(ejecutar_etapas, "ejecutar_etapas", etapas)
+    servicio = _servicio()
+    servidor = ThreadingHTTPServer(("127.0.0.1", 0), _manejador(servicio))
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    try:
+        ciclo = threading.Thread(target=servicio._ciclo, args=({"inspeccion"},))
+        ciclo.start()
+        assert empezo.wait(5)
+        durante = _estado(servidor)
+        copia = servicio.instantanea()
+        seguir.set()
+        ciclo.join()
+        despues = _estado(servidor)
+    finally:
+        servidor.shutdown()
+        servidor.server_close()
+
+    assert durante["ejecutando"] is True and durante["ciclos"] == 0
+    # la copia no cambia cuando el ciclo termina
+    assert copia["ejecutando"] is True
+    assert despues["ejecutando"] is False and despues["ciclos"] == 1 and despues["ultimo_error"] is None
+
+
+def test_metricas_por_ciclo_acotadas(tmp_path, monkeypatch):
+    monkeypatch.setattr(ejecutar_etapas, "ejecutar_etapas", lambda nombres, ctx: None)
+    monkeypatch.setattr(metricas, "CARPETA", str(tmp_path))
+    monkeypatch.setattr(modulo_servicio, "CONSERVAR_METRICAS", 3)
+    # ciclos anteriores (uno con perfil) y otro script en la misma carpeta
+    for fecha in ("20240101_000000", "20240102_000000", "20240103_000000", "20240104_000000"):
+        (tmp_path / f"servicio_{fecha}.json").write_text("{}")
+    (tmp_path / "servicio_20240101_000000.prof").write_text("")
+    (tmp_path / "inspeccion_20240101_000000.json").write_text("{}")
+
+    _servicio()._ciclo({"inspeccion"})
+
+    archivos = sorted(os.listdir(tmp_path))
+    propios = [a for a in archivos if a.startswith("servicio_")]
+    assert len(propios) == 3
+    assert propios[:2] == ["servicio_20240103_000000.json", "servicio_20240104_000000.json"]
+    assert "inspeccion_20240101_000000.json" in archivos
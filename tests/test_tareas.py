@@ -0,0 +1,26 @@
+"""tareas.texto escribe cada columna como lo haría str() en un f-string, vacíos incluidos."""
+import numpy as np
+import pandas as pd
+import pytest
+
+from asignador.tareas import concatenar, texto
+
+
+@pytest.mark.parametrize("serie", [
+    pd.Series(["a", None, "c"], dtype="str"),
+    pd.Series(["a", None, "c"], dtype="string"),
+    pd.Series(["a", None, 3], dtype=object),
+    pd.Series([1.0, np.nan, 2.5]),
+    pd.Series([1, None, 3], dtype="Int64"),
+    pd.Series([7, 8, 9]),
+    pd.Series([True, False, True]),
+])
+def test_texto_igual_que_str(serie):
+    df = pd.DataFrame({"c": serie})
+    assert texto(df, "c").tolist() == [str(v) for v in serie.astype(object)]
+
+
+def test_texto_columna_ausente():
+    df = pd.DataFrame({"c": ["a", "b"]})
+    assert texto(df, "otra", "---").tolist() == ["---", "---"]
+    assert concatenar("DGSH-", texto(df, "c"), "-", texto(df, "otra", 0)).tolist() == ["DGSH-a-0", "DGSH-b-0"]
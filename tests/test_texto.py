@@ -0,0 +1,34 @@
+"""texto.limpiar por columnas da lo mismo que limpiar_texto valor por valor."""
+import pandas as pd
+import pytest
+
+from asignador.texto import MARCA_RECORTE, limpiar, limpiar_texto, recortar, texto_limpio
+
+TEXTOS = [
+    "  <b>Ruido</b> en la\r\nnoche  ",
+    "línea 1\nlínea 2\n",
+    "<p>sin\rcierre",
+    "a < b y c > d",
+    "",
+    None,
+]
+
+
+@pytest.mark.parametrize("dtype", ["str", "string", object])
+def test_limpiar_igual_que_por_valor(dtype):
+    serie = pd.Series(TEXTOS, dtype=dtype)
+    assert limpiar(serie).tolist() == [limpiar_texto(t) for t in TEXTOS]
+    assert limpiar(serie).tolist()[:3] == ["Ruido en la | noche", "línea 1 | línea 2 |", "sincierre"]
+
+
+def test_texto_limpio_columna_ausente():
+    df = pd.DataFrame({"a": ["<i>x</i>", None]})
+    assert texto_limpio(df, "a", "---").tolist() == ["x", ""]
+    assert texto_limpio(df, "b", "<br>Sin detalle").tolist() == ["Sin detalle", "Sin detalle"]
+
+
+def test_recortar_al_largo_del_campo():
+    serie = pd.Series(["corto", "x" * 20])
+    recortada = recortar(serie, 10)
+    assert recortada.tolist() == ["corto", "x" * (10 - len(MARCA_RECORTE)) + MARCA_RECORTE]
+    assert recortar(serie, None) is serie